@@ -0,0 +1,131 @@
+"""Compare blind client retries with the admission scheduler against a rate-limited provider.
+
+The fake provider accepts --limit calls per second per model and answers
+the rest with a 429, which the client retries twice with a short backoff
+like ChatMistralAI does. Interactive /get-ai-answers requests arrive at
+main.py at --rate per second while background calls (standing in for
+question pool refills) arrive at --background-rate per second, all on the
+same model. In "retries" mode the scheduler has no budget configured; in
+"scheduled" mode it holds the model to --limit calls per second, queueing
+interactive calls first and shedding the excess with 429/503 and
+Retry-After.
+
+Run from the repo root:
+    python -m benchmarks.bench_admission --limit 5 --rate 6 --background-rate 3 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from collections import Counter, deque
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+from pydantic import PrivateAttr  # noqa: E402
+
+import main  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+from scheduler import Overloaded, Priority, current_priority, llm_scheduler  # noqa: E402
+
+
+class RateLimitedFake(FakeChatModel):
+    """Fake model that rejects calls beyond `limit` per second, retrying like the real client."""
+    limit: float = 5
+    max_retries: int = 2
+    attempts: int = 0
+    rejected: int = 0
+    _window: deque = PrivateAttr(default_factory=deque)
+
+    def _allow(self) -> bool:
+        now = time.monotonic()
+        while self._window and self._window[0] <= now - 1:
+            self._window.popleft()
+        self.attempts += 1
+        if len(self._window) >= self.limit:
+            self.rejected += 1
+            return False
+        self._window.append(now)
+        return True
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            if self._allow():
+                return await super()._agenerate(messages, stop, run_manager, **kwargs)
+            if attempt < self.max_retries:
+                await asyncio.sleep(0.1 * 2 ** attempt)
+        request = httpx.Request("POST", "https://api.mistral.ai/v1/chat/completions")
+        response = httpx.Response(429, headers={"retry-after": "1"}, request=request)
+        raise httpx.HTTPStatusError("429 Too Many Requests", request=request, response=response)
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return float("nan")
+    return statistics.quantiles(values, n=100)[q - 1] if len(values) > 1 else values[0]
+
+
+async def run_mode(client: httpx.AsyncClient, label: str, llm: RateLimitedFake, args):
+    llm.attempts = llm.rejected = 0
+    statuses = Counter()
+    background = Counter()
+    latencies = []
+    chain = main.chains["contestant_answer_2"]
+
+    async def interactive(n: int):
+        start = time.perf_counter()
+        response = await client.get("/get-ai-answers", params={"question": f"{label} {n}: your dream date?", "contestant": 2})
+        statuses[response.status_code] += 1
+        if response.status_code == 200:
+            latencies.append(time.perf_counter() - start)
+
+    async def refill(n: int):
+        current_priority.set(Priority.BACKGROUND)
+        try:
+            await chain.ainvoke({"question": f"{label} background {n}: your dream date?"})
+            background["ok"] += 1
+        except Overloaded:
+            background["shed"] += 1
+        except httpx.HTTPStatusError:
+            background["429"] += 1
+
+    tasks = []
+    start = time.perf_counter()
+    for n in range(int(args.duration * args.rate)):
+        tasks.append(asyncio.create_task(interactive(n)))
+        if args.background_rate and n % max(1, round(args.rate / args.background_rate)) == 0:
+            tasks.append(asyncio.create_task(refill(n)))
+        await asyncio.sleep(max(0.0, start + (n + 1) / args.rate - time.perf_counter()))
+    await asyncio.gather(*tasks)
+
+    print(f"{label:<11}{statuses[200]:>6}{statuses[429]:>6}{statuses[503]:>6}{statuses[500]:>6}"
+          f"{percentile(latencies, 50) * 1000:>9.0f}{percentile(latencies, 95) * 1000:>9.0f}"
+          f"{background['ok']:>8}{background['shed'] + background['429']:>8}{llm.attempts:>10}{llm.rejected:>8}")
+
+
+async def run(args):
+    llm = RateLimitedFake(model="ministral-8b-latest", limit=args.limit, latency_ms=300, latency_sigma=0.2)
+    main.chains["contestant_answer_2"].llm = llm
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        print(f"{'mode':<11}{'200':>6}{'429':>6}{'503':>6}{'500':>6}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'bg ok':>8}{'bg fail':>8}{'upstream':>10}{'upst429':>8}")
+        llm_scheduler.configure({})
+        await run_mode(client, "retries", llm, args)
+        await asyncio.sleep(1)  # let the provider's window empty
+        llm_scheduler.configure({"ministral-8b-latest": (args.limit, 0)})
+        await run_mode(client, "scheduled", llm, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--limit", type=float, default=5, help="provider calls per second per model")
+    parser.add_argument("--rate", type=float, default=6, help="interactive requests per second")
+    parser.add_argument("--background-rate", type=float, default=3, help="background calls per second")
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+    asyncio.run(run(args))
@@ -0,0 +1,117 @@
+"""Measure tail latency of main.py's /get-question and /rate-answer during a provider brownout.
+
+The fake model behind every chain is made to misbehave in two phases:
+    tail    --slow-rate of calls stall for --stall seconds
+    outage  every call stalls for --stall seconds
+Each phase is run with the guard off (no deadline, hedging or circuit
+breaker) and on (--deadline per chain, hedging at the p95, breaker with
+fallbacks to seed questions and neutral ratings).
+
+Run from the repo root:
+    python -m benchmarks.bench_brownout --concurrency 10 --duration 10
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+from resilience import llm_guard  # noqa: E402
+
+RATING = {"conversation": "What is your ideal date?\nContestant1: A long walk on the beach!", "round_number": 1}
+
+
+class BrownoutFake(FakeChatModel):
+    """Fake model where a `stall_rate` fraction of calls hang for `stall` seconds first."""
+    stall_rate: float = 0.0
+    stall: float = 30.0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if random.random() < self.stall_rate:
+            await asyncio.sleep(self.stall)
+        return await super()._agenerate(messages, stop, run_manager, **kwargs)
+
+
+def configure_guard(enabled: bool, deadline: float):
+    llm_guard.default_deadline = deadline if enabled else 3600
+    llm_guard.hedge_percentile = 95 if enabled else 0
+    llm_guard.breaker_failures = 5 if enabled else 10 ** 9
+    llm_guard.breaker_open_seconds = 5
+    llm_guard._breakers.clear()
+    llm_guard._latencies.clear()
+
+
+async def drive(client: httpx.AsyncClient, concurrency: int, duration: float, stall_cap: float):
+    latencies, degraded, errors = [], 0, 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int):
+        nonlocal degraded, errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            if n % 2:
+                response = await client.get("/get-question")
+            else:
+                response = await client.post("/rate-answer", json=RATING)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+            elif "X-Degraded" in response.headers:
+                degraded += 1
+
+    # Requests stuck behind a stall are cut off when the phase ends, and counted at the stall's length
+    workers = [asyncio.create_task(worker(n)) for n in range(concurrency)]
+    done, pending = await asyncio.wait(workers, timeout=duration + stall_cap)
+    for task in pending:
+        task.cancel()
+        latencies.append(stall_cap)
+    return sorted(latencies), degraded, errors
+
+
+async def run(args):
+    leaves = [leaf for chain in main.chains.values() for leaf in chain.leaves()]
+    fakes = {}
+    for leaf in leaves:
+        model = leaf.model_name
+        fakes.setdefault(model, BrownoutFake(model=model, latency_ms=300, latency_sigma=0.3, stall=args.stall))
+        leaf.llm = fakes[model]
+        leaf.cache = None
+        leaf.single_flight = None
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        print(f"{'phase':<8}{'guard':<7}{'requests':>9}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'degraded':>10}{'errors':>8}")
+        for phase, stall_rate in (("tail", args.slow_rate), ("outage", 1.0)):
+            for enabled in (False, True):
+                configure_guard(enabled, args.deadline)
+                if enabled:
+                    # Warm the latency history so hedging has a percentile to work from
+                    for fake in fakes.values():
+                        fake.stall_rate = 0.0
+                    await drive(client, args.concurrency, 2, args.stall)
+                for fake in fakes.values():
+                    fake.stall_rate = stall_rate
+                latencies, degraded, errors = await drive(client, args.concurrency, args.duration, args.stall)
+                p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+                print(f"{phase:<8}{'on' if enabled else 'off':<7}{len(latencies):>9}{latencies[len(latencies) // 2] * 1000:>9.0f}"
+                      f"{p99 * 1000:>9.0f}{latencies[-1] * 1000:>9.0f}{degraded:>10}{errors:>8}")
+    print(f"guard: {llm_guard.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per phase and mode")
+    parser.add_argument("--slow-rate", type=float, default=0.05, help="fraction of calls that stall in the tail phase")
+    parser.add_argument("--stall", type=float, default=15, help="seconds a stalled call hangs")
+    parser.add_argument("--deadline", type=float, default=3, help="per-chain deadline with the guard on")
+    args = parser.parse_args()
+    asyncio.run(run(args))
@@ -0,0 +1,104 @@
+"""Count upstream LLM calls per game with and without a content pack.
+
+Plays --games full games headlessly (as `python -m simulate` does, fake
+backend) with no pack, then with the pack in pack-first mode at each
+--live-ratio, and reports model calls per game by chain and game
+duration. Builds a pack first unless --pack names one.
+
+Run from the repo root:
+    python -m benchmarks.bench_content_pack --games 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("QUESTION_POOL_SIZE", "0")
+
+import content_pack  # noqa: E402
+import endpoints  # noqa: E402
+import simulate  # noqa: E402
+
+
+class CountingModel:
+    """Chat model proxy that counts the calls going upstream, per chain."""
+
+    def __init__(self, llm, chain: str, calls: Counter):
+        self._llm = llm
+        self._chain = chain
+        self._calls = calls
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+    async def ainvoke(self, *args, **kwargs):
+        self._calls[self._chain] += 1
+        return await self._llm.ainvoke(*args, **kwargs)
+
+    async def astream(self, *args, **kwargs):
+        self._calls[self._chain] += 1
+        async for chunk in self._llm.astream(*args, **kwargs):
+            yield chunk
+
+
+async def play(games: int, concurrency: int) -> list:
+    todo = list(range(games))
+
+    async def worker():
+        records = []
+        while todo:
+            records.append(await simulate.play_game(todo.pop(), "bench", simulate.SIMULATION_GAME_TIMEOUT_SECONDS))
+        return records
+
+    return [record for records in await asyncio.gather(*(worker() for _ in range(concurrency))) for record in records]
+
+
+async def run(args):
+    pack_path = args.pack
+    if not pack_path:
+        pack_path = os.path.join(tempfile.mkdtemp(prefix="bench-pack-"), "content.pack")
+        built = await content_pack.build(pack_path, answers=args.answers, host_lines=3, concurrency=16)
+        print(f"built {pack_path}: {built['questions']} questions, {built['answers']} answers, "
+              f"{built['host_lines']} host lines, {built['bytes'] / 1024:.1f} KiB in {built['seconds']}s")
+
+    calls: Counter = Counter()
+    endpoints.chains.reset()
+    for name, chain in endpoints.chains.load().items():
+        for leaf in chain.leaves():
+            leaf.llm = CountingModel(leaf.llm, name, calls)
+    endpoints.speculator.enabled = False
+
+    settings = [("no pack", None)] + [(f"pack-first, live ratio {ratio}", ratio) for ratio in args.live_ratio]
+    async with endpoints.lifespan(endpoints.app):
+        for label, ratio in settings:
+            endpoints.content_pack = (
+                content_pack.ContentPack() if ratio is None
+                else content_pack.ContentPack(pack_path, endpoints.pack_templates(), live_ratio=ratio)
+            )
+            calls.clear()
+            start = time.perf_counter()
+            records = await play(args.games, args.concurrency)
+            elapsed = time.perf_counter() - start
+            finished = [record for record in records if record["status"] == "ok"]
+            per_chain = ", ".join(f"{chain} {count / args.games:.1f}" for chain, count in sorted(calls.items()))
+            print(f"{label}: {sum(calls.values()) / args.games:.1f} calls per game ({per_chain}); "
+                  f"{len(finished)}/{args.games} games ok, median {statistics.median(r['seconds'] for r in records):.2f}s, "
+                  f"{args.games / elapsed:.1f} games/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10, help="games played at once")
+    parser.add_argument("--pack", help="existing pack to use instead of building one")
+    parser.add_argument("--answers", type=int, default=2, help="answers per question and personality when building")
+    parser.add_argument("--live-ratio", type=float, action="append", help="pack-first live ratios to compare (default 0.1 and 0)")
+    args = parser.parse_args()
+    args.live_ratio = args.live_ratio or [0.1, 0.0]
+    asyncio.run(run(args))
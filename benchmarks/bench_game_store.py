@@ -0,0 +1,102 @@
+"""Compare game throughput of one in-memory worker against N workers sharing a game store.
+
+Each configuration starts `uvicorn endpoints:app` on the offline fake
+backend and drives full games at it with the load tester. The SQLite
+store uses a temporary file; the Redis store talks to fake_redis.py.
+"memory xN" is included to show what goes wrong without a shared store:
+a game's requests land on workers that have never seen it.
+
+Run from the repo root:
+    python -m benchmarks.bench_game_store --workers 4 --concurrency 50 --duration 20
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks import loadtest
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+
+
+def start_server(workers: int, store_url: str) -> "tuple[subprocess.Popen, str]":
+    port = free_port()
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "fake",
+        "MISTRAL_API_KEY": os.environ.get("MISTRAL_API_KEY", "benchmark"),
+        "LOG_LEVEL": "WARNING",
+        "GAME_STORE_URL": store_url,
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "endpoints:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    wait_for(url + "/sessions/stats")
+    return server, url
+
+
+def stop(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_config(label: str, workers: int, store_url: str, concurrency: int, duration: float) -> dict:
+    server, url = start_server(workers, store_url)
+    try:
+        report = asyncio.run(loadtest.run("game", url, concurrency, duration, None))
+    finally:
+        stop(server)
+    games = report["routes"].get("/announce-winner", {})
+    completed = games.get("requests", 0) - games.get("errors", 0)
+    print(f"{label:<14}{workers:>8}{report['rps']:>10.1f}{completed / report['elapsed_s']:>10.2f}"
+          f"{report['errors'] / max(report['requests'], 1):>10.1%}")
+    return report
+
+
+def run(workers: int, concurrency: int, duration: float):
+    redis_port = free_port()
+    redis = subprocess.Popen([sys.executable, "-m", "fake_redis", "--port", str(redis_port)], stdout=subprocess.DEVNULL)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            print(f"{'store':<14}{'workers':>8}{'req/s':>10}{'games/s':>10}{'errors':>10}")
+            run_config("memory", 1, "memory://", concurrency, duration)
+            run_config("memory", workers, "memory://", concurrency, duration)
+            run_config("sqlite", workers, f"sqlite:///{os.path.join(tmp, 'games.db')}", concurrency, duration)
+            run_config("redis", workers, f"redis://127.0.0.1:{redis_port}/0", concurrency, duration)
+    finally:
+        stop(redis)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per configuration")
+    args = parser.parse_args()
+    run(args.workers, args.concurrency, args.duration)
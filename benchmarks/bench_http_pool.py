@@ -0,0 +1,114 @@
+"""Count upstream connections with per-client pools versus the shared Mistral HTTP pool.
+
+A local stub of the chat completions API counts the TCP connections it
+accepts and the most it ever held open at once. Each of main.py's model
+clients is driven with the same concurrent load, first with a pool per
+client (MISTRAL_HTTP_SHARED=0) and then with the shared pool. Every new
+connection stands in for a TLS handshake against the real API.
+
+Run from the repo root:
+    python -m benchmarks.bench_http_pool --requests 600 --concurrency 60
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["LLM_BACKEND"] = "mistral"
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+
+
+class StubMistral:
+    """Minimal HTTP/1.1 keep-alive server answering POST /v1/chat/completions."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+        self.open = 0
+        self.peak_open = 0
+        self.requests = 0
+
+    def reset(self):
+        self.connections = self.peak_open = self.requests = 0
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        self.open += 1
+        self.peak_open = max(self.peak_open, self.open)
+        try:
+            while await reader.readline():
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                request = json.loads(await reader.readexactly(int(headers.get("content-length", 0))))
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+                body = json.dumps({
+                    "id": f"stub-{self.requests}",
+                    "object": "chat.completion",
+                    "model": request.get("model", "stub"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "7"}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 10, "completion_tokens": 1, "total_tokens": 11},
+                }).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: %d\r\n\r\n%s" % (len(body), body)
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.open -= 1
+            writer.close()
+
+
+async def drive(clients, requests: int, concurrency: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+    targets = itertools.cycle(clients)
+
+    async def one(client):
+        async with slots:
+            await client.ainvoke("Rate this answer. Only respond with a number from 0 to 10.")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(next(targets)) for _ in range(requests)))
+    return time.perf_counter() - start
+
+
+async def run(requests: int, concurrency: int, latency: float):
+    stub = StubMistral(latency)
+    server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+    os.environ["MISTRAL_BASE_URL"] = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/v1"
+
+    # Imported only now so MISTRAL_BASE_URL points at the stub
+    import llm_clients
+    import main
+
+    print(f"{'pool':<12}{'clients':>8}{'requests':>10}{'req/s':>9}{'connections':>13}{'peak open':>11}")
+    for label, shared in (("per-client", False), ("shared", True)):
+        llm_clients.MISTRAL_HTTP_SHARED = shared
+        clients = list({id(leaf.llm): leaf.llm for chain in main.build_chains().values() for leaf in chain.leaves()}.values())
+        stub.reset()
+        elapsed = await drive(clients, requests, concurrency)
+        print(f"{label:<12}{len(clients):>8}{stub.requests:>10}{stub.requests / elapsed:>9.0f}{stub.connections:>13}{stub.peak_open:>11}")
+        if shared:
+            await llm_clients.close_http_client()
+        else:
+            for client in clients:
+                await client.async_client.aclose()
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, default=60)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub response time in seconds")
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency, args.latency))
@@ -0,0 +1,143 @@
+"""Measure the game journal: write throughput and event-loop stalls while journaling, and restart recovery time.
+
+Plays --games synthetic games (no model calls) through a
+JournaledGameStore, --concurrency at a time, each with the same
+transitions as a real three-round game. A ticker task records the
+longest the event loop was blocked. The run is done once with a plain
+MemoryGameStore for comparison, then with a journal snapshotted every
+--snapshot-every events, with one never snapshotted, and with one
+that keeps only --concurrency games and plays later games under the
+ids of games it evicted. A new store then recovers each journal as a
+restarted server would, and every recovered game is checked against
+the one still live in the store that wrote the journal.
+
+Run from the repo root:
+    python -m benchmarks.bench_journal --games 100000
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+
+from endpoints import ContestantType, GameState
+from game_store import JournaledGameStore, MemoryGameStore
+from journal import Journal
+
+CONTESTANTS = list(ContestantType)
+
+
+def set_stage(game_state: GameState, stage: str):
+    game_state.stage = stage
+
+
+def commit_question(game_state: GameState, question: str):
+    game_state.questions.append(question)
+    game_state.stage = "ai_answer"
+
+
+def commit_answer(game_state: GameState, contestant: ContestantType, answer: str):
+    game_state.conversation_history.append({"round": game_state.current_round, "contestant": contestant, "answer": answer})
+
+
+def commit_ratings(game_state: GameState, ratings: list):
+    for contestant, rating in zip(CONTESTANTS, ratings):
+        game_state.contestant_ratings[contestant].append(rating)
+    game_state.current_round += 1
+    game_state.stage = "question_submission"
+
+
+async def step(store: MemoryGameStore, session_id: str, mutate, *args):
+    await store.transition(session_id, mutate, *args)
+    # A real game waits on a model or a player between transitions
+    await asyncio.sleep(0)
+
+
+async def play(store: MemoryGameStore, game: int, reuse_ids: int = 0):
+    if reuse_ids:
+        session_id = f"player-{game % reuse_ids}"
+    else:
+        session_id, _ = await store.create()
+    await step(store, session_id, set_stage, "ai_intro")
+    await step(store, session_id, set_stage, "question_submission")
+    for round_number in range(3):
+        await step(store, session_id, commit_question, f"Question {round_number} of game {game}?")
+        for contestant in CONTESTANTS:
+            await step(store, session_id, commit_answer, contestant, f"{contestant.value} answers with a fairly ordinary line.")
+        await step(store, session_id, set_stage, "rating")
+        await step(store, session_id, commit_ratings, [(game + round_number + n) % 11 for n in range(3)])
+    await step(store, session_id, set_stage, "game_complete")
+
+
+async def ticker(lags: list, interval: float = 0.005):
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+def disk_usage(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+
+async def play_games(store: MemoryGameStore, games: int, concurrency: int, reuse_ids: int = 0) -> tuple:
+    """Seconds taken to play every game through `store`, and the longest event-loop stall."""
+    await store.start()
+    lags: list = []
+    tick = asyncio.create_task(ticker(lags))
+    start = time.perf_counter()
+    for first in range(0, games, concurrency):
+        await asyncio.gather(*(play(store, game, reuse_ids) for game in range(first, min(games, first + concurrency))))
+    await store.close()
+    elapsed = time.perf_counter() - start
+    tick.cancel()
+    return elapsed, max(lags, default=0.0)
+
+
+async def recover(directory: str, games: int, live: JournaledGameStore) -> tuple:
+    """Games recovered from the journal, seconds taken, and how many differ from the store that wrote it."""
+    store = JournaledGameStore(GameState, Journal(directory), max_sessions=games + 1)
+    start = time.perf_counter()
+    await store.start()
+    elapsed = time.perf_counter() - start
+    await store.close()
+    wrong = [
+        session_id for session_id in live.sessions.ids()
+        if getattr(store.sessions.peek(session_id), "to_dict", dict)() != live.sessions.peek(session_id).to_dict()
+    ]
+    return store.recovered, elapsed, len(wrong)
+
+
+async def run(args):
+    elapsed, lag = await play_games(MemoryGameStore(GameState, max_sessions=args.games + 1), args.games, args.concurrency)
+    print(f"no journal: {args.games} games in {elapsed:.1f}s, max loop stall {lag * 1000:.1f} ms")
+    root = tempfile.mkdtemp(prefix="bench-journal-")
+    try:
+        runs = (
+            ("snapshots", args.snapshot_every, args.games + 1, 0),
+            ("log only", args.games * 100, args.games + 1, 0),
+            # Every other batch of games evicts the last one and reuses its ids
+            ("reused ids", args.snapshot_every, args.concurrency, 2 * args.concurrency),
+        )
+        for label, snapshot_every, max_sessions, reuse_ids in runs:
+            directory = os.path.join(root, label.replace(" ", "-"))
+            store = JournaledGameStore(GameState, Journal(directory), snapshot_every=snapshot_every, max_sessions=max_sessions)
+            elapsed, lag = await play_games(store, args.games, args.concurrency, reuse_ids)
+            journal = store.journal.stats()
+            recovered, recovery, wrong = await recover(directory, args.games, store)
+            print(f"{label}: {journal['events']} events in {elapsed:.1f}s ({journal['events'] / elapsed:.0f}/s), "
+                  f"{disk_usage(directory) / 2 ** 20:.1f} MiB on disk, {journal['flushes']} fsyncs, "
+                  f"{journal['snapshots']} snapshots, max loop stall {lag * 1000:.1f} ms")
+            print(f"    recovered {recovered} games in {recovery:.2f}s, {wrong} of the {len(store.sessions)} live games differ")
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--concurrency", type=int, default=100, help="games in flight at once")
+    parser.add_argument("--snapshot-every", type=int, default=100000, help="events between snapshots in the first run")
+    args = parser.parse_args()
+    asyncio.run(run(args))
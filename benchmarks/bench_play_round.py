@@ -0,0 +1,103 @@
+"""Compare round wall time for the five-request round flow against /play-round.
+
+Each game is set up the usual way and then plays its three rounds either
+step by step (/next-question, /submit-answer/contestant3,
+/get-ai-answers, /rate-all-answers, /next-round) or with one /play-round
+request per round. --rtt adds a simulated client round-trip to every
+request, as a browser far from the server would see. Runs endpoints.py
+in-process on the fake backend.
+
+Run from the repo root:
+    python -m benchmarks.bench_play_round --games 20 --concurrency 5 --rtt 80
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("QUESTION_POOL_SIZE", "0")
+
+import httpx  # noqa: E402
+
+import endpoints  # noqa: E402
+
+ANSWER = {"answer": "Pineapple, obviously."}
+
+
+class Client:
+    """Adds a simulated round-trip to each request."""
+
+    def __init__(self, client: httpx.AsyncClient, rtt: float):
+        self.client = client
+        self.rtt = rtt
+
+    async def call(self, method: str, route: str, **kwargs) -> httpx.Response:
+        await asyncio.sleep(self.rtt)
+        response = await self.client.request(method, route, **kwargs)
+        response.raise_for_status()
+        return response
+
+
+async def new_game(client: Client) -> dict:
+    params = {"session_id": (await client.call("POST", "/new-game")).json()["session_id"]}
+    await client.call("GET", "/host-introduction", params=params)
+    await client.call("GET", "/ai-introduction", params=params)
+    for _ in range(3):
+        await client.call("GET", "/get-question", params=params)
+    return params
+
+
+async def stepwise_round(client: Client, params: dict):
+    await client.call("GET", "/next-question", params=params)
+    await client.call("POST", "/submit-answer/contestant3", params=params, json=ANSWER)
+    await client.call("GET", "/get-ai-answers", params=params)
+    await client.call("GET", "/rate-all-answers", params=params)
+    await client.call("GET", "/next-round", params=params)
+
+
+async def pipeline_round(client: Client, params: dict):
+    await client.call("POST", "/play-round", params=params, json=ANSWER)
+
+
+async def run_mode(http: httpx.AsyncClient, label: str, play_round, games: int, concurrency: int, rtt: float):
+    client = Client(http, rtt)
+    round_times = []
+    slots = asyncio.Semaphore(concurrency)
+    rounds = 0
+
+    async def game():
+        nonlocal rounds
+        async with slots:
+            params = await new_game(client)
+            for _ in range(3):
+                start = time.perf_counter()
+                await play_round(client, params)
+                round_times.append(time.perf_counter() - start)
+            rounds += 3
+
+    await asyncio.gather(*(game() for _ in range(games)))
+    round_times.sort()
+    p95 = round_times[min(len(round_times) - 1, int(len(round_times) * 0.95))]
+    requests_per_round = 5 if play_round is stepwise_round else 1
+    print(f"{label:<10}{rounds:>8}{requests_per_round:>10}{statistics.median(round_times) * 1000:>10.0f}{p95 * 1000:>10.0f}")
+
+
+async def run(games: int, concurrency: int, rtt: float):
+    transport = httpx.ASGITransport(app=endpoints.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as http:
+        print(f"{'flow':<10}{'rounds':>8}{'req/round':>10}{'p50 ms':>10}{'p95 ms':>10}")
+        await run_mode(http, "stepwise", stepwise_round, games, concurrency, rtt)
+        await run_mode(http, "pipeline", pipeline_round, games, concurrency, rtt)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--rtt", type=float, default=80, help="simulated client round-trip in ms")
+    args = parser.parse_args()
+    asyncio.run(run(args.games, args.concurrency, args.rtt / 1000))
@@ -0,0 +1,77 @@
+"""Show /rate-answer prompt tokens and latency as a game grows, with and without context bounding.
+
+Each step sends the whole conversation so far, as the frontend does,
+against main.py on the offline fake backend.
+
+Run from the repo root:
+    python -m benchmarks.bench_rating_context --rounds 40
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+import metrics  # noqa: E402
+
+ANSWERS = [
+    "A long walk on the beach with deep conversations, then tacos.",
+    "Skydiving, obviously. If we survive, dinner is on me.",
+    "A museum after hours, pretending we are art thieves.",
+]
+
+
+def conversation_for(rounds: int) -> str:
+    return "\n\n".join(
+        f"Round {n} question: What is your ideal date?\nContestant1: {ANSWERS[n % len(ANSWERS)]}"
+        for n in range(1, rounds + 1)
+    )
+
+
+async def run_mode(client: httpx.AsyncClient, label: str, budget: int, rounds: int, report_every: int):
+    main.rating_contexts.token_budget = budget
+    rating_model = main.chains["rating"].model_name
+    session_id = f"bench-{label}"
+    print(f"{label}:")
+    print(f"{'rounds':>8}{'prompt tokens':>16}{'latency ms':>12}")
+    for n in range(1, rounds + 1):
+        before = metrics.llm_prompt_tokens.value(chain="rating", model=rating_model)
+        start = time.perf_counter()
+        response = await client.post("/rate-answer", json={
+            "conversation": conversation_for(n),
+            "round_number": n,
+            "session_id": session_id
+        })
+        elapsed = time.perf_counter() - start
+        if response.status_code != 200:
+            print(f"{n:>8}  rejected with {response.status_code}")
+            break
+        tokens = metrics.llm_prompt_tokens.value(chain="rating", model=rating_model) - before
+        if n == 1 or n % report_every == 0:
+            print(f"{n:>8}{tokens:>16.0f}{elapsed * 1000:>12.0f}")
+
+
+async def run(rounds: int, report_every: int):
+    for llm in {id(leaf.llm): leaf.llm for chain in main.chains.values() for leaf in chain.leaves()}.values():
+        # Short fixed base latency so prompt size dominates what is measured
+        llm.latency_ms, llm.latency_sigma = 50, 0
+        llm.ms_per_token, llm.ms_per_input_token = 1.0, 0.3
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await run_mode(client, "unbounded", 0, rounds, report_every)
+        await run_mode(client, "bounded", main.rating_contexts.token_budget or 600, rounds, report_every)
+    print(f"summary calls: {main.rating_contexts.summary_calls}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=40)
+    parser.add_argument("--report-every", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.rounds, args.report_every))
@@ -0,0 +1,91 @@
+"""Compare tokens and latency per round for batched vs per-answer rating.
+
+Uses the offline fake chat model, whose latency grows with completion
+length and whose token counts are estimated at four characters per
+token. Pass --live to rate against the real Mistral API
+instead (needs MISTRAL_API_KEY); token counts then come from the API.
+
+Run from the repo root:
+    python -m benchmarks.bench_rating_modes --rounds 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import endpoints  # noqa: E402
+from endpoints import ContestantType, GameState  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+
+USAGE = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+
+def record_usage(chain):
+    original = chain.ainvoke
+
+    async def ainvoke(inputs, **overrides):
+        response = await original(inputs, **overrides)
+        usage = response.get("usage") or {}
+        USAGE["calls"] += 1
+        USAGE["input_tokens"] += usage.get("input_tokens", 0)
+        USAGE["output_tokens"] += usage.get("output_tokens", 0)
+        return response
+
+    chain.ainvoke = ainvoke
+
+
+def rating_round(state: GameState, round_number: int):
+    state.current_round = round_number
+    state.stage = "rating"
+    state.conversation_history = []
+    for contestant in ContestantType:
+        state.contestant_ratings[contestant] = [7.0] * (round_number - 1)
+        state.conversation_history.append({
+            "round": round_number,
+            "contestant": contestant,
+            "question": "If you were a pizza topping, which one would you be and why?",
+            "answer": "Pineapple: divisive, sweet, and I make every date a little more tropical."
+        })
+
+
+async def run_mode(mode: str, rounds: int):
+    endpoints.RATING_MODE = mode
+    USAGE.update(calls=0, input_tokens=0, output_tokens=0)
+    latencies = []
+    # rate_all_answers commits its ratings through the game store, so each round is seeded there
+    session_id, _ = await endpoints.games.create()
+    for round_number in range(1, rounds + 1):
+        await endpoints.games.transition(session_id, rating_round, round_number % 3 + 1)
+        state = await endpoints.games.load(session_id)
+        start = time.perf_counter()
+        await endpoints.rate_all_answers(session_id, state)
+        latencies.append(time.perf_counter() - start)
+    print(
+        f"{mode:>10}: {USAGE['calls'] / rounds:4.1f} calls/round, "
+        f"{USAGE['input_tokens'] / rounds:6.0f} prompt + {USAGE['output_tokens'] / rounds:4.0f} completion tokens/round, "
+        f"latency p50 {statistics.median(latencies) * 1000:6.0f} ms, max {max(latencies) * 1000:6.0f} ms"
+    )
+
+
+async def run(rounds: int, live: bool):
+    if not live:
+        llm = FakeChatModel(latency_ms=250, latency_sigma=0, ms_per_token=20)
+        for chain in endpoints.chains.values():
+            for leaf in chain.leaves():
+                leaf.llm = llm
+    for name in ("rating", "batch_rating"):
+        record_usage(endpoints.chains[name])
+    for mode in ("per_answer", "batched"):
+        await run_mode(mode, rounds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--live", action="store_true", help="call the real Mistral API")
+    args = parser.parse_args()
+    asyncio.run(run(args.rounds, args.live))
@@ -0,0 +1,84 @@
+"""Measure rating calls, prompt tokens and latency per round for rooms of 3 to 50 contestants.
+
+Each room (one human, the rest AI) plays --rounds rounds through the
+/rooms routes on endpoints.py, in-process against the fake model. Rooms
+are scored in batches of ROOM_RANKING_GROUP_SIZE answers per call, and
+again with a group size of 1 (one rating call per answer, as the
+three-contestant game does in per-answer mode) for comparison.
+
+Run from the repo root:
+    python -m benchmarks.bench_rooms --sizes 3,5,10,20,50 --rounds 3
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("QUESTION_POOL_SIZE", "0")
+
+import httpx  # noqa: E402
+
+import endpoints  # noqa: E402
+import rooms  # noqa: E402
+
+USAGE = {"calls": 0, "input_tokens": 0}
+
+
+def record_usage(chain):
+    original = chain.ainvoke
+
+    async def ainvoke(inputs, **overrides):
+        response = await original(inputs, **overrides)
+        USAGE["calls"] += 1
+        USAGE["input_tokens"] += (response.get("usage") or {}).get("input_tokens", 0)
+        return response
+
+    chain.ainvoke = ainvoke
+
+
+async def play_room(client: httpx.AsyncClient, size: int, rounds: int) -> list:
+    """Play a room to the end and return the close-round latency of each round."""
+    async def call(route: str, **kwargs) -> dict:
+        response = await client.post(route, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    room_id = (await call("/rooms", json={"humans": 1, "ai": size - 1, "rounds": rounds}))["room_id"]
+    latencies = []
+    for _ in range(rounds):
+        await call(f"/rooms/{room_id}/next-round")
+        await call(f"/rooms/{room_id}/answer/player1", json={"answer": "Pineapple, obviously."})
+        start = time.perf_counter()
+        await call(f"/rooms/{room_id}/close-round")
+        latencies.append(time.perf_counter() - start)
+    winner = await client.get(f"/rooms/{room_id}/winner")
+    winner.raise_for_status()
+    return latencies
+
+
+async def run(sizes, rounds: int, group_size: int):
+    for name in ("rating", "batch_rating"):
+        record_usage(endpoints.chains[name])
+    transport = httpx.ASGITransport(app=endpoints.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        print(f"{'contestants':>11}{'group':>7}{'rating calls/round':>20}{'prompt tok/round':>18}{'close p50 ms':>14}")
+        for size in sizes:
+            for size_of_group in (group_size, 1):
+                rooms.ROOM_RANKING_GROUP_SIZE = size_of_group
+                USAGE.update(calls=0, input_tokens=0)
+                latencies = await play_room(client, size, rounds)
+                print(f"{size:>11}{size_of_group:>7}{USAGE['calls'] / rounds:>20.1f}{USAGE['input_tokens'] / rounds:>18.0f}"
+                      f"{statistics.median(latencies) * 1000:>14.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="3,5,10,20,50", help="comma-separated contestants per room")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--group-size", type=int, default=rooms.ROOM_RANKING_GROUP_SIZE)
+    args = parser.parse_args()
+    asyncio.run(run([int(size) for size in args.sizes.split(",")], args.rounds, args.group_size))
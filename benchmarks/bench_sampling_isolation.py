@@ -0,0 +1,84 @@
+"""Drive many games concurrently and check no call sees another role's sampling params.
+
+Every fake chat-model call is recorded together with the temperature it was
+made with. The run fails if any call falls outside its chain's profile.
+
+Run from the repo root:
+    python -m benchmarks.bench_sampling_isolation --games 200
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+
+import endpoints  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+
+
+async def play_game(client: httpx.AsyncClient):
+    session_id = (await client.post("/new-game")).json()["session_id"]
+    params = {"session_id": session_id}
+    await client.get("/host-introduction", params=params)
+    await client.get("/ai-introduction", params=params)
+    for _ in range(3):
+        await client.get("/get-question", params=params)
+    for _ in range(3):
+        await client.get("/next-question", params=params)
+        await client.post("/submit-answer/contestant3", params=params, json={"answer": "Pepperoni."})
+        await client.get("/get-ai-answers", params=params)
+        await client.get("/rate-all-answers", params=params)
+        await client.get("/next-round", params=params)
+    response = await client.get("/announce-winner", params=params)
+    response.raise_for_status()
+
+
+def role_of(prompt: str) -> str:
+    for name, chain in endpoints.chains.items():
+        static_prefix = chain.prompt.template.split("{")[0][:60]
+        if prompt.startswith(static_prefix):
+            return name
+    raise ValueError(f"Unrecognised prompt: {prompt[:60]!r}")
+
+
+def in_profile(name: str, temperature: float) -> bool:
+    expected = endpoints.SAMPLING_PROFILES[name].temperature
+    if isinstance(expected, tuple):
+        return expected[0] <= temperature <= expected[1]
+    return temperature == expected
+
+
+async def run(n_games: int):
+    llm = FakeChatModel(latency_ms=1, ms_per_token=0, record_calls=True)
+    for chain in endpoints.chains.values():
+        for leaf in chain.leaves():
+            leaf.llm = llm
+
+    transport = httpx.ASGITransport(app=endpoints.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(play_game(client) for _ in range(n_games)))
+        elapsed = time.perf_counter() - start
+
+    calls = [(prompt, kwargs.get("temperature")) for prompt, kwargs in llm.calls]
+    leaks = [
+        (role_of(prompt), temperature)
+        for prompt, temperature in calls
+        if not in_profile(role_of(prompt), temperature)
+    ]
+    print(f"games:          {n_games} in {elapsed:.2f}s ({n_games / elapsed:,.1f} games/s)")
+    print(f"model calls:    {len(calls)}")
+    print(f"leaked params:  {len(leaks)}")
+    if leaks:
+        raise SystemExit(f"Sampling params leaked across requests: {leaks[:5]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(run(args.games))
@@ -0,0 +1,80 @@
+"""Create and drive N game sessions through the stage machine.
+
+Run from the repo root:
+    python -m benchmarks.bench_sessions --sessions 5000
+"""
+import argparse
+import gc
+import os
+import time
+import tracemalloc
+
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from endpoints import ContestantType, GameState  # noqa: E402
+from sessions import SessionStore  # noqa: E402
+
+
+def play_round(state: GameState):
+    """Walk one round through the same transitions the endpoints perform."""
+    state.stage = "round_start"
+    question = state.questions[state.current_round - 1]
+    state.advance_stage()  # answer_submission
+    for contestant in ContestantType:
+        state.conversation_history.append({
+            "round": state.current_round,
+            "contestant": contestant,
+            "question": question,
+            "answer": "A short benchmark answer."
+        })
+    state.stage = "rating"
+    for contestant in ContestantType:
+        state.contestant_ratings[contestant].append(7.0)
+    state.stage = "next_round"
+    state.current_round += 1
+    return 4
+
+
+def run(n_sessions: int, max_sessions: int):
+    store = SessionStore(GameState, max_sessions=max_sessions)
+    ids = [store.new_session_id() for _ in range(n_sessions)]
+
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    for session_id in ids:
+        state = store.get(session_id)
+        state.advance_stage()  # ai_intro
+        state.advance_stage()  # question_submission
+        state.questions.extend(f"Question {i}?" for i in range(state.max_rounds))
+        state.advance_stage()  # round_start
+    create_time = time.perf_counter() - start
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    transitions = 0
+    start = time.perf_counter()
+    for _ in range(3):
+        for session_id in ids:
+            state = store.peek(session_id)
+            if state is None:
+                continue
+            transitions += play_round(store.get(session_id))
+    drive_time = time.perf_counter() - start
+
+    live = len(store)
+    print(f"sessions requested:     {n_sessions}")
+    print(f"sessions live:          {live} (cap {max_sessions}, evicted {store.evicted_lru})")
+    print(f"create + intro time:    {create_time:.3f}s ({n_sessions / create_time:,.0f} sessions/s)")
+    print(f"memory per session:     {(after - before) / max(live, 1):,.0f} bytes (peak {peak / 1e6:.1f} MB)")
+    print(f"stage transitions:      {transitions:,} in {drive_time:.3f}s ({transitions / drive_time:,.0f}/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--max-sessions", type=int, default=10000)
+    args = parser.parse_args()
+    run(args.sessions, args.max_sessions)
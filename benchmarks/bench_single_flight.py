@@ -0,0 +1,81 @@
+"""Compare upstream calls for bursts of identical /get-ai-answers requests with and without single-flight coalescing.
+
+Each burst fires --burst concurrent requests for the same question and
+contestant at main.py on the fake backend, as refreshing clients and
+retries do. Every burst uses a new question, so the response cache is
+cold and only coalescing can save upstream calls.
+
+Run from the repo root:
+    python -m benchmarks.bench_single_flight --bursts 20 --burst 25
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from fake_llm import FakeChatModel  # noqa: E402
+
+
+def upstream_calls(llms) -> int:
+    return sum(len(llm.calls) for llm in llms)
+
+
+async def run_mode(client: httpx.AsyncClient, label: str, bursts: int, burst: int, llms):
+    calls_before = upstream_calls(llms)
+    latencies = []
+
+    async def request(question: str, contestant: int):
+        start = time.perf_counter()
+        response = await client.get("/get-ai-answers", params={"question": question, "contestant": contestant})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for n in range(bursts):
+        question = f"{label} question {n}: what would you cook on our first date?"
+        await asyncio.gather(*(request(question, 1 + i % 2) for i in range(burst)))
+    elapsed = time.perf_counter() - start
+
+    upstream = upstream_calls(llms) - calls_before
+    requests = bursts * burst
+    print(f"{label:<12}{requests:>10}{upstream:>10}{upstream / elapsed:>14.1f}"
+          f"{statistics.median(latencies) * 1000:>10.0f}")
+
+
+async def run(bursts: int, burst: int):
+    leaves = [leaf for chain in main.chains.values() for leaf in chain.leaves()]
+    # One recording fake per model, keeping the model names so each contestant's calls stay distinct
+    llms = {}
+    for leaf in leaves:
+        model = leaf.model_name
+        llms.setdefault(model, FakeChatModel(model=model, latency_ms=300, latency_sigma=0.2, record_calls=True))
+        leaf.llm = llms[model]
+    llms = list(llms.values())
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{'mode':<12}{'requests':>10}{'upstream':>10}{'upstream/s':>14}{'p50 ms':>10}")
+        single_flight = {id(leaf): leaf.single_flight for leaf in leaves}
+        for leaf in leaves:
+            leaf.single_flight = None
+        await run_mode(client, "off", bursts, burst, llms)
+        for leaf in leaves:
+            leaf.single_flight = single_flight[id(leaf)]
+        await run_mode(client, "coalesced", bursts, burst, llms)
+    print(f"coalescing: {main.single_flight.stats()['chains']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bursts", type=int, default=20)
+    parser.add_argument("--burst", type=int, default=25, help="concurrent identical requests per burst")
+    args = parser.parse_args()
+    asyncio.run(run(args.bursts, args.burst))
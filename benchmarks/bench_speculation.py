@@ -0,0 +1,69 @@
+"""Measure the user-visible wait for AI answers with and without speculative generation.
+
+Games are played through the step-by-step round flow on endpoints.py
+(in-process, fake backend). Between /next-question and /get-ai-answers
+the player spends --think seconds typing their answer, which is when
+speculation generates the AI contestants' answers in the background.
+
+Run from the repo root:
+    python -m benchmarks.bench_speculation --games 10 --think 1.5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("MISTRAL_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ.setdefault("QUESTION_POOL_SIZE", "0")
+
+import httpx  # noqa: E402
+
+import endpoints  # noqa: E402
+
+
+async def play(client: httpx.AsyncClient, think: float, waits: list):
+    async def call(method: str, route: str, **kwargs) -> httpx.Response:
+        response = await client.request(method, route, params=params, **kwargs)
+        response.raise_for_status()
+        return response
+
+    params = {"session_id": (await client.post("/new-game")).json()["session_id"]}
+    await call("GET", "/host-introduction")
+    await call("GET", "/ai-introduction")
+    for _ in range(3):
+        await call("GET", "/get-question")
+    for _ in range(3):
+        await call("GET", "/next-question")
+        await asyncio.sleep(think)
+        await call("POST", "/submit-answer/contestant3", json={"answer": "Pineapple, obviously."})
+        start = time.perf_counter()
+        await call("GET", "/get-ai-answers")
+        waits.append(time.perf_counter() - start)
+        await call("GET", "/rate-all-answers")
+        await call("GET", "/next-round")
+
+
+async def run(games: int, think: float):
+    transport = httpx.ASGITransport(app=endpoints.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        print(f"{'speculation':<13}{'rounds':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}")
+        for enabled in (False, True):
+            endpoints.speculator.enabled = enabled
+            waits = []
+            await asyncio.gather(*(play(client, think, waits) for _ in range(games)))
+            waits.sort()
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+            print(f"{'on' if enabled else 'off':<13}{len(waits):>8}{statistics.median(waits) * 1000:>10.0f}"
+                  f"{p95 * 1000:>10.0f}{waits[-1] * 1000:>10.0f}")
+        print(f"speculation: {endpoints.speculator.stats()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=10, help="games played concurrently per mode")
+    parser.add_argument("--think", type=float, default=1.5, help="seconds the player spends typing an answer")
+    args = parser.parse_args()
+    asyncio.run(run(args.games, args.think))
@@ -0,0 +1,135 @@
+"""Measure import time and cold start for main.py and endpoints.py.
+
+For each app this reports:
+    import    `import <app>` in a fresh interpreter, with the slowest
+              modules from `python -X importtime`
+    chains    building the model clients and chains (deferred to first use)
+    ready     process spawn until `/` answers, lazy and with
+              WARM_MODELS_ON_STARTUP=1 (everything built before serving)
+
+Clients are built for the real Mistral backend with a dummy key, and
+every setting is left at its default (so endpoints.py runs its question
+pool); MISTRAL_BASE_URL points at a closed local port, so no request
+reaches the API. Pass --history to append the results as a JSON
+line, so startup time can be tracked across commits.
+
+Run from the repo root:
+    python -m benchmarks.bench_startup --history benchmarks/startup_history.jsonl
+"""
+import argparse
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+APPS = ("main", "endpoints")
+
+
+def app_env(**overrides) -> dict:
+    return {
+        **os.environ,
+        "LLM_BACKEND": "mistral",
+        "MISTRAL_API_KEY": os.environ.get("MISTRAL_API_KEY", "benchmark"),
+        "LOG_LEVEL": "WARNING",
+        # Nothing listens here, so the calls a warm start's question pool makes fail locally
+        "MISTRAL_BASE_URL": "http://127.0.0.1:9/v1",
+        **overrides,
+    }
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *flags, "-c", code], env=app_env(), capture_output=True, text=True, check=True)
+
+
+def best_of(repeat: int, measure) -> float:
+    return min(measure() for _ in range(repeat))
+
+
+def import_seconds(module: str) -> float:
+    start = time.perf_counter()
+    run_python(f"import {module}")
+    return time.perf_counter() - start
+
+
+def chain_build_seconds(module: str) -> float:
+    code = f"import time, {module}; start = time.perf_counter(); {module}.chains.load(); print(time.perf_counter() - start)"
+    return float(run_python(code).stdout)
+
+
+def slowest_imports(module: str, top: int):
+    """The app's direct imports ranked by cumulative import time, from -X importtime."""
+    stderr = run_python(f"import {module}", "-X", "importtime").stderr
+    totals = {}
+    for line in stderr.splitlines():
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \|( *)(\S+)", line)
+        if match and len(match.group(2)) == 3:  # imported directly by the app module
+            totals[match.group(3)] = int(match.group(1)) / 1e6
+    return sorted(totals.items(), key=lambda item: -item[1])[:top]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def ready_seconds(module: str, warm: bool, timeout: float = 60) -> float:
+    port = free_port()
+    env = app_env(WARM_MODELS_ON_STARTUP="1" if warm else "0")
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        env=env
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                    return time.perf_counter() - start
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.01)
+        raise RuntimeError(f"{module} did not answer / within {timeout:.0f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+
+def run(repeat: int, top: int) -> dict:
+    results = {}
+    for module in APPS:
+        results[module] = {
+            "import_s": best_of(repeat, lambda: import_seconds(module)),
+            "chains_s": best_of(repeat, lambda: chain_build_seconds(module)),
+            "ready_lazy_s": best_of(repeat, lambda: ready_seconds(module, warm=False)),
+            "ready_warm_s": best_of(repeat, lambda: ready_seconds(module, warm=True)),
+        }
+        stats = results[module]
+        print(f"{module}: import {stats['import_s']:.2f}s, chains {stats['chains_s']:.2f}s, "
+              f"/ ready in {stats['ready_lazy_s']:.2f}s lazy, {stats['ready_warm_s']:.2f}s warm")
+        for name, seconds in slowest_imports(module, top):
+            print(f"    {name:<32}{seconds:>8.3f}s")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of this many runs")
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list per app")
+    parser.add_argument("--history", help="append the results to this JSON lines file")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.top)
+    if args.history:
+        with open(args.history, "a") as f:
+            f.write(json.dumps({"time": time.time(), "commit": git_commit(), "apps": results}) + "\n")
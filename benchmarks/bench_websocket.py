@@ -0,0 +1,130 @@
+"""Measure how many game WebSockets one worker holds, their memory cost and event fan-out latency.
+
+Starts endpoints.py under uvicorn (one worker, fake backend), opens
+--connections sockets spread over --games games and reads the worker's
+resident memory before and after. Then it resets each game --events
+times; every reset pushes a `stage` event to all of that game's
+sockets, and the delay from publish to receipt is measured on each.
+
+Run from the repo root:
+    python -m benchmarks.bench_websocket --connections 2000 --games 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+from websockets.asyncio.client import connect
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def rss_kib(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    raise RuntimeError("VmRSS not found")
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "fake",
+        "MISTRAL_API_KEY": "benchmark",
+        "LOG_LEVEL": "WARNING",
+        "QUESTION_POOL_SIZE": "0",
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "endpoints:app", "--port", str(port), "--log-level", "warning",
+         "--ws", "websockets-sansio", "--backlog", "4096"],
+        env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+async def listen(ws, latencies: list, received: asyncio.Queue):
+    async for text in ws:
+        message = json.loads(text)
+        if message["type"] == "stage":
+            latencies.append(time.time() - message["ts"])
+            received.put_nowait(None)
+
+
+async def run(args):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    port = free_port()
+    server = start_server(port)
+    sockets, listeners = [], []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            await wait_ready(client)
+            sessions = [(await client.post("/new-game")).json()["session_id"] for _ in range(args.games)]
+            await asyncio.sleep(0.5)
+            before = rss_kib(server.pid)
+
+            start = time.perf_counter()
+            for n in range(args.connections):
+                ws = await connect(f"ws://127.0.0.1:{port}/ws/game?session_id={sessions[n % args.games]}", max_queue=None)
+                await ws.recv()  # The state snapshot
+                sockets.append(ws)
+            connect_seconds = time.perf_counter() - start
+            await asyncio.sleep(0.5)
+            after = rss_kib(server.pid)
+            stats = (await client.get("/metrics")).text
+            open_sockets = next(
+                float(line.split()[-1]) for line in stats.splitlines() if line.startswith("ws_connections")
+            )
+
+            latencies: list = []
+            received: asyncio.Queue = asyncio.Queue()
+            listeners = [asyncio.create_task(listen(ws, latencies, received)) for ws in sockets]
+            per_game = [args.connections // args.games + (n < args.connections % args.games) for n in range(args.games)]
+            for _ in range(args.events):
+                for session_id, subscribers in zip(sessions, per_game):
+                    await client.get("/reset-game", params={"session_id": session_id})
+                    for _ in range(subscribers):
+                        await asyncio.wait_for(received.get(), 30)
+
+        latencies.sort()
+        print(f"sockets open: {int(open_sockets)} in {connect_seconds:.1f}s over {args.games} games")
+        print(f"worker RSS: {before / 1024:.1f} MiB -> {after / 1024:.1f} MiB, "
+              f"{(after - before) / max(1, len(sockets)):.1f} KiB per socket")
+        print(f"fan-out: {len(latencies)} deliveries, p50 {latencies[len(latencies) // 2] * 1000:.1f} ms, "
+              f"p99 {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000:.1f} ms, "
+              f"max {latencies[-1] * 1000:.1f} ms")
+    finally:
+        for task in listeners:
+            task.cancel()
+        await asyncio.gather(*(ws.close() for ws in sockets), return_exceptions=True)
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=2000)
+    parser.add_argument("--games", type=int, default=10, help="games the sockets are spread over")
+    parser.add_argument("--events", type=int, default=20, help="events pushed to each game")
+    args = parser.parse_args()
+    asyncio.run(run(args))
@@ -0,0 +1,184 @@
+"""Async load generator for the game backends.
+
+By default the target app is imported in-process with LLM_BACKEND=fake,
+so no network access or Mistral key is needed. Pass --url to drive a
+running server instead.
+
+Scenarios:
+    game       full endpoints.py games, one session per game
+    endpoints  independent traffic against main.py's routes
+
+Run from the repo root, e.g.:
+    python -m benchmarks.loadtest --scenario game --concurrency 50 --duration 20
+    python -m benchmarks.loadtest --scenario endpoints --url http://localhost:8000
+
+Exits non-zero when the error rate or any route's p95 exceeds the given
+budgets, so it can gate CI on performance regressions.
+"""
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+SCENARIO_APPS = {"game": "endpoints", "endpoints": "main"}
+
+PIZZA_QUESTION = "If you were a pizza topping, which one would you be and why?"
+RATING_PAYLOADS = [
+    {"conversation": "What is your ideal date?\nContestant1: A long walk on the beach with deep conversations!", "round_number": 1},
+    {"conversation": "What is your ideal date?\nContestant1: A McDonalds drive-thru", "round_number": 1},
+]
+
+
+class Recorder:
+    def __init__(self):
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, method: str, route: str, **kwargs) -> Optional[httpx.Response]:
+        self.requests[route] += 1
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, route, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            return None
+        self.latencies[route].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def play_game(client: httpx.AsyncClient, recorder: Recorder):
+    response = await recorder.call(client, "POST", "/new-game")
+    if response is None or response.status_code != 200:
+        return
+    params = {"session_id": response.json()["session_id"]}
+    await recorder.call(client, "GET", "/host-introduction", params=params)
+    await recorder.call(client, "GET", "/ai-introduction", params=params)
+    for _ in range(3):
+        await recorder.call(client, "GET", "/get-question", params=params)
+    for _ in range(3):
+        await recorder.call(client, "GET", "/next-question", params=params)
+        await recorder.call(client, "POST", "/submit-answer/contestant3", params=params, json={"answer": "Pineapple, obviously."})
+        await recorder.call(client, "GET", "/get-ai-answers", params=params)
+        await recorder.call(client, "GET", "/rate-all-answers", params=params)
+        await recorder.call(client, "GET", "/next-round", params=params)
+    await recorder.call(client, "GET", "/announce-winner", params=params)
+
+
+async def hit_endpoint(client: httpx.AsyncClient, recorder: Recorder):
+    choice = random.randrange(4)
+    if choice == 0:
+        await recorder.call(client, "GET", "/ai-introduction")
+    elif choice == 1:
+        await recorder.call(client, "GET", "/get-question")
+    elif choice == 2:
+        await recorder.call(client, "GET", "/get-ai-answers", params={"question": PIZZA_QUESTION, "contestant": random.choice([1, 2])})
+    else:
+        await recorder.call(client, "POST", "/rate-answer", json=random.choice(RATING_PAYLOADS))
+
+
+def make_client(scenario: str, url: Optional[str]) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+    os.environ.setdefault("LLM_BACKEND", "fake")
+    os.environ.setdefault("MISTRAL_API_KEY", "loadtest")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    app = importlib.import_module(SCENARIO_APPS[scenario]).app
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app, raise_app_exceptions=False), base_url="http://loadtest", timeout=60)
+
+
+async def run(scenario: str, url: Optional[str], concurrency: int, duration: float, iterations: Optional[int]) -> dict:
+    recorder = Recorder()
+    flow = play_game if scenario == "game" else hit_endpoint
+    deadline = time.perf_counter() + duration
+    remaining = [iterations] if iterations else None
+
+    async def worker(client):
+        while time.perf_counter() < deadline:
+            if remaining is not None:
+                if remaining[0] <= 0:
+                    return
+                remaining[0] -= 1
+            await flow(client, recorder)
+
+    async with make_client(scenario, url) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    routes = {}
+    for route in sorted(recorder.requests):
+        latencies = sorted(recorder.latencies[route])
+        routes[route] = {
+            "requests": recorder.requests[route],
+            "errors": recorder.errors[route],
+            "rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+        }
+    total = sum(recorder.requests.values())
+    return {
+        "scenario": scenario,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+        "requests": total,
+        "rps": total / elapsed,
+        "errors": sum(recorder.errors.values()),
+        "routes": routes,
+    }
+
+
+def print_report(report: dict):
+    print(f"scenario {report['scenario']}, concurrency {report['concurrency']}: "
+          f"{report['requests']} requests in {report['elapsed_s']:.1f}s ({report['rps']:.1f} req/s), {report['errors']} errors")
+    print(f"{'route':<28}{'count':>8}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, stats in report["routes"].items():
+        print(f"{route:<28}{stats['requests']:>8}{stats['errors']:>8}{stats['rps']:>9.1f}"
+              f"{stats['p50_ms']:>9.0f}{stats['p95_ms']:>9.0f}{stats['p99_ms']:>9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIO_APPS), default="game")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--iterations", type=int, help="stop after this many games/requests")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--max-p95-ms", type=float, help="fail if any route's p95 exceeds this")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.scenario, args.url, args.concurrency, args.duration, args.iterations))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    failures = []
+    if report["requests"] and report["errors"] / report["requests"] > args.max_error_rate:
+        failures.append(f"error rate above {args.max_error_rate:.1%}")
+    if args.max_p95_ms is not None:
+        failures += [
+            f"{route} p95 {stats['p95_ms']:.0f} ms > {args.max_p95_ms:.0f} ms"
+            for route, stats in report["routes"].items() if stats["p95_ms"] > args.max_p95_ms
+        ]
+    if failures:
+        raise SystemExit("Load test budget exceeded: " + "; ".join(failures))
@@ -0,0 +1,306 @@
+"""Offline content pack: questions, AI contestant answers and host lines generated ahead of time.
+
+`python -m content_pack build` asks endpoints.py's chains for every
+entry once and writes them to one file. The server maps that file and
+serves from it instead of calling the model (see CONTENT_PACK_MODE), so
+a game can run on a few rating calls alone.
+
+A pack is a header (magic, format version, index length), a JSON index
+naming the entries, a table of string offsets and the strings
+themselves, UTF-8 and each stored once. Opening a pack reads the header
+and the index; strings are decoded from the mapping only when served.
+
+Run from the repo root:
+    LLM_BACKEND=fake python -m content_pack build --out content.pack --answers 3
+    python -m content_pack info content.pack
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import random
+import struct
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from logs import get_logger
+
+logger = get_logger("content_pack")
+
+# Pack file to serve from; empty generates everything live
+CONTENT_PACK = os.getenv("CONTENT_PACK", "")
+# "pack-first" serves from the pack whenever it has an entry, "fallback" only when the model is unavailable or shedding
+CONTENT_PACK_MODE = os.getenv("CONTENT_PACK_MODE", "pack-first")
+# In pack-first mode, the share of lookups that still go live so the content keeps some variety
+CONTENT_PACK_LIVE_RATIO = float(os.getenv("CONTENT_PACK_LIVE_RATIO", "0.1"))
+
+MAGIC = b"RZPACK"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<6sHI")
+OFFSET = struct.Struct("<II")
+COUNT = struct.Struct("<I")
+
+
+def personality_id(personality: str) -> str:
+    return hashlib.sha256(personality.encode()).hexdigest()[:12]
+
+
+def template_hash(template: str) -> str:
+    return hashlib.sha256(template.encode()).hexdigest()[:12]
+
+
+class ContentPack:
+    """A content pack file mapped into memory, or an empty pack that serves nothing.
+
+    Entries are lists of string IDs: "question", "host_intro" and
+    "ai_intro" directly, "winner:<contestant>" per contestant and
+    "answer:<personality_id>" as one list per question, in the order of
+    "question". Kinds built from a prompt other than the one in
+    `templates` are never served.
+    """
+
+    def __init__(
+        self,
+        path: str = "",
+        templates: Optional[Dict[str, str]] = None,
+        mode: str = CONTENT_PACK_MODE,
+        live_ratio: float = CONTENT_PACK_LIVE_RATIO,
+    ):
+        if mode not in ("pack-first", "fallback"):
+            raise ValueError(f"Unknown CONTENT_PACK_MODE {mode!r}; use pack-first or fallback")
+        self.path = path
+        self.mode = mode
+        self.live_ratio = live_ratio
+        self.index: dict = {}
+        self.stale: List[str] = []
+        self.lookups: Counter = Counter()
+        self._mm: Optional[mmap.mmap] = None
+        self._questions: Optional[Dict[str, int]] = None
+        if path:
+            self._open(path, templates or {})
+
+    def __bool__(self) -> bool:
+        return self._mm is not None
+
+    def _open(self, path: str, templates: Dict[str, str]):
+        with open(path, "rb") as f:
+            # The mapping outlives the file object; pages are read in only when a string is served
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, length = HEADER.unpack_from(self._mm)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a content pack")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"{path} has pack format {version}; this server reads format {FORMAT_VERSION}, rebuild it")
+        self.index = json.loads(self._mm[HEADER.size:HEADER.size + length])
+        strings = HEADER.size + length
+        self._count = COUNT.unpack_from(self._mm, strings)[0]
+        self._offsets = strings + COUNT.size
+        self._blob = self._offsets + 4 * (self._count + 1)
+        built_with = self.index["templates"]
+        self.stale = [kind for kind, template in templates.items() if built_with.get(kind) != template_hash(template)]
+        if self.stale:
+            logger.warning("[CONTENT PACK] %s was built from other prompts for %s; generating those live", path, ", ".join(self.stale))
+        logger.info("[CONTENT PACK] Loaded %s (version %s, %d strings, %s mode)", path, self.index["version"], self._count, self.mode)
+
+    def string(self, string_id: int) -> str:
+        start, end = OFFSET.unpack_from(self._mm, self._offsets + 4 * string_id)
+        return self._mm[self._blob + start:self._blob + end].decode()
+
+    def _question_ids(self) -> Dict[str, int]:
+        # Decoded on the first answer lookup: only the questions, never the answers
+        if self._questions is None:
+            self._questions = {self.string(string_id): n for n, string_id in enumerate(self.index["entries"].get("question", []))}
+        return self._questions
+
+    def variants(self, kind: str, key=None) -> Sequence[int]:
+        """String IDs of every entry for `kind` (and `key`)."""
+        if not self or kind in self.stale:
+            return ()
+        entries = self.index["entries"]
+        if kind == "answer":
+            question, personality = key
+            n = self._question_ids().get(question)
+            rows = entries.get(f"answer:{personality_id(personality)}")
+            return rows[n] if n is not None and rows else ()
+        return entries.get(kind if key is None else f"{kind}:{key}", ())
+
+    def lookup(self, kind: str, key=None) -> Optional[str]:
+        variants = self.variants(kind, key)
+        return self.string(random.choice(variants)) if variants else None
+
+    def pick(self, kind: str, key=None) -> Optional[str]:
+        """An entry to serve instead of a live call, or None to go live (no pack, no entry, or the live share)."""
+        if not self or self.mode != "pack-first":
+            return None
+        if random.random() < self.live_ratio:
+            self.lookups[kind, "live"] += 1
+            return None
+        text = self.lookup(kind, key)
+        self.lookups[kind, "miss" if text is None else "pack"] += 1
+        return text
+
+    def fallback(self, kind: str, key=None) -> Optional[str]:
+        """An entry to serve because the live call failed, in either mode."""
+        text = self.lookup(kind, key)
+        if text is not None:
+            self.lookups[kind, "fallback"] += 1
+        return text
+
+    def stats(self) -> dict:
+        if not self:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "path": self.path,
+            "version": self.index["version"],
+            "built_at": self.index["built_at"],
+            "mode": self.mode,
+            "live_ratio": self.live_ratio,
+            "strings": self._count,
+            "stale": self.stale,
+            "entries": self.index["counts"],
+            "lookups": {f"{kind}:{result}": count for (kind, result), count in sorted(self.lookups.items())},
+        }
+
+    def collect(self):
+        """Samples for the /metrics endpoint."""
+        return [
+            ("content_pack_lookups_total", "counter", "Content pack lookups by kind and where the text came from", [
+                ({"kind": kind, "result": result}, count) for (kind, result), count in sorted(self.lookups.items())
+            ]),
+        ]
+
+
+def write_pack(path: str, index: dict, strings: List[str]):
+    """Write a pack file, renamed into place once complete."""
+    encoded = [text.encode() for text in strings]
+    offsets = [0]
+    for data in encoded:
+        offsets.append(offsets[-1] + len(data))
+    index_bytes = json.dumps(index, separators=(",", ":")).encode()
+    with open(path + ".tmp", "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index_bytes)))
+        f.write(index_bytes)
+        f.write(COUNT.pack(len(encoded)))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        for data in encoded:
+            f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+class StringTable:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def add(self, text: str) -> int:
+        if text not in self._ids:
+            self._ids[text] = len(self.strings)
+            self.strings.append(text)
+        return self._ids[text]
+
+    def add_all(self, texts: List[Optional[str]]) -> List[int]:
+        """IDs for the texts that were generated, each once; failures (None) are skipped."""
+        return list(dict.fromkeys(self.add(text.strip()) for text in texts if text and text.strip()))
+
+
+async def build(out: str, answers: int = 3, host_lines: int = 5, extra_questions: int = 0, concurrency: int = 8) -> dict:
+    """Generate a pack with endpoints.py's chains and prompts and write it to `out`."""
+    # Imported here so opening a pack never loads the app
+    import endpoints
+    from fanout import gather_bounded
+    from llm_clients import close_http_client
+    from main import questions as seed_questions
+
+    chains = endpoints.chains.load()
+    # Every line should be its own generation, not one of the response cache's few variants
+    for leaf in (leaf for chain in chains.values() for leaf in chain.leaves()):
+        leaf.cache = None
+    failures = Counter()
+
+    async def generate(chain: str, inputs: List[dict]) -> List[Optional[str]]:
+        results = await gather_bounded((chains[chain].ainvoke(each) for each in inputs), concurrency)
+        for result in results:
+            if isinstance(result, Exception):
+                failures[chain] += 1
+                logger.warning("[CONTENT PACK] %s generation failed: %r", chain, result)
+        return [None if isinstance(result, Exception) else result["text"] for result in results]
+
+    start = time.perf_counter()
+    table = StringTable()
+    try:
+        generated = await generate("question_generator", [{}] * extra_questions)
+        # Stored as the game stores them, so a question served from a pack finds its answers
+        question_ids = table.add_all(list(seed_questions) + [text.strip('"') for text in generated if text])
+        questions = [table.strings[string_id] for string_id in question_ids]
+        entries: Dict[str, list] = {"question": question_ids}
+
+        personalities = list(dict.fromkeys(
+            list(endpoints.AI_PERSONALITIES.values()) + [endpoints.AUTO_ANSWER_PERSONALITY] + endpoints.ROOM_PERSONALITIES
+        ))
+        for personality in personalities:
+            results = await generate(
+                "contestant_answer",
+                [{"question": question, "personality": personality} for question in questions for _ in range(answers)]
+            )
+            entries[f"answer:{personality_id(personality)}"] = [
+                table.add_all(results[n * answers:(n + 1) * answers]) for n in range(len(questions))
+            ]
+            logger.info("[CONTENT PACK] Answers for %r done", personality[:40])
+        for kind in ("host_intro", "ai_intro"):
+            entries[kind] = table.add_all(await generate(kind, [{}] * host_lines))
+        for contestant in endpoints.ContestantType:
+            entries[f"winner:{contestant.value}"] = table.add_all(await generate("winner", [{"winner": contestant}] * host_lines))
+    finally:
+        await close_http_client()
+
+    blob = "\0".join(table.strings).encode()
+    index = {
+        "version": hashlib.sha256(blob).hexdigest()[:12],
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "models": {chain: [leaf.model_name for leaf in chains[chain].leaves()]
+                   for chain in ("question_generator", "contestant_answer", "host_intro", "ai_intro", "winner")},
+        "templates": {kind: template_hash(template) for kind, template in endpoints.pack_templates().items()},
+        "personalities": {personality_id(personality): personality for personality in personalities},
+        "counts": {
+            "questions": len(question_ids),
+            "answers": sum(len(ids) for name, rows in entries.items() if name.startswith("answer:") for ids in rows),
+            "host_lines": sum(len(ids) for name, ids in entries.items() if name in ("host_intro", "ai_intro") or name.startswith("winner:")),
+        },
+        "entries": entries,
+    }
+    write_pack(out, index, table.strings)
+    return {
+        **index["counts"],
+        "version": index["version"],
+        "bytes": os.path.getsize(out),
+        "failed": dict(failures),
+        "seconds": round(time.perf_counter() - start, 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="generate a pack with the configured models")
+    build_parser.add_argument("--out", default="content.pack")
+    build_parser.add_argument("--answers", type=int, default=3, help="answers per question and personality")
+    build_parser.add_argument("--host-lines", type=int, default=5, help="introductions and winner lines of each kind")
+    build_parser.add_argument("--extra-questions", type=int, default=0, help="questions to generate on top of main.py's seed questions")
+    build_parser.add_argument("--concurrency", type=int, default=8, help="LLM calls in flight at once")
+    info_parser = commands.add_parser("info", help="describe a pack")
+    info_parser.add_argument("path")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(json.dumps(asyncio.run(build(args.out, args.answers, args.host_lines, args.extra_questions, args.concurrency)), indent=2))
+    else:
+        pack = ContentPack(args.path)
+        print(json.dumps({**pack.stats(), "models": pack.index["models"], "personalities": pack.index["personalities"]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
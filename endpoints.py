@@ -1,34 +1,64 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import functools
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
 from pydantic import BaseModel
-from typing import List, Dict, Literal
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Dict, Literal, Optional, Tuple
 from enum import Enum
-from random import uniform
 import os
-import re
-from langchain_mistralai import ChatMistralAI
+from llm_clients import chat_model, close_http_client
+from game_store import GAME_STORE_URL, GameStoreConflict, open_game_store
+from fanout import gather_bounded
+from llm_chains import LazyChains, SamplingProfile, WARM_MODELS_ON_STARTUP
+from ratings import NEUTRAL_RATING, parse_rating, parse_batch_ratings, validate_rating, validate_batch_ratings
+from routing import MODEL_TIERS, route_chain, validate_question
+from streaming import error_data, iter_once, stream_chains, stream_events
+from game_channel import GameChannel, Subscriber
+from content_pack import CONTENT_PACK, ContentPack
+from pipeline import Pipeline
+from question_pool import QuestionPool
+from rooms import ROOM_FANOUT_CONCURRENCY, Room, ranking_groups, setup_room
+from speculation import Speculator
+from scheduler import Overloaded, llm_scheduler
+from resilience import ProviderUnavailable, degraded_header, llm_guard, mark_degraded
+from response_cache import ResponseCache, RESPONSE_CACHE_VARIANTS
+from contextlib import asynccontextmanager
+from fastapi.responses import JSONResponse, PlainTextResponse
+from logs import get_logger
+import metrics
 
+logger = get_logger("endpoints")
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_MODELS_ON_STARTUP:
+        chains.load()
+        # Otherwise the pool starts filling on the first question it is asked for
+        question_pool.warm()
+    await games.start()
+    await room_store.start()
+    yield
+    for driver in list(game_drivers.values()):
+        driver.cancel()
+    await channel.close()
+    await question_pool.close()
+    await speculator.close()
+    response_cache.close()
+    await games.close()
+    await room_store.close()
+    await close_http_client()
+    chains.reset()
 
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-llm = ChatMistralAI(
-    model="mistral-large-latest",  # Select the model
-    temperature=0,                # Control randomness
-    max_retries=2                 # Number of retries for failed requests
-)
+router = APIRouter()
+
+async def game_store_conflict(request, exc: GameStoreConflict):
+    return JSONResponse(status_code=409, content={"detail": "Game is busy, retry."})
 
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
+# "batched" rates a whole round in one call, "per_answer" makes one call per contestant
+RATING_MODE = os.getenv("RATING_MODE", "batched")
 
 class ContestantType(str, Enum):
     USER = "contestant3"  # User is always contestant3
@@ -39,10 +69,21 @@ AI_PERSONALITIES = {
     ContestantType.AI_ONE: "Confident and ambitious, with a dry sense of humor and passion for adventure",
     ContestantType.AI_TWO: "Submissive, pathetic lier, with a low self-esteem and a passion for being a doormat. Also enjoys giving back handed compliments. Loves licking feet"
 }
+# Stands in for the user when they submit without an answer
+AUTO_ANSWER_PERSONALITY = "Friendly and outgoing, enjoys outdoor activities and meaningful conversations"
+# Handed out in turn to the AI contestants of a room
+ROOM_PERSONALITIES = [
+    AI_PERSONALITIES[ContestantType.AI_ONE],
+    AI_PERSONALITIES[ContestantType.AI_TWO],
+    AUTO_ANSWER_PERSONALITY,
+    "Hopeless romantic who quotes love poetry and cries at every wedding",
+    "Deadpan engineer who treats every date like an optimization problem",
+    "Chaotic free spirit who has lived in nine countries and owns no furniture"
+]
 
 class GameState:
     def __init__(self):
-        print("\n[GAME STATE] Initializing new game...")
+        logger.debug("[GAME STATE] Initializing new game...")
         self.current_round = 1
         self.max_rounds = 3
         self.contestant_ratings: Dict[str, List[float]] = {
@@ -53,7 +94,7 @@ class GameState:
         self.conversation_history = []
         self.questions = []
         self.stage = "host_intro"
-        print("[GAME STATE] Game initialized")
+        logger.debug("[GAME STATE] Game initialized")
 
     def advance_stage(self):
         stages = [
@@ -70,10 +111,36 @@ class GameState:
         current_index = stages.index(self.stage)
         if current_index < len(stages) - 1:
             self.stage = stages[current_index + 1]
-            print(f"[GAME STATE] Stage advanced to: {self.stage}")
+            logger.debug("[GAME STATE] Stage advanced to: %s", self.stage)
         else:
             raise HTTPException(status_code=400, detail="Game is already complete!")
 
+    def round_conversations(self, round_number: int) -> List[dict]:
+        return [conv for conv in self.conversation_history if conv["round"] == round_number]
+
+    def to_dict(self) -> dict:
+        return {
+            "current_round": self.current_round,
+            "max_rounds": self.max_rounds,
+            "contestant_ratings": {contestant.value: ratings for contestant, ratings in self.contestant_ratings.items()},
+            "conversation_history": [{**conv, "contestant": conv["contestant"].value} for conv in self.conversation_history],
+            "questions": self.questions,
+            "stage": self.stage
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "GameState":
+        state = cls.__new__(cls)
+        state.current_round = data["current_round"]
+        state.max_rounds = data["max_rounds"]
+        state.contestant_ratings = {ContestantType(c): ratings for c, ratings in data["contestant_ratings"].items()}
+        state.conversation_history = [
+            {**conv, "contestant": ContestantType(conv["contestant"])} for conv in data["conversation_history"]
+        ]
+        state.questions = data["questions"]
+        state.stage = data["stage"]
+        return state
+
 class QuestionInput(BaseModel):
     question: str
 
@@ -83,13 +150,32 @@ class ContestantAnswer(BaseModel):
 class ConversationInput(BaseModel):
     conversation: str
 
-game_state = GameState()
+# Every change to a game goes through transition(), so workers sharing a store can't race
+games = open_game_store(GAME_STORE_URL, GameState)
+# Pushes each game's events to the WebSockets watching it on this worker
+channel = GameChannel()
+
+def game_position(game_state: GameState) -> dict:
+    return {"stage": game_state.stage, "round": game_state.current_round}
+
+async def transition(session_id: str, mutate: Callable, *args):
+    """games.transition, pushing a `stage` event to the game's sockets whenever it moves the game on."""
+    @functools.wraps(mutate)  # Keeps mutate's name, which the game journal records
+    def tracked(game_state: GameState, *args):
+        before = game_position(game_state)
+        result = mutate(game_state, *args)
+        return result, before, game_position(game_state)
+
+    result, before, after = await games.transition(session_id, tracked, *args)
+    if before != after:
+        channel.publish(session_id, "stage", after)
+    return result
 
-# Templates
-host_intro_template = PromptTemplate(
-    input_variables=[],
-    template="You are a charismatic game show host like Steve Harvey. You don't talk a lot. Give an exciting introduction to this dating show called Rizztral where an AI bachelorette will choose between three contestants. ONLY ONE SENTENCE ANSWER"
-)
+async def get_game_state(session_id: str = Query("default")) -> GameState:
+    return await games.load(session_id)
+
+# Templates, parsed into PromptTemplates when the chains are built
+host_intro_template = "You are a charismatic game show host like Steve Harvey. You don't talk a lot. Give an exciting introduction to this dating show called Rizztral where an AI bachelorette will choose between three contestants. ONLY ONE SENTENCE ANSWER"
 
 ai_system_prompt = """You are a charming and witty AI bachelorette on a dating show.
 Your personality traits:
@@ -98,14 +184,9 @@ Your personality traits:
 - Loves being sexy
 Keep responses concise and engaging. The questions should be flirty and playful, revealing of personality, and original. Also they should be able to be answered in a sentence or two. They should not require any other demonstration or action than a text response."""
 
-ai_intro_template = PromptTemplate(
-    input_variables=[],
-    template=ai_system_prompt + "Introduce yourself to the contestants! ONLY ONE SENTENCE ANSWER"
-)
+ai_intro_template = ai_system_prompt + "Introduce yourself to the contestants! ONLY ONE SENTENCE ANSWER"
 
-question_generator_template = PromptTemplate(
-    input_variables=[],
-    template="""You are a witty AI bachelorette host generating a question for your contestants.
+question_generator_template = """You are a witty AI bachelorette host generating a question for your contestants.
 The question should be:
 - Flirty and playful
 - Slightly humorous but not crude
@@ -118,73 +199,197 @@ Examples of the tone we want:
 "How would you handle a first date if we suddenly got trapped in an escape room?"
 
 Generate a creative, funny dating show question. ONLY RETURN THE QUESTION."""
-)
 
-contestant_answer_template = PromptTemplate(
-    input_variables=["question", "personality"],
-    template="""You are a contestant on a dating show answering this question: {question}
+contestant_answer_template = """You are a contestant on a dating show answering this question: {question}
 Your personality type is: {personality}
 Give a flirty but authentic answer, staying true to your character. Keep it under 3 sentences."""
-)
 
-rating_template = PromptTemplate(
-    input_variables=["conversation", "round_number"],
-    template="""Based on the following conversation in round {round_number}:
+rating_template = """Based on the following conversation in round {round_number}:
 {conversation}
 Rate the contestant's response from 0-10 based on compatibility, authenticity, and chemistry.
 Only respond with a number from 0 to 10. NO explanations or extra words!"""
-)
 
-winner_announcement_template = PromptTemplate(
-    input_variables=["winner"],
-    template="""You are a charismatic game show host announcing the winner. 
+batch_rating_template = """Based on the following answers in round {round_number}:
+{conversations}
+Rate each contestant's response from 0-10 based on compatibility, authenticity, and chemistry.
+Respond ONLY with a JSON object mapping each contestant ID ({contestant_ids}) to a number from 0 to 10. NO explanations or extra words!"""
+
+winner_announcement_template = """You are a charismatic game show host announcing the winner. 
 If the winner is 'contestant1', call them 'our adventurous bachelor'.
 If the winner is 'contestant2', call them 'our poetic soul'.
 If the winner is 'contestant3', call them 'our charming contestant'.
 The winner is: {winner}
 Give an exciting announcement. ONLY ONE SENTENCE ANSWER."""
-)
-
-chains = {
-    "host_intro": LLMChain(llm=llm, prompt=host_intro_template),
-    "ai_intro": LLMChain(llm=llm, prompt=ai_intro_template),
-    "question_generator": LLMChain(llm=llm, prompt=question_generator_template),
-    "contestant_answer": LLMChain(llm=llm, prompt=contestant_answer_template),
-    "rating": LLMChain(llm=llm, prompt=rating_template),
-    "winner": LLMChain(llm=llm, prompt=winner_announcement_template)
+
+room_winner_template = """You are a charismatic game show host announcing the winner among {contestants} contestants.
+The winner is {winner}, whose personality is: {personality}
+Give an exciting announcement. ONLY ONE SENTENCE ANSWER."""
+
+SAMPLING_PROFILES = {
+    "host_intro": SamplingProfile(temperature=0.7),
+    "ai_intro": SamplingProfile(temperature=0.7),
+    "question_generator": SamplingProfile(temperature=(0.8, 0.95)),  # Higher temperature for more creative questions
+    "contestant_answer": SamplingProfile(temperature=(0.7, 1.0)),
+    "rating": SamplingProfile(temperature=(0.5, 0.8)),
+    "batch_rating": SamplingProfile(temperature=(0.5, 0.8), json_mode=True),
+    "winner": SamplingProfile(temperature=0.7),
+    "room_winner": SamplingProfile(temperature=0.7)
 }
 
-@app.get("/host-introduction")
-async def get_host_introduction():
-    if game_state.stage != "host_intro":
-        raise HTTPException(status_code=400, detail="Not the correct stage for host introduction.")
-    print("\n[HOST INTRO] Getting host introduction...")
-    response = await chains["host_intro"].ainvoke({})
-    game_state.advance_stage()
-    return {"text": response["text"]}
-
-@app.get("/ai-introduction")
-async def get_ai_introduction():
-    if game_state.stage != "ai_intro":
-        raise HTTPException(status_code=400, detail="Not the correct stage for AI introduction.")
-    print("\n[AI INTRO] Getting AI introduction...")
-    response = await chains["ai_intro"].ainvoke({})
+# Chains whose output doesn't depend on the game, cached as a handful of variants per prompt
+response_cache = ResponseCache()
+CACHE_VARIANTS = {
+    "host_intro": RESPONSE_CACHE_VARIANTS,
+    "ai_intro": RESPONSE_CACHE_VARIANTS,
+    "winner": RESPONSE_CACHE_VARIANTS
+}
+
+# Validated roles start on the small model and escalate to the large one on a bad reply
+VALIDATORS = {
+    "question_generator": validate_question,
+    "rating": validate_rating,
+    "batch_rating": validate_batch_ratings
+}
+
+def build_chains() -> dict:
+    llm = chat_model(
+        model=MODEL_TIERS["large"],   # Select the model
+        temperature=0,                # Control randomness
+        max_retries=2                 # Number of retries for failed requests
+    )
+    # Cheap first tier for roles whose replies can be checked (see routing.ROLE_TIERS)
+    llm_small = chat_model(model=MODEL_TIERS["small"], temperature=0, max_retries=2)
+    return {
+        name: route_chain(
+            name, {"small": llm_small, "large": llm}, prompt, SAMPLING_PROFILES[name], VALIDATORS.get(name),
+            cache=response_cache if name in CACHE_VARIANTS else None,
+            cache_variants=CACHE_VARIANTS.get(name, 1)
+        )
+        for name, prompt in [
+            ("host_intro", host_intro_template),
+            ("ai_intro", ai_intro_template),
+            ("question_generator", question_generator_template),
+            ("contestant_answer", contestant_answer_template),
+            ("rating", rating_template),
+            ("batch_rating", batch_rating_template),
+            ("winner", winner_announcement_template),
+            ("room_winner", room_winner_template)
+        ]
+    }
+
+# Model clients are created on the first request that needs a chain, keeping imports and cold starts cheap
+chains = LazyChains(build_chains)
+
+def pack_templates() -> Dict[str, str]:
+    """The prompt behind each kind of content pack entry; entries built from another prompt are not served."""
+    return {
+        "question": question_generator_template,
+        "answer": contestant_answer_template,
+        "host_intro": host_intro_template,
+        "ai_intro": ai_intro_template,
+        "winner": winner_announcement_template
+    }
+
+# Pre-generated questions, answers and host lines served instead of live calls (see content_pack.py)
+content_pack = ContentPack(CONTENT_PACK, pack_templates())
+
+async def chain_text(chain: str, inputs: dict) -> str:
+    return (await chains[chain].ainvoke(inputs))["text"]
+
+async def pack_or_live(kind: str, live: Callable[[], Awaitable[str]], key=None) -> str:
+    """Text from the content pack or from `live()`, per CONTENT_PACK_MODE.
+
+    A live call that fails because the model is unavailable or shedding
+    load is answered from the pack when it has an entry.
+    """
+    text = content_pack.pick(kind, key)
+    if text is not None:
+        return text
+    try:
+        return await live()
+    except Overloaded as e:  # ProviderUnavailable included
+        text = content_pack.fallback(kind, key)
+        if text is None:
+            raise
+        mark_degraded("content_pack", e)
+        return text
+
+def pack_or_stream(kind: str, chain: str, inputs: dict, key=None) -> AsyncIterator[str]:
+    text = content_pack.pick(kind, key)
+    return iter_once(text) if text is not None else chains[chain].astream(inputs)
+
+@router.get("/")
+async def read_root():
+    """Health check endpoint"""
+    return {"status": "alive", "message": "Server is running"}
+
+def require_stage(game_state: GameState, stage: str, detail: str):
+    if game_state.stage != stage:
+        raise HTTPException(status_code=400, detail=detail)
+
+def commit_introduction(game_state: GameState, stage: str, text: str) -> dict:
+    # Another request may have moved the game on while this one was generating
+    if game_state.stage != stage:
+        raise HTTPException(status_code=409, detail="Game stage changed while generating.")
     game_state.advance_stage()
-    return {"text": response["text"]}
+    return {"text": text}
+
+@router.get("/host-introduction")
+async def get_host_introduction(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    require_stage(game_state, "host_intro", "Not the correct stage for host introduction.")
+    logger.debug("[HOST INTRO] Getting host introduction...")
+    text = await pack_or_live("host_intro", lambda: chain_text("host_intro", {}))
+    return await transition(session_id, commit_introduction, "host_intro", text)
+
+@router.get("/host-introduction/stream")
+async def stream_host_introduction(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    require_stage(game_state, "host_intro", "Not the correct stage for host introduction.")
+    return stream_chains(
+        [("host", pack_or_stream("host_intro", "host_intro", {}))],
+        lambda results: transition(session_id, commit_introduction, "host_intro", results[0])
+    )
+
+@router.get("/ai-introduction")
+async def get_ai_introduction(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    require_stage(game_state, "ai_intro", "Not the correct stage for AI introduction.")
+    logger.debug("[AI INTRO] Getting AI introduction...")
+    text = await pack_or_live("ai_intro", lambda: chain_text("ai_intro", {}))
+    return await transition(session_id, commit_introduction, "ai_intro", text)
+
+@router.get("/ai-introduction/stream")
+async def stream_ai_introduction(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    require_stage(game_state, "ai_intro", "Not the correct stage for AI introduction.")
+    return stream_chains(
+        [("bachelorette", pack_or_stream("ai_intro", "ai_intro", {}))],
+        lambda results: transition(session_id, commit_introduction, "ai_intro", results[0])
+    )
 
-@app.get("/get-question")
-async def get_question():
+async def generate_question() -> str:
+    return await chain_text("question_generator", {})
+
+# Questions don't depend on the game, so one pool serves every session
+question_pool = QuestionPool(generate_question)
+# AI answers are started as soon as a round's question is known and claimed when the client asks for them
+speculator = Speculator()
+
+metrics.register_collector(games.collect)
+metrics.register_collector(question_pool.collect)
+metrics.register_collector(speculator.collect)
+metrics.register_collector(channel.collect)
+metrics.register_collector(content_pack.collect)
+metrics.register_collector(response_cache.collect)
+metrics.register_collector(llm_scheduler.collect)
+metrics.register_collector(llm_guard.collect)
+
+async def next_question() -> str:
+    return await pack_or_live("question", question_pool.get)
+
+def commit_question(game_state: GameState, text: str) -> dict:
     if game_state.stage != "question_submission":
-        raise HTTPException(status_code=400, detail="Not the correct stage for getting a question.")
-    
-    # Use higher temperature for more creative questions
-    llm.temperature = uniform(0.8, 0.95)
-    response = await chains["question_generator"].ainvoke({})
-    llm.temperature = 0.7  # Reset temperature
-    
-    question = response["text"].strip('"')  # Remove any quotes from the response
+        raise HTTPException(status_code=409, detail="Game stage changed while generating.")
+    question = text.strip('"')  # Remove any quotes from the response
     game_state.questions.append(question)
-    print(f"\n[QUESTION] Generated question: {question}")
+    logger.debug("[QUESTION] Generated question: %s", question)
     
     if len(game_state.questions) == game_state.max_rounds:
         game_state.advance_stage()
@@ -195,19 +400,75 @@ async def get_question():
         "total_rounds": game_state.max_rounds
     }
 
-@app.get("/next-question")
-async def get_next_question():
+async def save_question(session_id: str, text: str) -> dict:
+    result = await transition(session_id, commit_question, text)
+    if result["round"] == result["total_rounds"]:
+        # That was the last question, so round 1 can start
+        await speculate_current_round(session_id)
+    return result
+
+@router.get("/get-question")
+async def get_question(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    require_stage(game_state, "question_submission", "Not the correct stage for getting a question.")
+    return await save_question(session_id, await next_question())
+
+@router.get("/get-question/stream")
+async def stream_question(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    require_stage(game_state, "question_submission", "Not the correct stage for getting a question.")
+    pooled = content_pack.pick("question") or question_pool.pop()
+    if pooled is not None:
+        return stream_chains(
+            [("question", iter_once(pooled))],
+            lambda results: save_question(session_id, results[0])
+        )
+    return stream_chains(
+        [("question", chains["question_generator"].astream({}))],
+        lambda results: save_question(session_id, results[0])
+    )
+
+@router.get("/question-pool/stats")
+async def question_pool_stats():
+    return question_pool.stats()
+
+@router.get("/content-pack/stats")
+async def content_pack_stats():
+    return content_pack.stats()
+
+@router.get("/speculation/stats")
+async def speculation_stats():
+    return speculator.stats()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return await response_cache.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return metrics.render()
+
+def start_round(game_state: GameState) -> dict:
     if game_state.stage != "round_start":
         raise HTTPException(status_code=400, detail="Not the correct stage for starting a round.")
     if game_state.current_round > len(game_state.questions):
         raise HTTPException(status_code=400, detail="No more questions available.")
     question = game_state.questions[game_state.current_round - 1]
     game_state.advance_stage()  # Move to answer_submission stage
-    print(f"\n[QUESTION] Returning question for round {game_state.current_round}: {question}")
+    logger.debug("[QUESTION] Returning question for round %d: %s", game_state.current_round, question)
     return {"text": question}
 
-@app.post("/submit-answer/{contestant_id}")
-async def submit_answer(contestant_id: ContestantType, answer: ContestantAnswer = None):
+@router.get("/next-question")
+async def get_next_question(session_id: str = Query("default")):
+    result = await transition(session_id, start_round)
+    await speculate_current_round(session_id)
+    return result
+
+@router.post("/submit-answer/{contestant_id}")
+async def submit_answer(
+    contestant_id: ContestantType,
+    answer: ContestantAnswer = None,
+    session_id: str = Query("default"),
+    game_state: GameState = Depends(get_game_state)
+):
     if game_state.stage != "answer_submission":
         raise HTTPException(status_code=400, detail="Not the correct stage for answering")
     
@@ -218,122 +479,391 @@ async def submit_answer(contestant_id: ContestantType, answer: ContestantAnswer
     
     # If no answer provided, generate a dummy response
     if answer is None:
-        llm.temperature = uniform(0.7, 1.0)
-        response = await chains["contestant_answer"].ainvoke({
+        answer_text = await generate_contestant_answer({
             "question": current_question,
-            "personality": "Friendly and outgoing, enjoys outdoor activities and meaningful conversations"
+            "personality": AUTO_ANSWER_PERSONALITY
         })
-        answer_text = response["text"]
-        llm.temperature = 0.7  # Reset temperature
     else:
         answer_text = answer.answer
     
+    await transition(session_id, commit_user_answer, contestant_id, answer_text)
+    
+    return {
+        "message": "Answer submitted successfully",
+        "answer": answer_text,
+        "was_auto_generated": answer is None
+    }
+
+def commit_user_answer(game_state: GameState, contestant_id: ContestantType, answer_text: str):
+    if game_state.stage != "answer_submission":
+        raise HTTPException(status_code=409, detail="Game stage changed while generating.")
     game_state.conversation_history.append({
         "round": game_state.current_round,
         "contestant": contestant_id,
-        "question": current_question,
+        "question": game_state.questions[game_state.current_round - 1],
         "answer": answer_text
     })
-    
+
+def pending_ai_contestants(game_state: GameState) -> List[ContestantType]:
+    answered = {conv["contestant"] for conv in game_state.round_conversations(game_state.current_round)}
+    # Only ask for contestants that failed or never ran, so a retry keeps earlier answers
+    return [c for c in [ContestantType.AI_ONE, ContestantType.AI_TWO] if c not in answered]
+
+def contestant_answer_inputs(game_state: GameState, contestant_id: ContestantType) -> dict:
     return {
-        "message": "Answer submitted successfully",
-        "answer": answer_text,
-        "was_auto_generated": answer is None
+        "question": game_state.questions[game_state.current_round - 1],
+        "personality": AI_PERSONALITIES[contestant_id]
     }
 
-@app.get("/get-ai-answers")
-async def get_ai_answers():
+def answer_key(inputs: dict) -> tuple:
+    return (inputs["question"], inputs["personality"])
+
+async def generate_contestant_answer(inputs: dict) -> str:
+    return await pack_or_live("answer", lambda: chain_text("contestant_answer", inputs), answer_key(inputs))
+
+def speculation_key(game_state: GameState, contestant_id: ContestantType) -> tuple:
+    return (game_state.current_round, contestant_id, game_state.questions[game_state.current_round - 1])
+
+async def speculate_current_round(session_id: str):
+    """Start the AI answers for the round the game is about to play, unless they are already running."""
+    game_state = await games.load(session_id)
+    if game_state.stage not in PLAY_ROUND_STAGES or game_state.current_round > len(game_state.questions):
+        return
+    for contestant_id in pending_ai_contestants(game_state):
+        inputs = contestant_answer_inputs(game_state, contestant_id)
+        speculator.start(
+            session_id, speculation_key(game_state, contestant_id), lambda inputs=inputs: generate_contestant_answer(inputs)
+        )
+
+async def claim_speculative_answer(group: str, key: tuple) -> Optional[str]:
+    """The answer speculation produced under this key, or None if there is none to use."""
+    task = speculator.take(group, key)
+    if task is None:
+        return None
+    # Wait without awaiting the task itself, so our own cancellation isn't mistaken for the task's
+    try:
+        await asyncio.wait({task})
+    except asyncio.CancelledError:
+        task.cancel()  # Taken from the speculator, so nobody else will claim it
+        raise
+    if task.cancelled():
+        return None  # The game was reset meanwhile
+    try:
+        return task.result()
+    except Exception as e:
+        logger.warning("[SPECULATION] Speculative answer for %s failed, generating it live: %r", key, e)
+        return None
+
+async def ai_answer(session_id: str, game_state: GameState, contestant_id: ContestantType) -> str:
+    answer = await claim_speculative_answer(session_id, speculation_key(game_state, contestant_id))
+    if answer is None:
+        answer = await generate_contestant_answer(contestant_answer_inputs(game_state, contestant_id))
+    return answer
+
+async def stream_ai_answer(session_id: str, game_state: GameState, contestant_id: ContestantType) -> AsyncIterator[str]:
+    answer = await claim_speculative_answer(session_id, speculation_key(game_state, contestant_id))
+    if answer is not None:
+        yield answer
+        return
+    inputs = contestant_answer_inputs(game_state, contestant_id)
+    async for chunk in pack_or_stream("answer", "contestant_answer", inputs, answer_key(inputs)):
+        yield chunk
+
+def commit_ai_answers(game_state: GameState, pending: List[ContestantType], results: List) -> Tuple[dict, dict]:
+    """Store the answers that succeeded, in contestant order, and return all answers so far with the failures."""
     if game_state.stage != "answer_submission":
-        raise HTTPException(status_code=400, detail="Not the correct stage for AI answers")
-    
+        raise HTTPException(status_code=409, detail="Game stage changed while generating.")
     current_question = game_state.questions[game_state.current_round - 1]
-    ai_answers = {}
     
-    for contestant_id in [ContestantType.AI_ONE, ContestantType.AI_TWO]:
-        llm.temperature = uniform(0.7, 1.0)
-        
-        response = await chains["contestant_answer"].ainvoke({
-            "question": current_question,
-            "personality": AI_PERSONALITIES[contestant_id]
-        })
-        
-        ai_answers[contestant_id] = response["text"]
-        
+    errors = {}
+    answered = {conv["contestant"] for conv in game_state.round_conversations(game_state.current_round)}
+    for contestant_id, result in zip(pending, results):
+        if isinstance(result, Exception):
+            logger.warning("[AI ANSWERS] Failed to generate answer for %s: %r", contestant_id.value, result)
+            errors[contestant_id] = str(result)
+            continue
+        if contestant_id in answered:
+            continue  # Another request stored an answer for them meanwhile
         game_state.conversation_history.append({
             "round": game_state.current_round,
             "contestant": contestant_id,
             "question": current_question,
-            "answer": response["text"]
+            "answer": result
         })
     
-    llm.temperature = 0.7
-    game_state.stage = "rating"
+    ai_answers = {
+        conv["contestant"]: conv["answer"]
+        for conv in game_state.round_conversations(game_state.current_round)
+        if conv["contestant"] != ContestantType.USER
+    }
+    if not errors:
+        game_state.stage = "rating"
+    return ai_answers, errors
+
+def raise_if_shed(results: Iterable):
+    """Surface a call shed by admission control as its 429/503, so clients honour Retry-After."""
+    for result in results:
+        if isinstance(result, Overloaded):
+            raise result
+
+async def finish_ai_answers(session_id: str, pending: List[ContestantType], results: List) -> dict:
+    # Partial answers are saved before the 502, so a retry only asks for the missing ones
+    ai_answers, errors = await transition(session_id, commit_ai_answers, pending, results)
+    raise_if_shed(results)
+    if errors:
+        raise HTTPException(
+            status_code=502,
+            detail={"message": "Some AI answers failed, retry to fill them in", "answers": ai_answers, "errors": errors}
+        )
     return ai_answers
 
-@app.get("/rate-all-answers")
-async def rate_all_answers():
-    if game_state.stage != "rating":
-        raise HTTPException(status_code=400, detail="Not the correct stage for rating")
+@router.get("/get-ai-answers")
+async def get_ai_answers(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    require_stage(game_state, "answer_submission", "Not the correct stage for AI answers")
     
-    current_round_convos = [
-        conv for conv in game_state.conversation_history 
-        if conv["round"] == game_state.current_round
-    ]
+    pending = pending_ai_contestants(game_state)
+    results = await gather_bounded(ai_answer(session_id, game_state, contestant_id) for contestant_id in pending)
+    return await finish_ai_answers(session_id, pending, results)
+
+@router.get("/get-ai-answers/stream")
+async def stream_ai_answers(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    require_stage(game_state, "answer_submission", "Not the correct stage for AI answers")
     
-    ratings = {}
-    for conv in current_round_convos:
-        conversation = f"Question: {conv['question']}\nAnswer: {conv['answer']}"
-        
-        llm.temperature = uniform(0.5, 0.8)
-        
+    pending = pending_ai_contestants(game_state)
+    return stream_chains(
+        [
+            (contestant_id.value, stream_ai_answer(session_id, game_state, contestant_id))
+            for contestant_id in pending
+        ],
+        lambda results: finish_ai_answers(session_id, pending, results),
+        partial_ok=True
+    )
+
+async def rate_answer(conv: dict, round_number: int) -> float:
+    conversation = f"Question: {conv['question']}\nAnswer: {conv['answer']}"
+    try:
         response = await chains["rating"].ainvoke({
             "conversation": conversation,
-            "round_number": game_state.current_round
+            "round_number": round_number
         })
-        
-        rating = float(re.search(r'\d+(?:\.\d+)?', response["text"]).group())
-        game_state.contestant_ratings[conv["contestant"]].append(rating)
-        ratings[conv["contestant"]] = rating
+    except ProviderUnavailable as e:
+        # Keep the game moving on a neutral score rather than failing the round
+        logger.warning("[RATING] Rating model unavailable, using a neutral score: %r", e)
+        mark_degraded("neutral_rating", e)
+        return NEUTRAL_RATING
+    return parse_rating(response["text"])
+
+async def rate_answers_batched(convs: List[dict], round_number: int) -> Dict[str, float]:
+    """Rate a whole round in one call, keyed by contestant ID value."""
+    return await rate_batch({conv["contestant"].value: conv for conv in convs}, round_number)
+
+async def rate_batch(convs: Dict[str, dict], round_number: int) -> Dict[str, float]:
+    """Rate answers keyed by contestant ID in one batch_rating call."""
+    conversations = "\n\n".join(
+        f"Contestant ID: {contestant_id}\nQuestion: {conv['question']}\nAnswer: {conv['answer']}"
+        for contestant_id, conv in convs.items()
+    )
+    contestant_ids = list(convs)
+    response = await chains["batch_rating"].ainvoke({
+        "conversations": conversations,
+        "round_number": round_number,
+        "contestant_ids": ", ".join(contestant_ids)
+    })
+    return parse_batch_ratings(response["text"], contestant_ids)
+
+def commit_ratings(game_state: GameState, current_round: int, pending: List[dict], results: Dict[str, object]) -> Tuple[dict, dict]:
+    """Store the ratings that succeeded and return every rating for the round with the failures."""
+    if game_state.stage != "rating" or game_state.current_round != current_round:
+        raise HTTPException(status_code=409, detail="Game stage changed while rating.")
     
-    llm.temperature = 0.7
-    game_state.stage = "next_round"
+    errors = {}
+    for conv in pending:
+        result = results[conv["contestant"].value]
+        if isinstance(result, Exception):
+            logger.warning("[RATING] Failed to rate %s: %r", conv["contestant"].value, result)
+            errors[conv["contestant"]] = str(result)
+            continue
+        # Skip anyone another request rated meanwhile
+        if len(game_state.contestant_ratings[conv["contestant"]]) < current_round:
+            game_state.contestant_ratings[conv["contestant"]].append(result)
+    
+    ratings = {
+        contestant: contestant_ratings[current_round - 1]
+        for contestant, contestant_ratings in game_state.contestant_ratings.items()
+        if len(contestant_ratings) >= current_round
+    }
+    if not errors:
+        game_state.stage = "next_round"
+    return ratings, errors
+
+@router.get("/rate-all-answers")
+async def rate_all_answers(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    if game_state.stage != "rating":
+        raise HTTPException(status_code=400, detail="Not the correct stage for rating")
+    
+    current_round = game_state.current_round
+    # A contestant already holding a rating for this round was rated by an earlier, partially failed call
+    pending = [
+        conv for conv in game_state.round_conversations(current_round)
+        if len(game_state.contestant_ratings[conv["contestant"]]) < current_round
+    ]
+    
+    batched = {}
+    if RATING_MODE == "batched" and pending:
+        try:
+            batched = await rate_answers_batched(pending, current_round)
+        except Exception as e:
+            logger.warning("[RATING] Batched rating failed, falling back to per-answer ratings: %r", e)
+    
+    # Anyone the batched reply left out or scored invalidly is rated on their own
+    unrated = [conv for conv in pending if conv["contestant"].value not in batched]
+    results = dict(zip(
+        (conv["contestant"].value for conv in unrated),
+        await gather_bounded(rate_answer(conv, current_round) for conv in unrated)
+    ))
+    results.update(batched)
+    
+    ratings, errors = await transition(session_id, commit_ratings, current_round, pending, results)
+    raise_if_shed(results.values())
+    if errors:
+        raise HTTPException(
+            status_code=502,
+            detail={"message": "Some ratings failed, retry to fill them in", "ratings": ratings, "errors": errors}
+        )
     
     return ratings
 
-@app.get("/next-round")
-async def next_round():
+def advance_round(game_state: GameState) -> dict:
     if game_state.stage != "next_round":
         raise HTTPException(status_code=400, detail="Not the correct stage for next round.")
     
     game_state.current_round += 1
-    print(f"[NEXT ROUND] Current round is now {game_state.current_round}")
+    logger.debug("[NEXT ROUND] Current round is now %d", game_state.current_round)
     
     if game_state.current_round > game_state.max_rounds:
         game_state.stage = "winner_announcement"
-        print("[NEXT ROUND] Final round completed, moving to winner announcement")
+        logger.debug("[NEXT ROUND] Final round completed, moving to winner announcement")
         return {"current_round": game_state.current_round, "game_complete": True}
     
     game_state.stage = "round_start"
     return {"current_round": game_state.current_round, "game_complete": False}
 
-@app.get("/announce-winner")
-async def announce_winner():
-    print("\n[WINNER ANNOUNCEMENT] Starting winner announcement process...")
-    
+@router.get("/next-round")
+async def next_round(session_id: str = Query("default")):
+    result = await transition(session_id, advance_round)
+    if not result["game_complete"]:
+        await speculate_current_round(session_id)
+    return result
+
+# /play-round runs everything after the question in one request, from either of these stages
+PLAY_ROUND_STAGES = ("round_start", "answer_submission")
+
+def require_round_unplayed(game_state: GameState):
+    if game_state.stage not in PLAY_ROUND_STAGES or game_state.round_conversations(game_state.current_round):
+        raise HTTPException(status_code=400, detail="Not the correct stage for playing a round.")
+    if game_state.current_round > len(game_state.questions):
+        raise HTTPException(status_code=400, detail="No more questions available.")
+
+def round_pipeline(session_id: str, game_state: GameState, answer: Optional[ContestantAnswer]) -> Pipeline:
+    """Every contestant's answer, each followed by its own rating as soon as the answer is in.
+
+    Ratings are always per answer here, whatever RATING_MODE says: a
+    batched rating would have to wait for the slowest answer.
+    """
+    round_number = game_state.current_round
+    question = game_state.questions[round_number - 1]
+    pipeline = Pipeline()
+
+    async def user_answer() -> str:
+        if answer is not None:
+            return answer.answer
+        return await generate_contestant_answer({"question": question, "personality": AUTO_ANSWER_PERSONALITY})
+
+    async def rating(text: str) -> float:
+        return await rate_answer({"question": question, "answer": text}, round_number)
+
+    pipeline.add(("answer", ContestantType.USER), user_answer)
+    for contestant_id in (ContestantType.AI_ONE, ContestantType.AI_TWO):
+        pipeline.add(("answer", contestant_id), lambda contestant_id=contestant_id: ai_answer(session_id, game_state, contestant_id))
+    for contestant_id in ContestantType:
+        pipeline.add(("rating", contestant_id), rating, ("answer", contestant_id))
+    return pipeline
+
+async def round_events(pipeline: Pipeline, answers: dict, ratings: dict) -> AsyncIterator[Tuple[str, dict]]:
+    """Run the round, collecting results into `answers` and `ratings` and yielding a progress event for each."""
+    async for (kind, contestant_id), result in pipeline.run():
+        (answers if kind == "answer" else ratings)[contestant_id] = result
+        yield kind, {"contestant": contestant_id.value, kind: result}
+
+def commit_round(game_state: GameState, round_number: int, answers: dict, ratings: dict) -> dict:
+    """Store a whole round from /play-round and move the game on, all in one transition."""
+    if (
+        game_state.stage not in PLAY_ROUND_STAGES
+        or game_state.current_round != round_number
+        or game_state.round_conversations(round_number)
+    ):
+        raise HTTPException(status_code=409, detail="Game stage changed while playing the round.")
+    question = game_state.questions[round_number - 1]
+    for contestant_id in ContestantType:
+        game_state.conversation_history.append({
+            "round": round_number,
+            "contestant": contestant_id,
+            "question": question,
+            "answer": answers[contestant_id]
+        })
+        game_state.contestant_ratings[contestant_id].append(ratings[contestant_id])
+    game_state.stage = "next_round"
+    return {
+        "round": round_number,
+        "question": question,
+        "answers": {contestant_id.value: answers[contestant_id] for contestant_id in ContestantType},
+        "ratings": {contestant_id.value: ratings[contestant_id] for contestant_id in ContestantType},
+        **advance_round(game_state)
+    }
+
+@router.post("/play-round")
+async def play_round(
+    answer: ContestantAnswer = None,
+    session_id: str = Query("default"),
+    game_state: GameState = Depends(get_game_state)
+):
+    """Play the rest of the round from the user's answer (generated if omitted) and advance to the next one."""
+    require_round_unplayed(game_state)
+    round_number = game_state.current_round
+    answers, ratings = {}, {}
+    async for _ in round_events(round_pipeline(session_id, game_state, answer), answers, ratings):
+        pass
+    return await transition(session_id, commit_round, round_number, answers, ratings)
+
+@router.post("/play-round/stream")
+async def stream_play_round(
+    answer: ContestantAnswer = None,
+    session_id: str = Query("default"),
+    game_state: GameState = Depends(get_game_state)
+):
+    """/play-round as Server-Sent Events: an `answer` and a `rating` event per contestant, then `done`."""
+    require_round_unplayed(game_state)
+    round_number = game_state.current_round
+    answers, ratings = {}, {}
+    return stream_events(
+        round_events(round_pipeline(session_id, game_state, answer), answers, ratings),
+        lambda: transition(session_id, commit_round, round_number, answers, ratings)
+    )
+
+def commit_winner(game_state: GameState):
     if game_state.stage != "winner_announcement":
-        print(f"[WINNER ANNOUNCEMENT] Error: Invalid game stage {game_state.stage}")
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Not the correct stage for announcing winner. Current stage: {game_state.stage}"
-        )
-    
-    print("[WINNER ANNOUNCEMENT] Calculating average ratings for all contestants...")
-    print(f"[WINNER ANNOUNCEMENT] Raw ratings: {game_state.contestant_ratings}")
+        raise HTTPException(status_code=409, detail="Game stage changed while announcing the winner.")
+    game_state.stage = "game_complete"
+
+def tally_winner(game_state: GameState) -> Tuple[ContestantType, Dict[ContestantType, float]]:
+    """The contestant with the best average rating, and every contestant's average."""
+    logger.debug("[WINNER ANNOUNCEMENT] Calculating average ratings for all contestants...")
+    logger.debug("[WINNER ANNOUNCEMENT] Raw ratings: %s", game_state.contestant_ratings)
     
     # Add error handling for empty ratings
     for contestant, ratings in game_state.contestant_ratings.items():
         if not ratings:
-            print(f"[WINNER ANNOUNCEMENT] Warning: No ratings found for {contestant}")
+            logger.warning("[WINNER ANNOUNCEMENT] No ratings found for %s", contestant.value)
             raise HTTPException(
                 status_code=400, 
                 detail=f"Missing ratings for contestant: {contestant}"
@@ -344,26 +874,387 @@ async def announce_winner():
         for contestant, ratings in game_state.contestant_ratings.items()
     }
     
-    print(f"[WINNER ANNOUNCEMENT] Calculated average ratings: {avg_ratings}")
+    logger.debug("[WINNER ANNOUNCEMENT] Calculated average ratings: %s", avg_ratings)
     
     winner = max(avg_ratings.items(), key=lambda x: x[1])[0]
-    print(f"[WINNER ANNOUNCEMENT] Winner determined: {winner} with average rating {avg_ratings[winner]}")
+    logger.info("[WINNER ANNOUNCEMENT] Winner determined: %s with average rating %.2f", winner.value, avg_ratings[winner])
+    return winner, avg_ratings
+
+@router.get("/announce-winner")
+async def announce_winner(session_id: str = Query("default"), game_state: GameState = Depends(get_game_state)):
+    logger.debug("[WINNER ANNOUNCEMENT] Starting winner announcement process...")
+    
+    if game_state.stage != "winner_announcement":
+        logger.debug("[WINNER ANNOUNCEMENT] Error: Invalid game stage %s", game_state.stage)
+        raise HTTPException(
+            status_code=400, 
+            detail=f"Not the correct stage for announcing winner. Current stage: {game_state.stage}"
+        )
     
-    print("[WINNER ANNOUNCEMENT] Generating winner announcement message...")
-    response = await chains["winner"].ainvoke({"winner": winner})
-    print(f"[WINNER ANNOUNCEMENT] Generated announcement: {response['text']}")
+    winner, avg_ratings = tally_winner(game_state)
     
-    game_state.stage = "game_complete"
-    print("[WINNER ANNOUNCEMENT] Game stage updated to: game_complete")
+    logger.debug("[WINNER ANNOUNCEMENT] Generating winner announcement message...")
+    text = await pack_or_live("winner", lambda: chain_text("winner", {"winner": winner}), winner.value)
+    logger.debug("[WINNER ANNOUNCEMENT] Generated announcement: %s", text)
+    
+    await transition(session_id, commit_winner)
+    logger.debug("[WINNER ANNOUNCEMENT] Game stage updated to: game_complete")
     
     return {
-        "text": response["text"], 
+        "text": text, 
         "winner": winner,
         "final_ratings": avg_ratings
     }
 
-@app.get("/reset-game")
-async def reset_game():
-    global game_state
-    game_state = GameState()
-    return {"message": "Game reset successfully"}
\ No newline at end of file
+# Games being played over WebSockets on this worker, and the user's answers waiting for them
+game_drivers: Dict[str, asyncio.Task] = {}
+socket_answers: Dict[str, asyncio.Queue] = {}
+
+async def stream_to_channel(session_id: str, source: str, stream: AsyncIterator[str]) -> str:
+    """Push each chunk to the game's sockets as a `token` event and return the full text."""
+    parts = []
+    async for chunk in stream:
+        parts.append(chunk)
+        channel.publish(session_id, "token", {"source": source, "text": chunk})
+    return "".join(parts)
+
+# Waits for the user's answer to the current round; None has one generated, as /submit-answer does
+AnswerSource = Callable[[str], Awaitable[Optional[ContestantAnswer]]]
+
+async def socket_answer(session_id: str) -> Optional[ContestantAnswer]:
+    return await socket_answers.setdefault(session_id, asyncio.Queue(1)).get()
+
+async def drive_stage(session_id: str, game_state: GameState, next_answer: AnswerSource):
+    """Play the game's current stage, pushing its events to the game's sockets."""
+    stage = game_state.stage
+    if stage in ("host_intro", "ai_intro"):
+        source = "host" if stage == "host_intro" else "bachelorette"
+        text = await stream_to_channel(session_id, source, pack_or_stream(stage, stage, {}))
+        channel.publish(session_id, "text", {"source": source, **await transition(session_id, commit_introduction, stage, text)})
+    elif stage == "question_submission":
+        channel.publish(session_id, "question", await save_question(session_id, await next_question()))
+    elif stage == "round_start":
+        channel.publish(session_id, "round", {"round": game_state.current_round, **await get_next_question(session_id)})
+    elif stage == "answer_submission" and not game_state.round_conversations(game_state.current_round):
+        round_number = game_state.current_round
+        channel.publish(session_id, "awaiting_answer", {"round": round_number, "question": game_state.questions[round_number - 1]})
+        answer = await next_answer(session_id)
+        answers, ratings = {}, {}
+        async for kind, data in round_events(round_pipeline(session_id, game_state, answer), answers, ratings):
+            channel.publish(session_id, kind, data)
+        channel.publish(session_id, "round_result", await transition(session_id, commit_round, round_number, answers, ratings))
+    elif stage == "answer_submission":
+        # Part of this round was played over HTTP; finish it the same way
+        channel.publish(session_id, "answers", await get_ai_answers(session_id, game_state))
+    elif stage == "rating":
+        channel.publish(session_id, "ratings", await rate_all_answers(session_id, game_state))
+    elif stage == "next_round":
+        await next_round(session_id)
+    elif stage == "winner_announcement":
+        winner, avg_ratings = tally_winner(game_state)
+        text = await stream_to_channel(session_id, "host", pack_or_stream("winner", "winner", {"winner": winner}, winner.value))
+        await transition(session_id, commit_winner)
+        channel.publish(session_id, "winner", {
+            "text": text,
+            "winner": winner.value,
+            "final_ratings": {contestant.value: rating for contestant, rating in avg_ratings.items()}
+        })
+
+async def drive_game(session_id: str, next_answer: AnswerSource = socket_answer):
+    """Play the game on from wherever it is until it is complete.
+
+    Conflicts and shed calls are retried; any other error is pushed to
+    the game's sockets as an `error` event and raised.
+    """
+    while True:
+        game_state = await games.load(session_id)
+        if game_state.stage == "game_complete":
+            return
+        try:
+            await drive_stage(session_id, game_state, next_answer)
+        except GameStoreConflict:
+            continue
+        except Overloaded as e:
+            channel.publish(session_id, "error", {**error_data(e), "retry_after": e.retry_after})
+            await asyncio.sleep(e.retry_after)
+        except HTTPException as e:
+            if e.status_code == 409:
+                continue  # Someone moved the game on meanwhile; carry on from its new stage
+            channel.publish(session_id, "error", error_data(e))
+            raise
+        except Exception as e:
+            logger.exception("[GAME DRIVER] Game %s failed in stage %s", session_id, game_state.stage)
+            channel.publish(session_id, "error", error_data(e))
+            raise
+
+def start_driver(session_id: str):
+    driver = game_drivers.get(session_id)
+    if driver is not None and not driver.done():
+        return
+    driver = game_drivers[session_id] = asyncio.create_task(drive_game(session_id))
+
+    def finished(task: asyncio.Task):
+        if game_drivers.get(session_id) is task:
+            del game_drivers[session_id]
+        # The error already went out to the sockets; a later `start` retries
+        task.cancelled() or task.exception()
+
+    driver.add_done_callback(finished)
+
+def stop_driver(session_id: str):
+    driver = game_drivers.pop(session_id, None)
+    if driver is not None:
+        driver.cancel()
+    socket_answers.pop(session_id, None)
+
+@router.websocket("/ws/game")
+async def game_socket(websocket: WebSocket, session_id: str = Query("default")):
+    """Push the game's events as they happen: `stage` changes, streamed `token`s, answers, ratings and the winner.
+
+    Clients send `{"type": "start"}` to have the server play the game,
+    and `{"type": "answer", "answer": "..."}` when it is `awaiting_answer`
+    (without "answer" one is generated for them). Every socket on the
+    game receives every event.
+    """
+    async def on_message(subscriber: Subscriber, message: dict):
+        if message.get("type") == "start":
+            start_driver(session_id)
+        elif message.get("type") == "answer":
+            text = message.get("answer")
+            if text is not None and not isinstance(text, str):
+                channel.send(subscriber, "error", {"status_code": 400, "detail": "answer must be a string."})
+                return
+            if (await games.load(session_id)).stage != "answer_submission":
+                channel.send(subscriber, "error", {"status_code": 400, "detail": "Not the correct stage for answering"})
+                return
+            try:
+                socket_answers.setdefault(session_id, asyncio.Queue(1)).put_nowait(
+                    None if text is None else ContestantAnswer(answer=text)
+                )
+            except asyncio.QueueFull:
+                channel.send(subscriber, "error", {"status_code": 409, "detail": "An answer is already in for this round."})
+        else:
+            channel.send(subscriber, "error", {"status_code": 400, "detail": f"Unknown message type: {message.get('type')!r}"})
+
+    game_state = await games.load(session_id)
+    try:
+        await channel.serve(websocket, session_id, on_message, snapshot=game_position(game_state))
+    finally:
+        # Nobody is left to play for
+        if not channel.subscribers(session_id):
+            stop_driver(session_id)
+
+@router.post("/new-game")
+async def new_game():
+    session_id, _ = await games.create()
+    return {"session_id": session_id}
+
+@router.get("/reset-game")
+async def reset_game(session_id: str = Query("default")):
+    speculator.cancel(session_id)
+    stop_driver(session_id)
+    game_state = await games.reset(session_id)
+    channel.publish(session_id, "stage", game_position(game_state))
+    return {"message": "Game reset successfully", "session_id": session_id}
+
+@router.get("/sessions/stats")
+async def session_stats():
+    return await games.stats()
+
+# Rooms: any number of human and AI contestants, scored in batches into a running score table
+room_store = open_game_store(GAME_STORE_URL, Room, name="rooms")
+
+class RoomConfig(BaseModel):
+    humans: int = 1
+    ai: int = 2
+    rounds: int = 3
+
+async def get_room(room_id: str) -> Room:
+    # Only POST /rooms creates rooms; an unknown id must not leave one behind
+    room = await room_store.load(room_id, create=False)
+    if room is None or room.stage == "setup":
+        raise HTTPException(status_code=404, detail="No such room.")
+    return room
+
+def room_summary(room_id: str, room: Room) -> dict:
+    return {
+        "room_id": room_id,
+        "stage": room.stage,
+        "round": room.current_round,
+        "max_rounds": room.max_rounds,
+        "question": room.question() if room.current_round else None,
+        "contestants": len(room.contestants),
+        "answered": len(room.answers),
+        "leader": room.scores.leader,
+        "standings": room.scores.standings(10)
+    }
+
+@router.post("/rooms")
+async def create_room(config: RoomConfig = None):
+    config = config or RoomConfig()
+    room_id, _ = await room_store.create()
+    result = await room_store.transition(room_id, setup_room, config.humans, config.ai, config.rounds, ROOM_PERSONALITIES)
+    return {"room_id": room_id, **result}
+
+@router.get("/rooms/{room_id}")
+async def get_room_state(room_id: str, room: Room = Depends(get_room)):
+    return room_summary(room_id, room)
+
+def start_room_round(room: Room, question: str) -> dict:
+    if room.stage != "waiting":
+        raise HTTPException(status_code=409, detail="Room stage changed while picking a question.")
+    room.current_round += 1
+    room.questions.append(question)
+    room.answers = {}
+    room.stage = "answering"
+    return {"round": room.current_round, "question": question}
+
+def room_answer_inputs(room: Room, contestant_id: str) -> dict:
+    # Humans who didn't answer get one generated, as /submit-answer does
+    return {"question": room.question(), "personality": room.contestants[contestant_id]["personality"] or AUTO_ANSWER_PERSONALITY}
+
+@router.post("/rooms/{room_id}/next-round")
+async def next_room_round(room_id: str, room: Room = Depends(get_room)):
+    if room.stage != "waiting":
+        raise HTTPException(status_code=400, detail="Not the correct stage for starting a round.")
+    result = await room_store.transition(room_id, start_room_round, await next_question())
+    room = await room_store.load(room_id)
+    # AI contestants start answering while the humans type
+    for contestant_id in room.ai():
+        inputs = room_answer_inputs(room, contestant_id)
+        speculator.start(room_id, (room.current_round, contestant_id), lambda inputs=inputs: generate_contestant_answer(inputs))
+    return result
+
+def commit_room_answers(room: Room, round_number: int, contestant_ids: List[str], results: List) -> Dict[str, str]:
+    """Store the answers that succeeded (keeping any already in) and return every answer for the round."""
+    if room.stage != "answering" or room.current_round != round_number:
+        raise HTTPException(status_code=409, detail="Room stage changed while answering.")
+    for contestant_id, result in zip(contestant_ids, results):
+        if isinstance(result, Exception):
+            logger.warning("[ROOM] Failed to answer for %s: %r", contestant_id, result)
+        elif contestant_id not in room.answers:
+            room.answers[contestant_id] = result
+    return dict(room.answers)
+
+@router.post("/rooms/{room_id}/answer/{contestant_id}")
+async def submit_room_answer(
+    room_id: str,
+    contestant_id: str,
+    answer: ContestantAnswer = None,
+    room: Room = Depends(get_room)
+):
+    if room.stage != "answering":
+        raise HTTPException(status_code=400, detail="Not the correct stage for answering")
+    if room.contestants.get(contestant_id, {}).get("kind") != "human":
+        raise HTTPException(status_code=400, detail="Only human contestants answer here")
+    if answer is None:
+        answer_text = await generate_contestant_answer(room_answer_inputs(room, contestant_id))
+    else:
+        answer_text = answer.answer
+    await room_store.transition(room_id, commit_room_answers, room.current_round, [contestant_id], [answer_text])
+    return {
+        "message": "Answer submitted successfully",
+        "answer": answer_text,
+        "was_auto_generated": answer is None
+    }
+
+async def room_answer(room_id: str, room: Room, contestant_id: str) -> str:
+    answer = await claim_speculative_answer(room_id, (room.current_round, contestant_id))
+    if answer is None:
+        answer = await generate_contestant_answer(room_answer_inputs(room, contestant_id))
+    return answer
+
+async def rank_room_answers(question: str, round_number: int, answers: Dict[str, str]) -> Dict[str, object]:
+    """Score every answer in groups of ROOM_RANKING_GROUP_SIZE, one batch_rating call per group.
+
+    Anyone a group's reply leaves out or scores invalidly is rated on
+    their own, as in /rate-all-answers.
+    """
+    convs = {contestant_id: {"question": question, "answer": text} for contestant_id, text in answers.items()}
+    groups = [group for group in ranking_groups(list(convs)) if group]
+    batches = await gather_bounded(
+        (rate_batch({contestant_id: convs[contestant_id] for contestant_id in group}, round_number) for group in groups),
+        ROOM_FANOUT_CONCURRENCY
+    )
+    scores: Dict[str, object] = {}
+    for group, batch in zip(groups, batches):
+        if isinstance(batch, Exception):
+            logger.warning("[ROOM] Batched rating of %d answers failed, rating them one by one: %r", len(group), batch)
+            continue
+        scores.update(batch)
+    unrated = [contestant_id for contestant_id in convs if contestant_id not in scores]
+    scores.update(zip(unrated, await gather_bounded(
+        (rate_answer(convs[contestant_id], round_number) for contestant_id in unrated), ROOM_FANOUT_CONCURRENCY
+    )))
+    return scores
+
+def commit_room_scores(room: Room, round_number: int, scores: Dict[str, float]) -> dict:
+    if room.stage != "answering" or room.current_round != round_number:
+        raise HTTPException(status_code=409, detail="Room stage changed while rating.")
+    room.scores.add(scores)
+    room.answers = {}
+    room.stage = "finished" if round_number >= room.max_rounds else "waiting"
+    return {
+        "round": round_number,
+        "scores": scores,
+        "leader": room.scores.leader,
+        "standings": room.scores.standings(10),
+        "room_complete": room.stage == "finished"
+    }
+
+@router.post("/rooms/{room_id}/close-round")
+async def close_room_round(room_id: str, room: Room = Depends(get_room)):
+    """Answer for every contestant still missing one, score the round and move the room on."""
+    if room.stage != "answering":
+        raise HTTPException(status_code=400, detail="Not the correct stage for closing a round.")
+    round_number = room.current_round
+
+    missing = [contestant_id for contestant_id in room.contestants if contestant_id not in room.answers]
+    results = await gather_bounded((room_answer(room_id, room, contestant_id) for contestant_id in missing), ROOM_FANOUT_CONCURRENCY)
+    # Answers are saved before any 502, so a retry only generates the missing ones
+    answers = await room_store.transition(room_id, commit_room_answers, round_number, missing, results)
+    raise_if_shed(results)
+    if len(answers) < len(room.contestants):
+        raise HTTPException(status_code=502, detail="Some answers failed, retry to fill them in")
+
+    scores = await rank_room_answers(room.question(), round_number, answers)
+    raise_if_shed(scores.values())
+    errors = {contestant_id: str(result) for contestant_id, result in scores.items() if isinstance(result, Exception)}
+    if errors:
+        raise HTTPException(status_code=502, detail={"message": "Some ratings failed, retry", "errors": errors})
+    return await room_store.transition(room_id, commit_room_scores, round_number, scores)
+
+@router.get("/rooms/{room_id}/winner")
+async def announce_room_winner(room_id: str, room: Room = Depends(get_room)):
+    if room.stage != "finished":
+        raise HTTPException(status_code=400, detail="Not the correct stage for announcing winner.")
+    winner = room.scores.leader
+    response = await chains["room_winner"].ainvoke({
+        "winner": winner,
+        "personality": room.contestants[winner]["personality"] or "a human player",
+        "contestants": len(room.contestants)
+    })
+    return {
+        "text": response["text"],
+        "winner": winner,
+        "average_rating": room.scores.average(winner),
+        "standings": room.scores.standings(10)
+    }
+
+def create_app() -> FastAPI:
+    """Build the FastAPI app. Routes are registered right away; chains are built lazily (see WARM_MODELS_ON_STARTUP)."""
+    app = FastAPI(lifespan=lifespan)
+    metrics.instrument_app(app)
+    degraded_header(app)
+    app.add_exception_handler(GameStoreConflict, game_store_conflict)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
+
+app = create_app()
@@ -0,0 +1,128 @@
+import asyncio
+import json
+import math
+import os
+import random
+import re
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import Field, PrivateAttr
+
+from llm_chains import estimate_tokens
+
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "300"))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", "0.5"))
+FAKE_LLM_MS_PER_TOKEN = float(os.getenv("FAKE_LLM_MS_PER_TOKEN", "10"))
+FAKE_LLM_MS_PER_INPUT_TOKEN = float(os.getenv("FAKE_LLM_MS_PER_INPUT_TOKEN", "0.2"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED")
+
+CANNED_QUESTIONS = [
+    "If our first date were a cooking show, what dish would you burn first?",
+    "Which houseplant best matches your love language, and why?",
+    "What song would play every time you walk into a room?",
+    "If you had to win me over with a single text, what would it say?",
+]
+
+CANNED_ANSWERS = [
+    "I'd plan a picnic on a rooftop, because the view is almost as good as you.",
+    "Honestly? I'd burn the pasta, but I'd make you laugh about it.",
+    "Something with a little mystery and a lot of snacks.",
+]
+
+
+class FakeLLMError(Exception):
+    """Injected upstream failure."""
+
+
+class FakeChatModel(BaseChatModel):
+    """Offline stand-in for ChatMistralAI.
+
+    Time to first token is drawn from a log-normal distribution around
+    `latency_ms` plus `ms_per_input_token` per prompt token, then each
+    output token costs `ms_per_token`. A
+    `failure_rate` fraction of calls raise FakeLLMError. Replies come
+    from `responses`, a map of regex to template formatted with the
+    match's named groups, and otherwise from a responder that knows this
+    app's prompts. With `record_calls` every prompt and its sampling
+    kwargs are appended to `calls`.
+    """
+    model: str = "fake"
+    latency_ms: float = FAKE_LLM_LATENCY_MS
+    latency_sigma: float = FAKE_LLM_LATENCY_SIGMA
+    ms_per_token: float = FAKE_LLM_MS_PER_TOKEN
+    ms_per_input_token: float = FAKE_LLM_MS_PER_INPUT_TOKEN
+    failure_rate: float = FAKE_LLM_FAILURE_RATE
+    responses: Dict[str, str] = Field(default_factory=dict)
+    seed: Optional[int] = None
+    record_calls: bool = False
+    calls: List[tuple] = Field(default_factory=list)
+    _rng: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        seed = self.seed if self.seed is not None else FAKE_LLM_SEED
+        self._rng = random.Random(seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model": self.model}
+
+    def respond(self, prompt: str) -> str:
+        for pattern, template in self.responses.items():
+            match = re.search(pattern, prompt)
+            if match:
+                return template.format(**match.groupdict())
+        ids = re.findall(r"Contestant ID: (\w+)", prompt)
+        if ids:
+            return json.dumps({contestant_id: self._rng.randint(2, 9) for contestant_id in ids})
+        if "respond with a number" in prompt:
+            return str(self._rng.randint(2, 9))
+        if "ONLY RETURN THE QUESTION" in prompt:
+            return self._rng.choice(CANNED_QUESTIONS)
+        return self._rng.choice(CANNED_ANSWERS)
+
+    def _first_token_delay(self, prompt: str) -> float:
+        prefill = estimate_tokens(prompt) * self.ms_per_input_token / 1000
+        if self.latency_ms <= 0:
+            return prefill
+        return prefill + self._rng.lognormvariate(math.log(self.latency_ms), self.latency_sigma) / 1000
+
+    def _start_call(self, messages: List[BaseMessage], kwargs: dict) -> str:
+        prompt = messages[-1].content
+        if self.record_calls:
+            self.calls.append((prompt, kwargs))
+        if self._rng.random() < self.failure_rate:
+            raise FakeLLMError(f"Injected failure from fake model {self.model}")
+        return prompt
+
+    def _usage(self, prompt: str, text: str) -> dict:
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        raise NotImplementedError("FakeChatModel is async-only")
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> ChatResult:
+        prompt = self._start_call(messages, kwargs)
+        text = self.respond(prompt)
+        await asyncio.sleep(self._first_token_delay(prompt) + estimate_tokens(text) * self.ms_per_token / 1000)
+        message = AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        raise NotImplementedError("FakeChatModel is async-only")
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        prompt = self._start_call(messages, kwargs)
+        text = self.respond(prompt)
+        await asyncio.sleep(self._first_token_delay(prompt))
+        for word in re.findall(r"\S+\s*", text):
+            await asyncio.sleep(estimate_tokens(word) * self.ms_per_token / 1000)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
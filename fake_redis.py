@@ -0,0 +1,194 @@
+"""Local stand-in for Redis, speaking just enough of its protocol for RedisGameStore.
+
+Run it in place of a real server for development and benchmarks:
+    python -m fake_redis --port 6380
+and point the app at it with GAME_STORE_URL=redis://localhost:6380/0
+"""
+import argparse
+import asyncio
+import fnmatch
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class FakeRedisServer:
+    """Single-process, in-memory server for GET/SET/DEL/EXPIRE, WATCH/MULTI/EXEC and a few admin commands.
+
+    Commands run one at a time on the event loop, so a MULTI block applied
+    in EXEC is atomic just as in Redis. WATCH compares a per-key revision
+    that every write bumps.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._revisions: Dict[bytes, int] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self.commands = 0
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self._serve, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires = entry
+        if expires is not None and expires <= self._clock():
+            self._delete(key)
+            return None
+        return value
+
+    def _touch(self, key: bytes):
+        self._revisions[key] = self._revisions.get(key, 0) + 1
+
+    def _delete(self, key: bytes) -> int:
+        self._touch(key)
+        return 1 if self._data.pop(key, None) is not None else 0
+
+    def _set(self, key: bytes, value: bytes, options: List[bytes]) -> Any:
+        options = [option.upper() for option in options]
+        ttl = None
+        if b"EX" in options:
+            ttl = float(options[options.index(b"EX") + 1])
+        exists = self._get(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return None
+        self._data[key] = (value, self._clock() + ttl if ttl is not None else None)
+        self._touch(key)
+        return "OK"
+
+    def _run(self, name: bytes, args: List[bytes]) -> Any:
+        self.commands += 1
+        if name == b"PING":
+            return "PONG"
+        if name == b"SELECT":
+            return "OK"
+        if name == b"GET":
+            return self._get(args[0])
+        if name == b"SET":
+            return self._set(args[0], args[1], args[2:])
+        if name == b"DEL":
+            return sum(self._delete(key) for key in args)
+        if name == b"EXPIRE":
+            value = self._get(args[0])
+            if value is None:
+                return 0
+            self._data[args[0]] = (value, self._clock() + float(args[1]))
+            return 1
+        if name == b"DBSIZE":
+            return sum(1 for key in list(self._data) if self._get(key) is not None)
+        if name == b"SCAN":
+            # Everything in one batch: the cursor always comes back as 0
+            options = [option.upper() for option in args[1:]]
+            pattern = args[1:][options.index(b"MATCH") + 1] if b"MATCH" in options else b"*"
+            keys = [key for key in list(self._data) if fnmatch.fnmatchcase(key, pattern) and self._get(key) is not None]
+            return [b"0", keys]
+        if name == b"FLUSHDB":
+            for key in list(self._data):
+                self._delete(key)
+            return "OK"
+        raise ValueError(f"ERR unknown command '{name.decode()}'")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        watched: Dict[bytes, int] = {}
+        queued: Optional[List[Tuple[bytes, List[bytes]]]] = None
+        try:
+            while True:
+                command = await read_command(reader)
+                if command is None:
+                    break
+                name, args = command[0].upper(), command[1:]
+                if name == b"QUIT":
+                    writer.write(encode("OK"))
+                    break
+                if name == b"WATCH":
+                    watched.update((key, self._revisions.get(key, 0)) for key in args)
+                    reply = "OK"
+                elif name == b"UNWATCH":
+                    watched.clear()
+                    reply = "OK"
+                elif name == b"MULTI":
+                    queued = []
+                    reply = "OK"
+                elif name == b"DISCARD":
+                    queued, reply = None, "OK"
+                    watched.clear()
+                elif name == b"EXEC":
+                    if queued is None:
+                        reply = ValueError("ERR EXEC without MULTI")
+                    elif any(self._revisions.get(key, 0) != revision for key, revision in watched.items()):
+                        reply = None
+                    else:
+                        reply = [self._safe_run(n, a) for n, a in queued]
+                    queued = None
+                    watched.clear()
+                elif queued is not None:
+                    queued.append((name, args))
+                    reply = "QUEUED"
+                else:
+                    reply = self._safe_run(name, args)
+                writer.write(encode(reply))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _safe_run(self, name: bytes, args: List[bytes]) -> Any:
+        try:
+            return self._run(name, args)
+        except (ValueError, IndexError) as e:
+            return ValueError(str(e) if str(e).startswith("ERR") else f"ERR {e}")
+
+
+async def read_command(reader: asyncio.StreamReader) -> Optional[List[bytes]]:
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        # Inline command, as typed into telnet
+        return line.split()
+    args = []
+    for _ in range(int(line[1:-2])):
+        length = int((await reader.readline())[1:-2])
+        args.append((await reader.readexactly(length + 2))[:-2])
+    return args
+
+
+def encode(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, Exception):
+        return f"-{reply}\r\n".encode()
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode(item) for item in reply)
+
+
+async def serve_forever(host: str, port: int):
+    server = FakeRedisServer()
+    port = await server.start(host, port)
+    print(f"fake redis listening on {host}:{port}", flush=True)
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
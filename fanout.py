@@ -0,0 +1,22 @@
+import asyncio
+import os
+from typing import Awaitable, Iterable, List, Optional
+
+# Upper bound on LLM calls a single HTTP request may have in flight at once.
+LLM_FANOUT_CONCURRENCY = int(os.getenv("LLM_FANOUT_CONCURRENCY", "4"))
+
+
+async def gather_bounded(aws: Iterable[Awaitable], limit: Optional[int] = None) -> List:
+    """Await all of `aws` with at most `limit` running at once.
+
+    Results come back in input order. A failing awaitable yields its
+    exception in place of a result instead of cancelling its siblings,
+    so callers can keep the successes and report the failures.
+    """
+    semaphore = asyncio.Semaphore(limit or LLM_FANOUT_CONCURRENCY)
+
+    async def run(aw):
+        async with semaphore:
+            return await aw
+
+    return await asyncio.gather(*(run(aw) for aw in aws), return_exceptions=True)
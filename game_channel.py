@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from starlette.websockets import WebSocket, WebSocketDisconnect, WebSocketState
+
+# Messages queued per socket before it counts as too slow and is disconnected
+WS_SEND_QUEUE = int(os.getenv("WS_SEND_QUEUE", "256"))
+# Ping interval; a socket that sends nothing (not even a pong) for two intervals is closed
+WS_HEARTBEAT_SECONDS = float(os.getenv("WS_HEARTBEAT_SECONDS", "20"))
+
+# A slow client may miss these without losing anything: every stream ends with an event carrying its full text
+LOSSY_EVENTS = {"token"}
+# Close code for sockets the server drops, slow or silent ("try again later")
+CLOSE_TRY_LATER = 1013
+
+
+class Subscriber:
+    """One socket's bounded send queue, drained by its own writer task."""
+
+    def __init__(self, websocket: WebSocket, max_queue: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(max_queue)
+        self.last_seen = time.monotonic()
+        self.dropped = 0
+        self.task: Optional[asyncio.Task] = None
+        self.kicked = False
+
+    def offer(self, message: dict) -> bool:
+        """Queue `message` without blocking; False if the client is too far behind to take it."""
+        if message["type"] in LOSSY_EVENTS and self.queue.qsize() >= self.queue.maxsize // 2:
+            self.dropped += 1
+            return True
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    def kick(self):
+        self.kicked = True
+        if self.task is not None:
+            self.task.cancel()
+
+    async def write(self):
+        while True:
+            await self.websocket.send_text(json.dumps(await self.queue.get()))
+
+
+class GameChannel:
+    """Pushes game events to every WebSocket watching a game, within one worker.
+
+    `publish` never blocks the game: each socket has its own bounded send
+    queue and writer task. When a socket falls behind, token events are
+    dropped first and a socket whose queue still fills up is closed
+    (1013). One heartbeat task per worker pings every socket and closes
+    the ones that stopped answering.
+    """
+
+    def __init__(self, max_queue: int = WS_SEND_QUEUE, heartbeat: float = WS_HEARTBEAT_SECONDS):
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self.published: Counter = Counter()
+        self.disconnects: Counter = Counter()
+
+    def subscribers(self, session_id: str) -> int:
+        return len(self._subscribers.get(session_id, ()))
+
+    def __len__(self) -> int:
+        return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def publish(self, session_id: str, event: str, data: Any = None):
+        subscribers = self._subscribers.get(session_id)
+        if not subscribers:
+            return
+        message = {"type": event, "data": data, "ts": time.time()}
+        self.published[event] += 1
+        for subscriber in list(subscribers):
+            if not subscriber.offer(message):
+                self.disconnects["too_slow"] += 1
+                subscriber.kick()
+
+    def send(self, subscriber: Subscriber, event: str, data: Any = None):
+        """Send an event to one socket only, e.g. an error about its own message."""
+        if not subscriber.offer({"type": event, "data": data, "ts": time.time()}):
+            self.disconnects["too_slow"] += 1
+            subscriber.kick()
+
+    async def serve(
+        self,
+        websocket: WebSocket,
+        session_id: str,
+        on_message: Callable[[Subscriber, dict], Awaitable[None]],
+        snapshot: Any = None,
+    ):
+        """Run one socket until it disconnects, handing each JSON message it sends to `on_message`.
+
+        `snapshot` is sent first as a `state` event, so the client knows where the game is.
+        """
+        await websocket.accept()
+        subscriber = Subscriber(websocket, self.max_queue)
+        subscriber.task = asyncio.current_task()
+        self._subscribers.setdefault(session_id, set()).add(subscriber)
+        self._ensure_heartbeat()
+        writer = asyncio.create_task(subscriber.write())
+        self.send(subscriber, "state", snapshot)
+        try:
+            while True:
+                text = await websocket.receive_text()
+                subscriber.last_seen = time.monotonic()
+                try:
+                    message = json.loads(text)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    self.send(subscriber, "error", {"status_code": 400, "detail": "Messages must be JSON objects."})
+                elif message.get("type") != "pong":
+                    await on_message(subscriber, message)
+        except WebSocketDisconnect:
+            self.disconnects["client"] += 1
+        except asyncio.CancelledError:
+            if not subscriber.kicked:
+                raise
+        finally:
+            writer.cancel()
+            subscribers = self._subscribers.get(session_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[session_id]
+            if subscriber.kicked and websocket.client_state == WebSocketState.CONNECTED:
+                await websocket.close(code=CLOSE_TRY_LATER)
+
+    def _ensure_heartbeat(self):
+        if self._heartbeat_task is None or self._heartbeat_task.done():
+            self._heartbeat_task = asyncio.get_running_loop().create_task(self._beat())
+
+    async def _beat(self):
+        while self._subscribers:
+            await asyncio.sleep(self.heartbeat)
+            cutoff = time.monotonic() - 2 * self.heartbeat
+            ping = {"type": "ping", "data": None, "ts": time.time()}
+            for subscribers in list(self._subscribers.values()):
+                for subscriber in list(subscribers):
+                    if subscriber.last_seen < cutoff:
+                        self.disconnects["heartbeat"] += 1
+                        subscriber.kick()
+                    elif not subscriber.offer(ping):
+                        self.disconnects["too_slow"] += 1
+                        subscriber.kick()
+
+    async def close(self):
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in list(subscribers):
+                subscriber.kick()
+
+    def stats(self) -> dict:
+        return {
+            "sockets": len(self),
+            "games": len(self._subscribers),
+            "published": dict(self.published),
+            "disconnects": dict(self.disconnects),
+            "dropped_tokens": sum(s.dropped for subscribers in self._subscribers.values() for s in subscribers),
+        }
+
+    def collect(self):
+        """Samples for the /metrics endpoint."""
+        return [
+            ("ws_connections", "gauge", "Open game WebSockets", [({}, len(self))]),
+            ("ws_events_published_total", "counter", "Game events pushed to WebSockets by type", [
+                ({"type": event}, count) for event, count in self.published.items()
+            ]),
+            ("ws_disconnects_total", "counter", "WebSocket disconnects by reason", [
+                ({"reason": reason}, count) for reason, count in self.disconnects.items()
+            ]),
+        ]
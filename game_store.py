@@ -0,0 +1,507 @@
+import asyncio
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Generic, List, Optional, Tuple, TypeVar
+from urllib.parse import urlparse
+
+from journal import JOURNAL_DIR, JOURNAL_SNAPSHOT_EVENTS, RESET, Journal, encode_event, state_delta
+from logs import get_logger
+from sessions import GAME_SESSION_TTL_SECONDS, MAX_GAME_SESSIONS, SessionStore
+
+logger = get_logger("game_store")
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+# "memory://" keeps games in this process (one worker only). To share games between
+# workers or hosts use "sqlite:///path/to/games.db" or "redis://host:port/db"
+GAME_STORE_URL = os.getenv("GAME_STORE_URL", "memory://")
+# Attempts at a compare-and-set before giving up on a heavily contended game
+GAME_STORE_CAS_RETRIES = int(os.getenv("GAME_STORE_CAS_RETRIES", "50"))
+GAME_STORE_POOL_SIZE = int(os.getenv("GAME_STORE_POOL_SIZE", "16"))
+
+
+class GameStoreConflict(Exception):
+    """A transition kept losing the compare-and-set race and gave up."""
+
+
+class GameStore(Generic[T]):
+    """Where game states live between requests.
+
+    Handlers read a game with `load` and change it only through
+    `transition(session_id, mutate, *args)`, which applies
+    `mutate(state, *args)` to the latest state and stores the result
+    atomically. `mutate` should re-check the stage it expects and raise
+    to abort; nothing is saved when it raises.
+
+    `load` creates a missing game; with `create=False` it returns None
+    instead, for ids that must already exist.
+    """
+
+    async def load(self, session_id: str, create: bool = True) -> Optional[T]:
+        raise NotImplementedError
+
+    async def create(self) -> Tuple[str, T]:
+        raise NotImplementedError
+
+    async def reset(self, session_id: str) -> T:
+        raise NotImplementedError
+
+    async def transition(self, session_id: str, mutate: Callable[..., R], *args) -> R:
+        raise NotImplementedError
+
+    async def stats(self) -> dict:
+        raise NotImplementedError
+
+    def collect(self):
+        return []
+
+    async def start(self):
+        """Called once before serving, e.g. to recover games from a journal."""
+
+    async def close(self):
+        pass
+
+
+class MemoryGameStore(GameStore[T]):
+    """Games held in this process. Every handler runs on one event loop, so a
+    transition that doesn't await is already atomic."""
+
+    def __init__(self, factory: Callable[[], T], max_sessions: int = MAX_GAME_SESSIONS, idle_ttl: float = GAME_SESSION_TTL_SECONDS):
+        self.sessions: SessionStore[T] = SessionStore(factory, max_sessions=max_sessions, idle_ttl=idle_ttl)
+
+    async def load(self, session_id: str, create: bool = True) -> Optional[T]:
+        return self.sessions.get(session_id) if create else self.sessions.find(session_id)
+
+    async def create(self) -> Tuple[str, T]:
+        return self.sessions.create()
+
+    async def reset(self, session_id: str) -> T:
+        return self.sessions.reset(session_id)
+
+    async def transition(self, session_id: str, mutate: Callable[..., R], *args) -> R:
+        return mutate(self.sessions.get(session_id), *args)
+
+    async def stats(self) -> dict:
+        return {"backend": "memory", **self.sessions.stats()}
+
+    def collect(self):
+        return self.sessions.collect()
+
+
+class JournaledGameStore(MemoryGameStore[T]):
+    """Games in process memory, with every change appended to a Journal so they survive a restart.
+
+    A transition records only what it changed (see journal.state_delta),
+    named after its `mutate` function. Every game the store creates,
+    resets or recreates under an id it evicted starts with a RESET event,
+    so its changes are never replayed onto an older game's. Every
+    `snapshot_every` events the journal gets a snapshot of all live games;
+    `start` rebuilds them from the newest snapshot plus the events after
+    it.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        journal: Journal,
+        name: str = "games",
+        snapshot_every: int = JOURNAL_SNAPSHOT_EVENTS,
+        **kwargs,
+    ):
+        super().__init__(factory, **kwargs)
+        self._factory = factory
+        self.journal = journal
+        self.name = name
+        self.snapshot_every = snapshot_every
+        self._since_snapshot = 0
+        self.recovered = 0
+        self.sessions.on_create = self._created
+
+    async def start(self):
+        start = time.perf_counter()
+        states, events = await asyncio.to_thread(self._recover)
+        for session_id, state in states.items():
+            self.sessions.put(session_id, state)
+        self.recovered = len(states)
+        logger.info(
+            "[JOURNAL] Recovered %d %s from %d events in %.2fs", len(states), self.name, events, time.perf_counter() - start
+        )
+        self.journal.start()
+
+    def _recover(self) -> Tuple[dict, int]:
+        states, events = self.journal.recover(self._factory().to_dict())
+        # from_dict may keep the dict's lists, and the journal keeps these dicts
+        return {session_id: self._factory.from_dict(json.loads(json.dumps(data))) for session_id, data in states.items()}, events
+
+    def _created(self, session_id: str):
+        self._record({"s": session_id, "e": RESET, "t": round(time.time(), 3)})
+
+    async def transition(self, session_id: str, mutate: Callable[..., R], *args) -> R:
+        state = self.sessions.get(session_id)
+        # to_dict shares lists with the live state, which mutate may append to; a
+        # pickle round trip copies it about four times faster than a JSON one
+        before = pickle.loads(pickle.dumps(state.to_dict(), pickle.HIGHEST_PROTOCOL))
+        try:
+            return mutate(state, *args)
+        finally:
+            # Recorded even when mutate raises, in case it changed something first
+            delta = state_delta(before, state.to_dict())
+            if delta:
+                self._record({"s": session_id, "e": mutate.__name__, "t": round(time.time(), 3), "d": delta})
+
+    def _record(self, event: dict):
+        self.journal.append(event)
+        self._since_snapshot += 1
+        if self._since_snapshot >= self.snapshot_every:
+            self._since_snapshot = 0
+            # Encoded here, as of this event; the journal's writer thread only writes it out
+            self.journal.snapshot({
+                session_id: encode_event(self.sessions.peek(session_id).to_dict())
+                for session_id in self.sessions.ids()
+            })
+
+    async def stats(self) -> dict:
+        return {**await super().stats(), "backend": "memory+journal", "recovered": self.recovered, "journal": self.journal.stats()}
+
+    def collect(self):
+        return super().collect() + self.journal.collect(self.name)
+
+    async def close(self):
+        await self.journal.close()
+
+
+class SharedGameStore(GameStore[T]):
+    """Games serialized to a store other workers can reach.
+
+    Every stored game carries a version number. A transition reads the
+    game, mutates a private copy and writes it back only if the version is
+    unchanged, so two workers can't both advance the same stage; the loser
+    re-reads and re-runs `mutate`, which then sees the new stage.
+    Backends implement `_read` (creating the game if it is missing or
+    expired, or returning None with `create=False`) and `_write` (the
+    compare-and-set).
+    """
+
+    backend = "shared"
+
+    def __init__(self, factory: Callable[[], T], cas_retries: int = GAME_STORE_CAS_RETRIES):
+        self._factory = factory
+        self.cas_retries = cas_retries
+        self.transitions = 0
+        self.conflicts = 0
+
+    async def _read(self, session_id: str, create: bool = True) -> Optional[Tuple[int, dict]]:
+        raise NotImplementedError
+
+    async def _write(self, session_id: str, version: int, data: dict) -> bool:
+        raise NotImplementedError
+
+    async def _count(self) -> int:
+        raise NotImplementedError
+
+    def _decode(self, data: dict) -> T:
+        return self._factory.from_dict(data)
+
+    async def load(self, session_id: str, create: bool = True) -> Optional[T]:
+        read = await self._read(session_id, create)
+        return None if read is None else self._decode(read[1])
+
+    async def create(self) -> Tuple[str, T]:
+        session_id = uuid.uuid4().hex
+        return session_id, await self.load(session_id)
+
+    async def reset(self, session_id: str) -> T:
+        for _ in range(self.cas_retries):
+            version, _ = await self._read(session_id)
+            state = self._factory()
+            if await self._write(session_id, version, state.to_dict()):
+                return state
+            self.conflicts += 1
+        raise GameStoreConflict(f"Gave up resetting game {session_id} after {self.cas_retries} conflicting writes")
+
+    async def transition(self, session_id: str, mutate: Callable[..., R], *args) -> R:
+        self.transitions += 1
+        for _ in range(self.cas_retries):
+            version, data = await self._read(session_id)
+            state = self._decode(data)
+            result = mutate(state, *args)
+            if await self._write(session_id, version, state.to_dict()):
+                return result
+            self.conflicts += 1
+        raise GameStoreConflict(f"Gave up on game {session_id} after {self.cas_retries} conflicting writes")
+
+    async def stats(self) -> dict:
+        return {
+            "backend": self.backend,
+            "live_sessions": await self._count(),
+            "transitions": self.transitions,
+            "cas_conflicts": self.conflicts,
+        }
+
+    def collect(self):
+        return [
+            ("game_store_transitions_total", "counter", "Game state transitions attempted", [({}, self.transitions)]),
+            ("game_store_cas_conflicts_total", "counter", "Transitions retried after losing a compare-and-set", [({}, self.conflicts)]),
+        ]
+
+
+class SQLiteGameStore(SharedGameStore[T]):
+    """Games in one table of a SQLite file, shared by every worker on the host.
+
+    Blocking calls run in a worker thread. The compare-and-set is a single
+    UPDATE guarded by the version column, which SQLite serializes across
+    processes. Stores of different kinds (games, rooms) use their own
+    `table` in the same file.
+    """
+
+    backend = "sqlite"
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        path: str,
+        table: str = "games",
+        idle_ttl: float = GAME_SESSION_TTL_SECONDS,
+        clock: Callable[[], float] = time.time,
+        **kwargs,
+    ):
+        super().__init__(factory, **kwargs)
+        if not table.isidentifier():
+            raise ValueError(f"Invalid SQLite table name: {table!r}")
+        self.table = table
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, version INTEGER, updated REAL, state TEXT)"
+            )
+            self._conn.commit()
+
+    def _read_blocking(self, session_id: str, create: bool) -> Optional[Tuple[int, dict]]:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute(f"SELECT version, updated, state FROM {self.table} WHERE id = ?", (session_id,)).fetchone()
+            if row is None or row[1] <= now - self.idle_ttl:
+                if not create:
+                    return None
+                # Missing or idle too long: start a fresh game, bumping the version so stale writers lose
+                fresh = json.dumps(self._factory().to_dict())
+                self._conn.execute(
+                    f"INSERT INTO {self.table} (id, version, updated, state) VALUES (?, 1, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET version = version + 1, updated = excluded.updated, state = excluded.state "
+                    f"WHERE {self.table}.updated <= ?",
+                    (session_id, now, fresh, now - self.idle_ttl)
+                )
+                self._conn.commit()
+                row = self._conn.execute(f"SELECT version, updated, state FROM {self.table} WHERE id = ?", (session_id,)).fetchone()
+        return row[0], json.loads(row[2])
+
+    def _write_blocking(self, session_id: str, version: int, data: dict) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE {self.table} SET version = version + 1, updated = ?, state = ? WHERE id = ? AND version = ?",
+                (self._clock(), json.dumps(data), session_id, version)
+            )
+            self._conn.commit()
+        return cursor.rowcount == 1
+
+    def _count_blocking(self) -> int:
+        with self._lock:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE updated <= ?", (self._clock() - self.idle_ttl,))
+            self._conn.commit()
+            return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    async def _read(self, session_id: str, create: bool = True) -> Optional[Tuple[int, dict]]:
+        return await asyncio.to_thread(self._read_blocking, session_id, create)
+
+    async def _write(self, session_id: str, version: int, data: dict) -> bool:
+        return await asyncio.to_thread(self._write_blocking, session_id, version, data)
+
+    async def _count(self) -> int:
+        return await asyncio.to_thread(self._count_blocking)
+
+    async def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class RespError(Exception):
+    """Error reply from a Redis-protocol server."""
+
+
+class RespConnection:
+    """Minimal client for the Redis serialization protocol (RESP2)."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def open(cls, host: str, port: int, db: int = 0) -> "RespConnection":
+        reader, writer = await asyncio.open_connection(host, port)
+        conn = cls(reader, writer)
+        if db:
+            await conn.execute("SELECT", db)
+        return conn
+
+    async def execute(self, *args) -> Any:
+        parts = [f"*{len(args)}\r\n".encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+        self._writer.write(b"".join(parts))
+        await self._writer.drain()
+        return await self._read_reply()
+
+    async def _read_reply(self) -> Any:
+        line = await self._reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, payload = line[:1], line[1:-2]
+        if kind == b"+":
+            return payload.decode()
+        if kind == b"-":
+            raise RespError(payload.decode())
+        if kind == b":":
+            return int(payload)
+        if kind == b"$":
+            length = int(payload)
+            if length == -1:
+                return None
+            data = await self._reader.readexactly(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(payload)
+            if length == -1:
+                return None
+            return [await self._read_reply() for _ in range(length)]
+        raise RespError(f"Unexpected reply: {line!r}")
+
+    def close(self):
+        self._writer.close()
+
+
+class RedisGameStore(SharedGameStore[T]):
+    """Games in Redis (or anything speaking its protocol, see fake_redis.py), shared across hosts.
+
+    The compare-and-set uses WATCH/MULTI/EXEC on a pooled connection, and
+    every write refreshes the key's expiry so idle games age out on their own.
+    Stores of different kinds (games, rooms) share a database under their
+    own key `prefix`.
+    """
+
+    backend = "redis"
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        host: str = "localhost",
+        port: int = 6379,
+        db: int = 0,
+        prefix: str = "rizztral:game:",
+        idle_ttl: float = GAME_SESSION_TTL_SECONDS,
+        pool_size: int = GAME_STORE_POOL_SIZE,
+        **kwargs,
+    ):
+        super().__init__(factory, **kwargs)
+        self.host, self.port, self.db = host, port, db
+        self.prefix = prefix
+        self.idle_ttl = idle_ttl
+        self._idle: List[RespConnection] = []
+        self._slots = asyncio.Semaphore(pool_size)
+
+    @asynccontextmanager
+    async def _connection(self):
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else await RespConnection.open(self.host, self.port, self.db)
+            try:
+                yield conn
+            except BaseException:
+                # Broken, or left mid-reply or mid-transaction: don't reuse it
+                conn.close()
+                raise
+            self._idle.append(conn)
+
+    def _key(self, session_id: str) -> str:
+        return self.prefix + session_id
+
+    async def _read(self, session_id: str, create: bool = True) -> Optional[Tuple[int, dict]]:
+        key = self._key(session_id)
+        async with self._connection() as conn:
+            raw = await conn.execute("GET", key)
+            if raw is None:
+                if not create:
+                    return None
+                fresh = json.dumps({"version": 1, "state": self._factory().to_dict()})
+                # NX: if another worker created it first, theirs wins
+                await conn.execute("SET", key, fresh, "NX", "EX", int(self.idle_ttl))
+                raw = await conn.execute("GET", key)
+        stored = json.loads(raw)
+        return stored["version"], stored["state"]
+
+    async def _write(self, session_id: str, version: int, data: dict) -> bool:
+        key = self._key(session_id)
+        async with self._connection() as conn:
+            await conn.execute("WATCH", key)
+            raw = await conn.execute("GET", key)
+            if raw is None or json.loads(raw)["version"] != version:
+                await conn.execute("UNWATCH")
+                return False
+            await conn.execute("MULTI")
+            await conn.execute("SET", key, json.dumps({"version": version + 1, "state": data}), "EX", int(self.idle_ttl))
+            # EXEC returns nil when the watched key changed since WATCH
+            return await conn.execute("EXEC") is not None
+
+    async def _count(self) -> int:
+        # Only this store's keys: the database may hold other stores' (and anyone else's)
+        count, cursor = 0, b"0"
+        async with self._connection() as conn:
+            while True:
+                cursor, keys = await conn.execute("SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 1000)
+                count += len(keys)
+                if cursor == b"0":
+                    return count
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop().close()
+
+
+def open_game_store(url: str, factory: Callable[[], T], name: str = "games") -> GameStore[T]:
+    """Build the store named by a GAME_STORE_URL.
+
+    `name` keeps stores of different kinds apart in the same backend: it
+    names the JOURNAL_DIR subdirectory, the SQLite table and the Redis
+    key prefix.
+    """
+    parsed = urlparse(url)
+    if JOURNAL_DIR and parsed.scheme != "memory":
+        raise ValueError("JOURNAL_DIR needs GAME_STORE_URL=memory://; shared stores already keep games across restarts")
+    if parsed.scheme == "memory":
+        if JOURNAL_DIR:
+            return JournaledGameStore(factory, Journal(os.path.join(JOURNAL_DIR, name)), name)
+        return MemoryGameStore(factory)
+    if parsed.scheme == "sqlite":
+        # sqlite:///games.db is relative to the working directory, sqlite:////tmp/games.db absolute
+        return SQLiteGameStore(factory, parsed.path[1:] or "games.db", table=name)
+    if parsed.scheme == "redis":
+        return RedisGameStore(
+            factory,
+            host=parsed.hostname or "localhost",
+            port=parsed.port or 6379,
+            db=int(parsed.path.lstrip("/") or 0),
+            # Games keep the original prefix, so games stored before rooms existed stay readable
+            prefix="rizztral:game:" if name == "games" else f"rizztral:{name}:"
+        )
+    raise ValueError(f"Unknown GAME_STORE_URL scheme: {url!r}")
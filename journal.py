@@ -0,0 +1,268 @@
+import asyncio
+import copy
+import json
+import os
+import re
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Directory for the game event journal; empty keeps no journal and games are lost on restart
+JOURNAL_DIR = os.getenv("JOURNAL_DIR", "")
+# How often buffered events are written and fsynced; a crash loses at most this much
+JOURNAL_FLUSH_SECONDS = float(os.getenv("JOURNAL_FLUSH_SECONDS", "0.05"))
+# Events between snapshots of every live game, which bound how much log a restart replays
+JOURNAL_SNAPSHOT_EVENTS = int(os.getenv("JOURNAL_SNAPSHOT_EVENTS", "100000"))
+
+# Built once: json.dumps with non-default separators builds a new encoder on every call
+encode_event = json.JSONEncoder(separators=(",", ":")).encode
+
+SEGMENT_PATTERN = re.compile(r"segment-(\d+)\.jsonl$")
+SNAPSHOT_PATTERN = re.compile(r"snapshot-(\d+)\.json$")
+# Event name for a game (re)started from a fresh state: created, reset, or recreated under an evicted game's id
+RESET = "$reset"
+
+
+def state_delta(before: dict, after: dict) -> dict:
+    """What changed between two `to_dict()` states, as {key: [op, payload]}.
+
+    Lists that only grew are recorded as their new items ("+"), dicts
+    are diffed key by key ("~"), removed keys as "-" and anything else
+    is replaced outright ("=").
+    """
+    delta = {}
+    for key, value in after.items():
+        if key not in before:
+            delta[key] = ["=", value]
+            continue
+        old = before[key]
+        if old == value:
+            continue
+        if isinstance(old, list) and isinstance(value, list) and value[:len(old)] == old:
+            delta[key] = ["+", value[len(old):]]
+        elif isinstance(old, dict) and isinstance(value, dict):
+            delta[key] = ["~", state_delta(old, value)]
+        else:
+            delta[key] = ["=", value]
+    for key in before:
+        if key not in after:
+            delta[key] = ["-", None]
+    return delta
+
+
+def apply_delta(state: dict, delta: dict):
+    """Apply a `state_delta` to `state` in place."""
+    for key, (op, payload) in delta.items():
+        if op == "+":
+            state[key].extend(payload)
+        elif op == "~":
+            apply_delta(state[key], payload)
+        elif op == "-":
+            state.pop(key, None)
+        else:
+            state[key] = payload
+
+
+def apply_event(states: Dict[str, dict], event: dict, fresh: dict):
+    """Replay one journal event onto `states`; a game first seen in a transition starts from `fresh`."""
+    session_id = event["s"]
+    if event["e"] == RESET:
+        states[session_id] = copy.deepcopy(fresh)
+        return
+    state = states.get(session_id)
+    if state is None:
+        state = states[session_id] = copy.deepcopy(fresh)
+    apply_delta(state, event["d"])
+
+
+def numbered(directory: str, pattern: "re.Pattern") -> List[Tuple[int, str]]:
+    found = []
+    for name in os.listdir(directory):
+        match = pattern.match(name)
+        if match:
+            found.append((int(match.group(1)), os.path.join(directory, name)))
+    return sorted(found)
+
+
+def read_segment(path: str) -> Iterator[dict]:
+    """Events in one segment, skipping a line torn by a crash mid-write."""
+    with open(path, "rb") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def iter_events(directory: str, first_segment: int = 0) -> Iterator[dict]:
+    """Every event in segments numbered `first_segment` and up, in order."""
+    for number, path in numbered(directory, SEGMENT_PATTERN):
+        if number >= first_segment:
+            yield from read_segment(path)
+
+
+def load_snapshot(directory: str) -> Tuple[int, Dict[str, dict]]:
+    """The newest snapshot's games and the first segment written after it, or (0, {}) without one."""
+    snapshots = numbered(directory, SNAPSHOT_PATTERN)
+    if not snapshots:
+        return 0, {}
+    number, path = snapshots[-1]
+    with open(path) as f:
+        return number, json.load(f)["games"]
+
+
+class Journal:
+    """Append-only log of game events, written off the event loop.
+
+    `append` only buffers the encoded event; a background task hands the
+    buffer to a worker thread every `flush_interval`, which writes it and
+    fsyncs once per batch. Events go to numbered segment files. A
+    snapshot (every live game's full state) starts a new segment and
+    names it, so recovery loads the newest snapshot and replays only the
+    segments from that one on. Older segments are never touched again
+    and are kept for offline replay.
+
+    The writer thread only writes: it never decodes what it writes or
+    keeps games of its own. A snapshot arrives as every live game's state
+    already encoded by the store when it was taken, so the games can keep
+    changing while it is written.
+    """
+
+    def __init__(self, directory: str, flush_interval: float = JOURNAL_FLUSH_SECONDS):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+        existing = numbered(directory, SEGMENT_PATTERN) + numbered(directory, SNAPSHOT_PATTERN)
+        # Never append to an old segment: it may end in a line torn by a crash
+        self.segment = max((number for number, _ in existing), default=0) + 1
+        self._pending: List[str] = []
+        self._batches: List[Tuple[str, int, str]] = []
+        self._files: Dict[int, object] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self.events = 0
+        self.flushes = 0
+        self.bytes_written = 0
+        self.snapshots = 0
+        self.last_flush_seconds = 0.0
+
+    def recover(self, fresh: dict) -> Tuple[Dict[str, dict], int]:
+        """Rebuild every game's state dict from the newest snapshot and the log after it.
+
+        Returns the states and the number of events replayed. Call it
+        once before `start`. Blocking; run it in a thread.
+        """
+        first_segment, states = load_snapshot(self.directory)
+        events = 0
+        for event in iter_events(self.directory, first_segment):
+            apply_event(states, event, fresh)
+            events += 1
+        return states, events
+
+    def start(self):
+        if self._task is None:
+            self._stop = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def append(self, event: dict):
+        # Encoded now: the state the event describes keeps changing after this returns
+        self._pending.append(encode_event(event))
+        self.events += 1
+
+    def snapshot(self, games: Dict[str, str]):
+        """Queue a snapshot of `games`, each live game's JSON-encoded state as of every event appended so far."""
+        self._seal()
+        self.segment += 1
+        self._batches.append(("snapshot", self.segment, games))
+        self.snapshots += 1
+
+    def _seal(self):
+        if self._pending:
+            self._batches.append(("events", self.segment, "\n".join(self._pending) + "\n"))
+            self._pending = []
+
+    async def _run(self):
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        self._seal()
+        batches, self._batches = self._batches, []
+        if not batches:
+            return
+        start = time.perf_counter()
+        await asyncio.to_thread(self._write, batches)
+        self.last_flush_seconds = time.perf_counter() - start
+        self.flushes += 1
+
+    def _write(self, batches: List[tuple]):
+        touched = set()
+        for kind, segment, payload in batches:
+            if kind == "events":
+                data = payload.encode()
+                f = self._files.get(segment)
+                if f is None:
+                    for old in list(self._files):
+                        self._files.pop(old).close()
+                    f = self._files[segment] = open(os.path.join(self.directory, f"segment-{segment:06d}.jsonl"), "ab")
+                f.write(data)
+                touched.add(segment)
+            else:
+                data = self._encode_snapshot(payload)
+                path = os.path.join(self.directory, f"snapshot-{segment:06d}.json")
+                with open(path + ".tmp", "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # Renamed into place only once complete, so recovery never reads half a snapshot
+                os.replace(path + ".tmp", path)
+                # Only the newest snapshot is ever read; the segments before it stay for replay
+                for number, old in numbered(self.directory, SNAPSHOT_PATTERN):
+                    if number < segment:
+                        os.remove(old)
+            self.bytes_written += len(data)
+        for segment in touched:
+            f = self._files.get(segment)
+            if f is not None:
+                f.flush()
+                os.fsync(f.fileno())
+
+    @staticmethod
+    def _encode_snapshot(games: Dict[str, str]) -> bytes:
+        entries = ",".join(f"{json.dumps(session_id)}:{state}" for session_id, state in games.items())
+        return f'{{"games":{{{entries}}}}}'.encode()
+
+    async def close(self):
+        if self._task is not None:
+            self._stop.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def stats(self) -> dict:
+        return {
+            "segment": self.segment,
+            "events": self.events,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "bytes_written": self.bytes_written,
+            "snapshots": self.snapshots,
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+        }
+
+    def collect(self, store: str):
+        """Samples for the /metrics endpoint, labelled with the store the journal belongs to."""
+        labels = {"store": store}
+        return [
+            ("journal_events_total", "counter", "Game events appended to the journal", [(labels, self.events)]),
+            ("journal_pending_events", "gauge", "Events buffered and not yet written", [(labels, len(self._pending))]),
+            ("journal_flushes_total", "counter", "Batched journal writes, each ending in an fsync", [(labels, self.flushes)]),
+            ("journal_bytes_written_total", "counter", "Bytes written to journal segments and snapshots", [(labels, self.bytes_written)]),
+            ("journal_snapshots_total", "counter", "Snapshots of every live game", [(labels, self.snapshots)]),
+        ]
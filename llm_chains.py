@@ -0,0 +1,264 @@
+import os
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass
+from random import choice, uniform
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from metrics import RetryCounter, observe_llm_call
+from resilience import DeadlineBudget, Guard, llm_guard
+from response_cache import ResponseCache, cache_key
+from scheduler import Scheduler, llm_scheduler, upstream_retry_after
+from singleflight import SingleFlight
+
+if TYPE_CHECKING:
+    # Importing these costs most of a second, so they are for type checkers only
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.messages import BaseMessage
+    from langchain_core.prompt_values import PromptValue
+    from langchain_core.prompts import BasePromptTemplate
+
+# Build model clients and chains before serving instead of on the first request that needs them
+WARM_MODELS_ON_STARTUP = os.getenv("WARM_MODELS_ON_STARTUP", "0") == "1"
+# Completion length assumed when budgeting a call whose profile sets no max_tokens
+COMPLETION_TOKENS_ESTIMATE = 256
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for budgeting without a tokenizer."""
+    return max(len(text) // 4, 1)
+
+
+@dataclass(frozen=True)
+class SamplingProfile:
+    """Sampling settings for one chain role.
+
+    `temperature` may be a (low, high) range, in which case every call
+    draws its own value from it. `json_mode` asks the model for a JSON
+    object reply.
+    """
+    temperature: Union[float, Tuple[float, float]] = 0.7
+    max_tokens: Optional[int] = None
+    top_p: Optional[float] = None
+    json_mode: bool = False
+
+    def resolve(self) -> dict:
+        temperature = self.temperature
+        if isinstance(temperature, tuple):
+            temperature = uniform(*temperature)
+        params = {"temperature": temperature}
+        if self.max_tokens is not None:
+            params["max_tokens"] = self.max_tokens
+        if self.top_p is not None:
+            params["top_p"] = self.top_p
+        if self.json_mode:
+            params["response_format"] = {"type": "json_object"}
+        return params
+
+
+class Chain:
+    """A prompt bound to a chat model and a sampling profile.
+
+    Sampling parameters travel with each call instead of being set on the
+    shared model client, so concurrent requests never see each other's
+    temperature. Passing a `cache` opts the chain into response caching,
+    keeping up to `cache_variants` completions per rendered prompt. With a
+    `single_flight`, concurrent temperature-0 calls for the same prompt
+    share one upstream request. Every upstream call is first admitted by
+    `scheduler` (the process-wide one by default), which enforces the
+    model's rate budgets, and runs under `guard`'s deadline, hedging and
+    circuit breaker. A plain string `prompt` is parsed as a
+    PromptTemplate.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        llm: "BaseChatModel",
+        prompt: Union[str, "BasePromptTemplate"],
+        profile: SamplingProfile,
+        cache: Optional[ResponseCache] = None,
+        cache_variants: int = 1,
+        single_flight: Optional[SingleFlight] = None,
+        scheduler: Optional[Scheduler] = None,
+        guard: Optional[Guard] = None,
+    ):
+        self.name = name
+        if isinstance(prompt, str):
+            from langchain_core.prompts import PromptTemplate
+            prompt = PromptTemplate.from_template(prompt)
+        self.llm = llm
+        self.prompt = prompt
+        self.profile = profile
+        self.cache = cache
+        self.cache_variants = cache_variants
+        self.single_flight = single_flight
+        self.scheduler = scheduler or llm_scheduler
+        self.guard = guard or llm_guard
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.llm, "model", None) or getattr(self.llm, "model_name", None) or type(self.llm).__name__
+
+    def leaves(self) -> List["Chain"]:
+        """The single-model chains behind this one, for swapping clients in tests and benchmarks."""
+        return [self]
+
+    def sampling_params(self, **overrides) -> dict:
+        params = self.profile.resolve()
+        params.update(overrides)
+        return params
+
+    def cache_key(self, prompt: str, overrides: dict) -> str:
+        # Key on the profile rather than the resolved params, which may hold a random temperature draw
+        return cache_key(self.model_name, prompt, {**asdict(self.profile), **overrides})
+
+    async def ainvoke(self, inputs: dict, budget: Optional[DeadlineBudget] = None, **overrides) -> dict:
+        """Run the chain; `overrides` replace individual sampling params for this call.
+
+        With a `budget`, the upstream call's deadline is whatever is left of it.
+        """
+        prompt_value = self.prompt.format_prompt(**inputs)
+        params = self.sampling_params(**overrides)
+        coalesce = self.single_flight is not None and params.get("temperature") == 0
+        key = None
+        if self.cache is not None or coalesce:
+            key = self.cache_key(prompt_value.to_string(), overrides)
+        if self.cache is not None:
+            cached = await self.cache.get(self.name, key, self.cache_variants)
+            if cached is not None:
+                return {"text": choice(cached), "usage": None, "cached": True}
+        if not coalesce:
+            return await self._call(prompt_value, params, key, budget)
+        # Only deterministic calls are coalesced: everyone waiting would have got the same reply anyway
+        response, shared = await self.single_flight.do(self.name, key, lambda: self._call(prompt_value, params, key, budget))
+        if shared:
+            return {**response, "usage": None, "coalesced": True}
+        return response
+
+    async def _call(
+        self, prompt_value: "PromptValue", params: dict, key: Optional[str], budget: Optional[DeadlineBudget]
+    ) -> dict:
+        tokens = self._tokens(prompt_value, params)
+        message = await self.guard.call(
+            self.name, self.model_name, lambda: self._generate(prompt_value, params, tokens),
+            admit=self._admission(tokens), budget=budget
+        )
+        if self.cache is not None:
+            await self.cache.add(key, message.content, self.cache_variants)
+        return {"text": message.content, "usage": message.usage_metadata}
+
+    async def astream(self, inputs: dict, budget: Optional[DeadlineBudget] = None, **overrides) -> AsyncIterator[str]:
+        """Yield the completion's text as the model produces it."""
+        prompt_value = self.prompt.format_prompt(**inputs)
+        if self.cache is not None:
+            key = self.cache_key(prompt_value.to_string(), overrides)
+            cached = await self.cache.get(self.name, key, self.cache_variants)
+            if cached is not None:
+                yield choice(cached)
+                return
+        parts = []
+        params = self.sampling_params(**overrides)
+        tokens = self._tokens(prompt_value, params)
+        stream = self._stream(prompt_value, params, tokens)
+        async for text in self.guard.stream(
+            self.name, self.model_name, stream, admit=self._admission(tokens), budget=budget
+        ):
+            parts.append(text)
+            yield text
+        if self.cache is not None:
+            await self.cache.add(key, "".join(parts), self.cache_variants)
+
+    def _tokens(self, prompt_value: "PromptValue", params: dict) -> int:
+        """Tokens to budget the call for with the scheduler: the prompt plus its expected completion."""
+        return estimate_tokens(prompt_value.to_string()) + (params.get("max_tokens") or COMPLETION_TOKENS_ESTIMATE)
+
+    def _admission(self, tokens: int) -> Callable[[], Awaitable[None]]:
+        """Waits for the scheduler to admit one call; the guard runs it before the call's deadline starts."""
+        return lambda: self.scheduler.admit(self.model_name, tokens)
+
+    def _settle(self, tokens: int, usage: Optional[dict] = None, error: Optional[BaseException] = None):
+        if error is not None:
+            retry_after = upstream_retry_after(error)
+            if retry_after is not None:
+                self.scheduler.pause(self.model_name, retry_after)
+        elif usage:
+            self.scheduler.settle(self.model_name, tokens, usage.get("total_tokens"))
+
+    async def _generate(self, prompt_value: "PromptValue", params: dict, tokens: int) -> "BaseMessage":
+        """Make one instrumented upstream call, already admitted for `tokens`."""
+        retries = RetryCounter()
+        start = time.perf_counter()
+        try:
+            message = await self.llm.ainvoke(prompt_value, config={"callbacks": [retries]}, **params)
+        except Exception as e:
+            observe_llm_call(self.name, self.model_name, time.perf_counter() - start, retries=retries.retries, error=e)
+            self._settle(tokens, error=e)
+            raise
+        observe_llm_call(
+            self.name, self.model_name, time.perf_counter() - start,
+            usage=message.usage_metadata, retries=retries.retries
+        )
+        self._settle(tokens, usage=message.usage_metadata)
+        return message
+
+    async def _stream(self, prompt_value: "PromptValue", params: dict, tokens: int) -> AsyncIterator[str]:
+        """Stream one instrumented upstream call, already admitted for `tokens`, recording time to first token."""
+        retries = RetryCounter()
+        start = time.perf_counter()
+        ttft = None
+        usage = None
+        try:
+            async for chunk in self.llm.astream(prompt_value, config={"callbacks": [retries]}, **params):
+                if chunk.usage_metadata:
+                    usage = chunk.usage_metadata
+                if chunk.content:
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    yield chunk.content
+        except Exception as e:
+            observe_llm_call(self.name, self.model_name, time.perf_counter() - start, ttft=ttft, retries=retries.retries, error=e)
+            self._settle(tokens, error=e)
+            raise
+        observe_llm_call(self.name, self.model_name, time.perf_counter() - start, ttft=ttft, usage=usage, retries=retries.retries)
+        self._settle(tokens, usage=usage)
+
+
+class LazyChains(Mapping):
+    """An app's chains, built by `build` on first lookup.
+
+    Creating model clients pulls in the provider SDKs, which dominates
+    import time, so apps defer it until a route needs a chain (or the
+    startup hook calls `load` to warm up).
+    """
+
+    def __init__(self, build: Callable[[], Dict[str, Chain]]):
+        self._build = build
+        self._chains: Optional[Dict[str, Chain]] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._chains is not None
+
+    def reset(self):
+        """Drop the built chains, e.g. after their HTTP clients were closed on shutdown."""
+        with self._lock:
+            self._chains = None
+
+    def load(self) -> Dict[str, Chain]:
+        if self._chains is None:
+            with self._lock:
+                if self._chains is None:
+                    self._chains = self._build()
+        return self._chains
+
+    def __getitem__(self, name: str) -> Chain:
+        return self.load()[name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.load())
+
+    def __len__(self) -> int:
+        return len(self.load())
@@ -0,0 +1,82 @@
+import importlib.util
+import os
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import httpx
+    from langchain_core.language_models import BaseChatModel
+
+# "mistral" talks to the Mistral API; "fake" swaps in the offline FakeChatModel for load tests and CI
+LLM_BACKEND = os.getenv("LLM_BACKEND", "mistral")
+MISTRAL_BASE_URL = os.getenv("MISTRAL_BASE_URL", "https://api.mistral.ai/v1")
+
+# One HTTP connection pool shared by every Mistral client in the process. Set to 0 to give each client its own
+MISTRAL_HTTP_SHARED = os.getenv("MISTRAL_HTTP_SHARED", "1") == "1"
+MISTRAL_HTTP_MAX_CONNECTIONS = int(os.getenv("MISTRAL_HTTP_MAX_CONNECTIONS", "20"))
+# Keep-alive below the connection cap makes a saturated pool close and reopen sockets on every request
+MISTRAL_HTTP_MAX_KEEPALIVE = int(os.getenv("MISTRAL_HTTP_MAX_KEEPALIVE", str(MISTRAL_HTTP_MAX_CONNECTIONS)))
+MISTRAL_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("MISTRAL_HTTP_KEEPALIVE_EXPIRY", "60"))
+MISTRAL_HTTP_CONNECT_TIMEOUT = float(os.getenv("MISTRAL_HTTP_CONNECT_TIMEOUT", "5"))
+MISTRAL_HTTP_READ_TIMEOUT = float(os.getenv("MISTRAL_HTTP_READ_TIMEOUT", "120"))
+# "auto" uses HTTP/2 when the h2 package is installed
+MISTRAL_HTTP2 = os.getenv("MISTRAL_HTTP2", "auto")
+
+_http_client: Optional["httpx.AsyncClient"] = None
+
+
+def http2_enabled() -> bool:
+    if MISTRAL_HTTP2 == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return MISTRAL_HTTP2 == "1"
+
+
+def mistral_http_client() -> "httpx.AsyncClient":
+    """The process-wide async client for the Mistral API, created on first use.
+
+    Every role talks to the same host with the same key, so they share one
+    keep-alive pool: TLS handshakes are paid once per connection rather
+    than once per model client, and the socket count per worker stays
+    under MISTRAL_HTTP_MAX_CONNECTIONS.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=MISTRAL_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=MISTRAL_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=MISTRAL_HTTP_KEEPALIVE_EXPIRY
+        )
+        _http_client = httpx.AsyncClient(
+            base_url=MISTRAL_BASE_URL,
+            headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "Authorization": f"Bearer {os.getenv('MISTRAL_API_KEY', '')}",
+            },
+            transport=httpx.AsyncHTTPTransport(limits=limits, http2=http2_enabled()),
+            timeout=httpx.Timeout(MISTRAL_HTTP_READ_TIMEOUT, connect=MISTRAL_HTTP_CONNECT_TIMEOUT)
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared pool; call from the app's shutdown hook."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def chat_model(model: str, temperature: float = 0, max_retries: int = 2) -> "BaseChatModel":
+    """Build the chat client for `model` on the configured backend.
+
+    Backends are imported here rather than at module level: the Mistral SDK
+    is the slowest import in the app and only needed once a client is built.
+    """
+    if LLM_BACKEND == "fake":
+        from fake_llm import FakeChatModel
+        return FakeChatModel(model=model)
+    from langchain_mistralai import ChatMistralAI
+    kwargs = {"async_client": mistral_http_client()} if MISTRAL_HTTP_SHARED else {}
+    return ChatMistralAI(model=model, temperature=temperature, max_retries=max_retries, endpoint=MISTRAL_BASE_URL, **kwargs)
@@ -0,0 +1,37 @@
+"""Level-controlled logging that keeps I/O off the event loop.
+
+Records are put on an in-memory queue by the request path and written
+to stderr by a background QueueListener thread. LOG_LEVEL sets the
+threshold (default INFO); the chatty per-request traces are DEBUG.
+"""
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+_listener = None
+
+
+def setup_logging():
+    global _listener
+    if _listener is not None:
+        return
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root = logging.getLogger("rizztral")
+    root.setLevel(LOG_LEVEL)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
+
+
+def get_logger(name: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"rizztral.{name}")
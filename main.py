@@ -1,13 +1,23 @@
 import random
-from fastapi import FastAPI, HTTPException
+from fastapi import APIRouter, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 import os
 from dotenv import load_dotenv
-from langchain_mistralai import ChatMistralAI
-import nest_asyncio
+from llm_clients import chat_model, close_http_client
+from contextlib import asynccontextmanager
+from llm_chains import Chain, LazyChains, SamplingProfile, WARM_MODELS_ON_STARTUP
+from ratings import NEUTRAL_RATING, parse_rating, validate_rating
+from resilience import ProviderUnavailable, degraded_header, llm_guard, mark_degraded
+from routing import route_chain, validate_question
+from streaming import stream_chains
+from response_cache import ResponseCache
+from singleflight import SingleFlight
+from scheduler import Overloaded, llm_scheduler
+from fastapi.responses import JSONResponse, PlainTextResponse
+import metrics
+from rating_context import RatingContextManager, RATING_MAX_CONVERSATION_CHARS
 load_dotenv()
 
 questions = [
@@ -59,59 +69,36 @@ questions = [
 ]
 
 
+router = APIRouter()
 
-nest_asyncio.apply()
+async def reject_oversized_ratings(request: Request, call_next):
+    """Refuse oversized rating conversations from the Content-Length header, before the body is read"""
+    if request.url.path == "/rate-answer":
+        # JSON escaping can at most roughly double the body, so allow headroom over the character cap
+        declared = request.headers.get("content-length")
+        if declared and declared.isdigit() and int(declared) > 2 * RATING_MAX_CONVERSATION_CHARS + 1024:
+            return JSONResponse(status_code=413, content={"detail": "Conversation too large to rate"})
+    return await call_next(request)
 
-app = FastAPI()
-
-@app.get("/")
+@router.get("/")
 async def read_root():
     """Health check endpoint"""
     return {"status": "alive", "message": "Server is running"}
 
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
-llm_host_and_bachelorette = ChatMistralAI(
-    model="mistral-large-latest",
-    temperature=0,
-    max_retries=2
-)
-
-llm_contestant1 = ChatMistralAI(
-    model="ministral-3b-latest",
-    temperature=0,
-    max_retries=2
-)
-llm_contestant2 = ChatMistralAI(
-    model="ministral-8b-latest",
-    temperature=0,
-    max_retries=2
-)
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:3000"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
 
 class ContestantAnswer(BaseModel):
     answer: str
 
-# Templates
-ai_intro_template = PromptTemplate(
-    input_variables=[],
-    template="""You are a charming and witty AI bachelorette on a dating show.
+# Templates, parsed into PromptTemplates when the chains are built
+ai_intro_template = """You are a charming and witty AI bachelorette on a dating show.
 Your personality traits:
 - Confident
 - Values authenticity and humor
 - Loves being sexy
 Introduce yourself to the contestants! ONLY ONE SENTENCE ANSWER"""
-)
 
-question_generator_template = PromptTemplate(
-    input_variables=[],
-    template="""You are a witty AI bachelorette host generating a question for your contestants.
+question_generator_template = """You are a witty AI bachelorette host generating a question for your contestants.
 The question should be:
 - Flirty and playful
 - Slightly humorous but not crude
@@ -124,81 +111,205 @@ Examples of the tone we want:
 
 
 Generate a creative, funny dating show question. ONLY RETURN THE QUESTION."""
-)
 
-contestant_answer_template = PromptTemplate(
-    input_variables=["question"],
-    template="""You are a man-contestant on a dating show answering this question form the bachelorette: {question}.
+contestant_answer_template = """You are a man-contestant on a dating show answering this question form the bachelorette: {question}.
     You need to impress the bachelorette with your answer, showing off your personality and sense of humor. She is sexy, confident, and values authenticity. 
 Give a flirty but authentic answer, staying true to your character. Keep it under 3 sentences."""
-)
 
-rating_template = PromptTemplate(
-    input_variables=["conversation", "round_number"],
-    template="""You are the Bachelorrete for a dating show, rating a contestant's response to your question. You are a hard-to-please AI with high standards and a judgmental streak.
+rating_template = """You are the Bachelorrete for a dating show, rating a contestant's response to your question. You are a hard-to-please AI with high standards and a judgmental streak.
 {conversation}
 Rate the contestant's response from 0-10 based on compatibility, authenticity, and chemistry, based on the context of the conversation and trying to find the best match for you.
 Only respond with a number from 0 to 10. NO explanations or extra words!"""
-)
-
-# Initialize chains with correct LLMs
-chains = {
-    "ai_intro": LLMChain(llm=llm_host_and_bachelorette, prompt=ai_intro_template),
-    "question_generator": LLMChain(llm=llm_host_and_bachelorette, prompt=question_generator_template),
-    "contestant_answer_1": LLMChain(llm=llm_contestant1, prompt=contestant_answer_template),
-    "contestant_answer_2": LLMChain(llm=llm_contestant2, prompt=contestant_answer_template),
-    "rating": LLMChain(llm=llm_host_and_bachelorette, prompt=rating_template)
+
+summary_template = """You keep notes for the Bachelorette of a dating show.
+Notes so far: {summary}
+New exchanges:
+{exchanges}
+Update the notes with what these exchanges reveal about each contestant. Keep it under 80 words. ONLY RETURN THE NOTES."""
+
+# Sampling settings travel with each call, so concurrent requests never share a temperature
+SAMPLING_PROFILES = {
+    "ai_intro": SamplingProfile(temperature=0),
+    "question_generator": SamplingProfile(temperature=0.9),  # Higher temperature for more creative questions
+    "contestant_answer_1": SamplingProfile(temperature=0),
+    "contestant_answer_2": SamplingProfile(temperature=0),
+    "rating": SamplingProfile(temperature=0.6),
+    "summary": SamplingProfile(temperature=0, max_tokens=150)
 }
 
-@app.get("/ai-introduction")
+# The temperature=0 chains always give the same answer for the same prompt, so cache them
+response_cache = ResponseCache()
+metrics.register_collector(response_cache.collect)
+# and let concurrent identical calls (refreshes, retries) share one upstream request while the cache is still cold
+single_flight = SingleFlight()
+metrics.register_collector(single_flight.collect)
+metrics.register_collector(llm_scheduler.collect)
+metrics.register_collector(llm_guard.collect)
+
+def build_chains() -> dict:
+    """Create the model clients and initialize chains with the correct LLMs"""
+    llm_host_and_bachelorette = chat_model(
+        model="mistral-large-latest",
+        temperature=0,
+        max_retries=2
+    )
+    llm_contestant1 = chat_model(
+        model="ministral-3b-latest",
+        temperature=0,
+        max_retries=2
+    )
+    llm_contestant2 = chat_model(
+        model="ministral-8b-latest",
+        temperature=0,
+        max_retries=2
+    )
+
+    # Rating and question generation try ministral-8b first and escalate to the large model on a bad reply
+    tiers = {"small": llm_contestant2, "large": llm_host_and_bachelorette}
+    return {
+        "ai_intro": Chain("ai_intro", llm_host_and_bachelorette, ai_intro_template, SAMPLING_PROFILES["ai_intro"], cache=response_cache, single_flight=single_flight),
+        "question_generator": route_chain("question_generator", tiers, question_generator_template, SAMPLING_PROFILES["question_generator"], validate_question),
+        "contestant_answer_1": Chain("contestant_answer_1", llm_contestant1, contestant_answer_template, SAMPLING_PROFILES["contestant_answer_1"], cache=response_cache, single_flight=single_flight),
+        "contestant_answer_2": Chain("contestant_answer_2", llm_contestant2, contestant_answer_template, SAMPLING_PROFILES["contestant_answer_2"], cache=response_cache, single_flight=single_flight),
+        "rating": route_chain("rating", tiers, rating_template, SAMPLING_PROFILES["rating"], validate_rating),
+        # Summaries only need to be faithful, not witty, so the small model handles them
+        "summary": Chain("summary", llm_contestant2, summary_template, SAMPLING_PROFILES["summary"], single_flight=single_flight)
+    }
+
+# Model clients are created on the first request that needs a chain, so the health check is up right away
+chains = LazyChains(build_chains)
+
+async def summarize_exchanges(summary: str, exchanges: str) -> str:
+    response = await chains["summary"].ainvoke({"summary": summary or "(none yet)", "exchanges": exchanges})
+    return response["text"].strip()
+
+# Keeps /rate-answer prompts flat as games grow: recent exchanges verbatim, older ones summarized
+rating_contexts = RatingContextManager(summarize_exchanges)
+
+@router.get("/ai-introduction")
 async def get_ai_introduction():
     """Generate AI bachelorette's introduction"""
     try:
         response = await chains["ai_intro"].ainvoke({})
         return {"text": response["text"]}
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating AI introduction: {str(e)}")
 
-@app.get("/get-question")
+@router.get("/ai-introduction/stream")
+async def stream_ai_introduction():
+    """Stream the AI bachelorette's introduction as Server-Sent Events"""
+    return stream_chains(
+        [("bachelorette", chains["ai_intro"].astream({}))],
+        lambda results: {"text": results[0]}
+    )
+
+@router.get("/get-question")
 async def get_question():
     """Generate a new question for the game"""
     try:
-        llm_host_and_bachelorette.temperature = 0.9  # Higher temperature for more creative questions
         # Pass the questions to the prompt dynamically
         response = await chains["question_generator"].ainvoke({"questions": random.sample(questions, 3)})
-        llm_host_and_bachelorette.temperature = 0.7  # Reset temperature
         question = response["text"].strip('"')
         return {"question": question}
+    except ProviderUnavailable as e:
+        # The model is down or too slow: ask one of our own questions instead
+        mark_degraded("seed_question", e)
+        return {"question": random.choice(questions), "degraded": True}
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating question: {str(e)}")
+
+@router.get("/get-question/stream")
+async def stream_question():
+    """Stream a new question as Server-Sent Events; the final event carries the cleaned question"""
+    return stream_chains(
+        [("question", chains["question_generator"].astream({"questions": random.sample(questions, 3)}))],
+        lambda results: {"question": results[0].strip('"')}
+    )
+
     
-    
-@app.get("/get-ai-answers")
+@router.get("/get-ai-answers")
 async def get_ai_answers(question: str, contestant: int):
     """Generate AI contestant responses to the current question"""
     try:
-        llm_host_and_bachelorette.temperature = 0.8
         chain_name = f"contestant_answer_{contestant}"
         response = await chains[chain_name].ainvoke({"question": question})
-        llm_host_and_bachelorette.temperature = 0.7
         return {"answer": response["text"]}
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating AI answers: {str(e)}")
 
+@router.get("/get-ai-answers/stream")
+async def stream_ai_answers(question: str, contestant: int):
+    """Stream an AI contestant's response as Server-Sent Events"""
+    chain_name = f"contestant_answer_{contestant}"
+    if chain_name not in chains:
+        raise HTTPException(status_code=400, detail=f"Unknown contestant: {contestant}")
+    return stream_chains(
+        [(f"contestant{contestant}", chains[chain_name].astream({"question": question}))],
+        lambda results: {"answer": results[0]}
+    )
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Response cache hit rate and size, and how many calls were coalesced while in flight"""
+    return {**await response_cache.stats(), "single_flight": single_flight.stats()}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus metrics: per-chain LLM latency, tokens, retries and HTTP latency per route"""
+    return metrics.render()
+
 class RatingRequest(BaseModel):
-    conversation: str
+    conversation: str = Field(max_length=RATING_MAX_CONVERSATION_CHARS)
     round_number: int
+    session_id: Optional[str] = None
 
-@app.post("/rate-answer")
+@router.post("/rate-answer")
 async def rate_answer(request: RatingRequest):
     """Rate a single answer based on the conversation"""
     try:
-        llm_host_and_bachelorette.temperature = 0.6
+        conversation = await rating_contexts.build(request.conversation, request.session_id)
         response = await chains["rating"].ainvoke({
-            "conversation": request.conversation,
+            "conversation": conversation,
             "round_number": request.round_number
         })
-        rating = float(response["text"].strip())
+        rating = parse_rating(response["text"])
         return {"rating": rating}
+    except ProviderUnavailable as e:
+        mark_degraded("neutral_rating", e)
+        return {"rating": NEUTRAL_RATING, "degraded": True}
+    except Overloaded:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error rating answer: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if WARM_MODELS_ON_STARTUP:
+        chains.load()
+    yield
+    await close_http_client()
+    chains.reset()
+
+def create_app() -> FastAPI:
+    """Build the FastAPI app. Routes are registered right away; chains are built lazily (see WARM_MODELS_ON_STARTUP)."""
+    app = FastAPI(lifespan=lifespan)
+    metrics.instrument_app(app)
+    degraded_header(app)
+    app.middleware("http")(reject_oversized_ratings)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173", "http://localhost:3000"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.include_router(router)
+    return app
+
+app = create_app()
@@ -0,0 +1,206 @@
+"""Minimal Prometheus-format metrics.
+
+Counters, gauges and histograms keyed by label values, rendered in the
+text exposition format served at /metrics. Components that already keep
+their own counters (session store, pools, caches) register a collector
+that is read at scrape time instead of being updated on every request.
+"""
+import bisect
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackHandler
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# A collector returns (name, type, help, [(labels, value), ...]) tuples at scrape time
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Tuple[dict, float]]]]]
+
+_metrics: List["Metric"] = []
+_collectors: List[Collector] = []
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _metrics.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        self._values[self._key(labels)] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def dec(self, amount: float = 1, **labels):
+        self._values[self._key(labels)] -= amount
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+        counts[bisect.bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, counts in self._counts.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = _format_labels(self.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {self._sums[key]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+def register_collector(collector: Collector):
+    _collectors.append(collector)
+
+
+def render() -> str:
+    blocks = [metric.render() for metric in _metrics]
+    for collector in _collectors:
+        for name, metric_type, help, samples in collector():
+            lines = [f"# HELP {name} {help}", f"# TYPE {name} {metric_type}"]
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {value}")
+            blocks.append("\n".join(lines))
+    return "\n".join(blocks) + "\n"
+
+
+LLM_LABELS = ("chain", "model")
+
+llm_requests = Counter("llm_requests_total", "Upstream LLM calls by outcome", LLM_LABELS + ("outcome",))
+llm_errors = Counter("llm_errors_total", "Failed upstream LLM calls by error class", LLM_LABELS + ("error",))
+llm_duration = Histogram("llm_request_duration_seconds", "Wall time of upstream LLM calls", LLM_LABELS)
+llm_ttft = Histogram("llm_time_to_first_token_seconds", "Time until the first streamed token", LLM_LABELS)
+llm_prompt_tokens = Counter("llm_prompt_tokens_total", "Prompt tokens sent upstream", LLM_LABELS)
+llm_completion_tokens = Counter("llm_completion_tokens_total", "Completion tokens received", LLM_LABELS)
+llm_retries = Counter("llm_retries_total", "Client-side retries of upstream LLM calls", LLM_LABELS)
+llm_routed_calls = Counter("llm_routed_calls_total", "Calls to roles served by a tier ladder", ("chain",))
+llm_escalations = Counter(
+    "llm_escalations_total", "Calls escalated to a larger model tier", ("chain", "from_model", "to_model", "reason")
+)
+llm_queue_wait = Histogram("llm_scheduler_wait_seconds", "Time LLM calls waited for upstream budget", ("model", "priority"))
+llm_shed = Counter("llm_scheduler_shed_total", "LLM calls rejected by admission control", ("model", "priority", "reason"))
+llm_deadline_exceeded = Counter("llm_deadline_exceeded_total", "Chain calls abandoned at their deadline", LLM_LABELS)
+llm_hedges = Counter("llm_hedges_total", "Duplicate requests fired for slow calls, and how many beat the original", LLM_LABELS + ("outcome",))
+degraded_responses = Counter("degraded_responses_total", "Fallbacks served instead of a model reply", ("fallback", "reason"))
+
+http_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+
+
+class RetryCounter(AsyncCallbackHandler):
+    """Counts the model client's internal retries, which are otherwise invisible."""
+
+    def __init__(self):
+        self.retries = 0
+
+    async def on_retry(self, retry_state, **kwargs):
+        self.retries += 1
+
+
+def observe_llm_call(
+    chain: str,
+    model: str,
+    duration: float,
+    ttft: Optional[float] = None,
+    usage: Optional[dict] = None,
+    retries: int = 0,
+    error: Optional[BaseException] = None,
+):
+    labels = {"chain": chain, "model": model}
+    llm_requests.inc(outcome="error" if error is not None else "ok", **labels)
+    llm_duration.observe(duration, **labels)
+    if ttft is not None:
+        llm_ttft.observe(ttft, **labels)
+    if retries:
+        llm_retries.inc(retries, **labels)
+    if error is not None:
+        llm_errors.inc(error=type(error).__name__, **labels)
+    if usage:
+        llm_prompt_tokens.inc(usage.get("input_tokens", 0), **labels)
+        llm_completion_tokens.inc(usage.get("output_tokens", 0), **labels)
+
+
+def instrument_app(app):
+    """Time every HTTP request, labelled by route template rather than raw path."""
+    @app.middleware("http")
+    async def record_request_duration(request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get("route")
+            http_duration.observe(
+                time.perf_counter() - start,
+                method=request.method,
+                route=getattr(route, "path", "unmatched"),
+                status=status
+            )
@@ -0,0 +1,45 @@
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+
+class Pipeline:
+    """A small graph of async steps, each started as soon as the steps it depends on have finished.
+
+    Steps are added with the names of the steps whose results they take
+    as arguments, so a step can only depend on steps added before it.
+    `run` starts every step at once and yields `(name, result)` pairs in
+    the order steps finish. The first failure cancels everything still
+    running and is raised from `run`; so does closing the iterator early,
+    e.g. when a streaming client disconnects.
+    """
+
+    def __init__(self):
+        self._steps: Dict[Hashable, Tuple[Callable[..., Awaitable[Any]], Tuple[Hashable, ...]]] = {}
+
+    def add(self, name: Hashable, fn: Callable[..., Awaitable[Any]], *deps: Hashable):
+        missing = [dep for dep in deps if dep not in self._steps]
+        if missing:
+            raise ValueError(f"Step {name!r} depends on unknown steps {missing!r}")
+        self._steps[name] = (fn, deps)
+
+    async def run(self) -> AsyncIterator[Tuple[Hashable, Any]]:
+        tasks: Dict[Hashable, asyncio.Task] = {}
+
+        async def step(fn: Callable[..., Awaitable[Any]], deps: Tuple[Hashable, ...]):
+            args = [await tasks[dep] for dep in deps]
+            return await fn(*args)
+
+        for name, (fn, deps) in self._steps.items():
+            tasks[name] = asyncio.create_task(step(fn, deps))
+        names = {task: name for name, task in tasks.items()}
+        pending: List[asyncio.Task] = list(tasks.values())
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Report in the order the steps were added when several finish together
+                for task in sorted(done, key=list(tasks.values()).index):
+                    yield names[task], task.result()
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
@@ -0,0 +1,143 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional
+
+from scheduler import Priority, current_priority
+
+QUESTION_POOL_SIZE = int(os.getenv("QUESTION_POOL_SIZE", "10"))
+QUESTION_POOL_REFILL_CONCURRENCY = int(os.getenv("QUESTION_POOL_REFILL_CONCURRENCY", "1"))
+QUESTION_POOL_TTL_SECONDS = float(os.getenv("QUESTION_POOL_TTL_SECONDS", "1800"))
+# How long the refill loop backs off while players are waiting on live calls or after failures
+QUESTION_POOL_BACKOFF_SECONDS = 0.5
+
+
+class QuestionPool:
+    """Bounded pool of pre-generated questions refilled in the background.
+
+    `get` serves the oldest fresh question immediately and only falls back
+    to a live `generate` call when the pool is empty. Refilling yields to
+    live calls: it pauses while a player is waiting on a pool miss, and
+    its LLM calls queue behind interactive ones in the scheduler, so
+    warming never competes with interactive traffic.
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[], Awaitable[str]],
+        size: int = QUESTION_POOL_SIZE,
+        refill_concurrency: int = QUESTION_POOL_REFILL_CONCURRENCY,
+        ttl: float = QUESTION_POOL_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._generate = generate
+        self.size = size
+        self.refill_concurrency = max(1, refill_concurrency)
+        self.ttl = ttl
+        self._clock = clock
+        self._questions: deque = deque()
+        self._refill_task: Optional[asyncio.Task] = None
+        self._live_calls = 0
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.stale_dropped = 0
+        self.refill_failures = 0
+
+    def __len__(self) -> int:
+        return len(self._questions)
+
+    def pop(self) -> Optional[str]:
+        """Take a pooled question, or None on a miss. Either way, top the pool back up."""
+        self._drop_stale()
+        question = None
+        if self._questions:
+            question = self._questions.popleft()[1]
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.warm()
+        return question
+
+    async def get(self) -> str:
+        question = self.pop()
+        if question is not None:
+            return question
+        self._live_calls += 1
+        try:
+            return await self._generate()
+        finally:
+            self._live_calls -= 1
+
+    def warm(self):
+        """Start the background refill if the pool is enabled and not already refilling."""
+        if self.size <= 0:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.get_running_loop().create_task(self._refill())
+
+    async def close(self):
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            try:
+                await self._refill_task
+            except asyncio.CancelledError:
+                pass
+            self._refill_task = None
+
+    def _drop_stale(self):
+        cutoff = self._clock() - self.ttl
+        while self._questions and self._questions[0][0] <= cutoff:
+            self._questions.popleft()
+            self.stale_dropped += 1
+
+    async def _refill(self):
+        # The task runs in its own context, so this only lowers the priority of the refill's calls
+        current_priority.set(Priority.BACKGROUND)
+        while True:
+            self._drop_stale()
+            missing = self.size - len(self._questions)
+            if missing <= 0:
+                return
+            if self._live_calls:
+                await asyncio.sleep(QUESTION_POOL_BACKOFF_SECONDS)
+                continue
+            results = await asyncio.gather(
+                *(self._generate() for _ in range(min(missing, self.refill_concurrency))),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    self.refill_failures += 1
+                    continue
+                self._questions.append((self._clock(), result))
+                self.generated += 1
+            if all(isinstance(result, Exception) for result in results):
+                # Shed calls say when the model has budget again
+                await asyncio.sleep(max(getattr(result, "retry_after", 0) for result in results) or QUESTION_POOL_BACKOFF_SECONDS)
+
+    def stats(self) -> dict:
+        served = self.hits + self.misses
+        return {
+            "size": len(self._questions),
+            "capacity": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / served if served else 0.0,
+            "generated": self.generated,
+            "stale_dropped": self.stale_dropped,
+            "refill_failures": self.refill_failures,
+        }
+
+    def collect(self):
+        """Samples for the /metrics endpoint."""
+        return [
+            ("question_pool_size", "gauge", "Pre-generated questions ready to serve", [({}, len(self._questions))]),
+            ("question_pool_requests_total", "counter", "Pool lookups by result", [
+                ({"result": "hit"}, self.hits),
+                ({"result": "miss"}, self.misses),
+            ]),
+            ("question_pool_refill_failures_total", "counter", "Failed background generations", [({}, self.refill_failures)]),
+            ("question_pool_stale_dropped_total", "counter", "Questions dropped for exceeding the TTL", [({}, self.stale_dropped)]),
+        ]
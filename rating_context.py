@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+import os
+from typing import Awaitable, Callable, List, Optional
+
+from llm_chains import estimate_tokens
+from sessions import SessionStore
+
+# Token budget for the verbatim tail of the conversation; older exchanges are summarized. 0 disables bounding
+RATING_CONTEXT_TOKEN_BUDGET = int(os.getenv("RATING_CONTEXT_TOKEN_BUDGET", "600"))
+# Hard cap on the conversation a client may send; larger requests are rejected before any work
+RATING_MAX_CONVERSATION_CHARS = int(os.getenv("RATING_MAX_CONVERSATION_CHARS", "16000"))
+RATING_CONTEXT_MAX_SESSIONS = int(os.getenv("RATING_CONTEXT_MAX_SESSIONS", "10000"))
+
+
+def split_exchanges(conversation: str) -> List[str]:
+    """Split a conversation into exchanges: blank-line separated blocks, or lines if there are none."""
+    blocks = [block.strip() for block in conversation.strip().split("\n\n") if block.strip()]
+    if len(blocks) > 1:
+        return blocks
+    return [line.strip() for line in conversation.strip().splitlines() if line.strip()]
+
+
+def digest(exchanges: List[str]) -> str:
+    return hashlib.sha256("\n\n".join(exchanges).encode()).hexdigest()
+
+
+class RatingContext:
+    """Running summary of the exchanges that fell out of one session's window."""
+
+    def __init__(self):
+        self.summary = ""
+        self.summarized = 0
+        self.summarized_digest = digest([])
+        self.lock = asyncio.Lock()
+
+
+class RatingContextManager:
+    """Builds token-bounded rating prompts.
+
+    The most recent exchanges that fit in `token_budget` are kept word for
+    word. Everything older is folded into a per-session summary that is
+    extended incrementally: when a request's older exchanges start with
+    the ones already summarized, only the new ones are sent to
+    `summarize(previous_summary, new_exchanges)`.
+    """
+
+    def __init__(
+        self,
+        summarize: Callable[[str, str], Awaitable[str]],
+        token_budget: int = RATING_CONTEXT_TOKEN_BUDGET,
+        max_sessions: int = RATING_CONTEXT_MAX_SESSIONS,
+    ):
+        self._summarize = summarize
+        self.token_budget = token_budget
+        self.contexts: SessionStore[RatingContext] = SessionStore(RatingContext, max_sessions=max_sessions)
+        self.summary_calls = 0
+
+    def window(self, exchanges: List[str]) -> int:
+        """Index of the first exchange kept verbatim. The latest exchange is always kept."""
+        used = 0
+        cut = len(exchanges)
+        while cut > 0:
+            cost = estimate_tokens(exchanges[cut - 1])
+            if cut < len(exchanges) and used + cost > self.token_budget:
+                break
+            used += cost
+            cut -= 1
+        return cut
+
+    async def build(self, conversation: str, session_id: Optional[str] = None) -> str:
+        if self.token_budget <= 0:
+            return conversation
+        exchanges = split_exchanges(conversation)
+        cut = self.window(exchanges)
+        if cut == 0:
+            return conversation
+        older, recent = exchanges[:cut], exchanges[cut:]
+
+        # Without an explicit session, the opening exchange identifies the game
+        context = self.contexts.get(session_id or digest(exchanges[:1]))
+        async with context.lock:
+            if context.summarized > len(older) or digest(older[:context.summarized]) != context.summarized_digest:
+                # The conversation doesn't extend what we summarized before; start over
+                context.summary, context.summarized = "", 0
+            if context.summarized < len(older):
+                self.summary_calls += 1
+                context.summary = await self._summarize(context.summary, "\n\n".join(older[context.summarized:]))
+                context.summarized = len(older)
+                context.summarized_digest = digest(older)
+            summary = context.summary
+
+        return f"Summary of earlier rounds: {summary}\n\n" + "\n\n".join(recent)
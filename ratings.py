@@ -0,0 +1,66 @@
+import json
+import re
+from typing import Dict, Iterable
+
+from pydantic import BaseModel, Field, ValidationError
+
+MIN_RATING = 0.0
+MAX_RATING = 10.0
+# Served when the rating model is unavailable, so a round can still finish without favouring anyone
+NEUTRAL_RATING = 5.0
+
+
+class Rating(BaseModel):
+    score: float = Field(ge=MIN_RATING, le=MAX_RATING)
+
+
+def parse_rating(text: str) -> float:
+    """Pull the first number out of a single-answer rating reply."""
+    match = re.search(r'\d+(?:\.\d+)?', text)
+    if match is None:
+        raise ValueError(f"No rating found in model output: {text!r}")
+    try:
+        return Rating(score=float(match.group())).score
+    except ValidationError:
+        raise ValueError(f"Rating out of range in model output: {text!r}")
+
+
+def validate_rating(inputs: dict, text: str):
+    """Routing check: a bare in-range number. Extra words mean the model hedged."""
+    parse_rating(text)
+    if len(text.strip()) > 8:
+        raise ValueError(f"Rating reply is not just a number: {text[:40]!r}")
+
+
+def validate_batch_ratings(inputs: dict, text: str):
+    """Routing check: every contestant in the prompt got a valid score."""
+    contestant_ids = [c.strip() for c in inputs["contestant_ids"].split(",")]
+    ratings = parse_batch_ratings(text, contestant_ids)
+    missing = [c for c in contestant_ids if c not in ratings]
+    if missing:
+        raise ValueError(f"Batched rating missing valid scores for {missing}")
+
+
+def parse_batch_ratings(text: str, contestant_ids: Iterable[str]) -> Dict[str, float]:
+    """Validate a batched rating reply of the form {"contestant1": 7, ...}.
+
+    Only contestants with a present, in-range score are returned, so the
+    caller can fall back to per-answer rating for whoever is missing.
+    """
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end < start:
+        raise ValueError(f"No JSON object in batched rating output: {text!r}")
+    try:
+        raw = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Malformed batched rating output: {e}")
+    if not isinstance(raw, dict):
+        raise ValueError(f"Batched rating output is not an object: {text!r}")
+
+    ratings = {}
+    for contestant_id in contestant_ids:
+        try:
+            ratings[contestant_id] = Rating(score=raw[contestant_id]).score
+        except (KeyError, ValidationError):
+            continue
+    return ratings
@@ -0,0 +1,123 @@
+"""Replay a game journal offline and re-score every finished game under other rules, without model calls.
+
+Reads every segment of a JOURNAL_DIR's games journal in order, rebuilds
+each game as it was played (a game reset and played again counts once
+per playthrough) and names each finished game's winner under every
+--scoring rule, next to how many winners differ from the live rule
+(the mean rating, as tally_winner uses).
+
+Run from the repo root:
+    python -m replay --journal journal/games
+    python -m replay --journal journal --scoring median --scoring last --out rescored.json
+"""
+import argparse
+import json
+import os
+import statistics
+from collections import Counter
+from typing import Callable, Dict, List, Optional
+
+from journal import RESET, apply_event, iter_events
+
+# Each rule turns one contestant's ratings, in round order, into the score the winner is picked by
+SCORING_RULES: Dict[str, Callable[[List[float]], float]] = {
+    "mean": statistics.fmean,
+    "median": statistics.median,
+    "best": max,
+    "last": lambda ratings: ratings[-1],
+}
+
+
+def fresh_game() -> dict:
+    # Imported here so --help doesn't pay for loading the app
+    from endpoints import GameState
+    return GameState().to_dict()
+
+
+def finished(state: dict) -> bool:
+    return all(len(ratings) >= state["max_rounds"] for ratings in state["contestant_ratings"].values())
+
+
+def pick_winner(ratings: Dict[str, List[float]], rule: Callable[[List[float]], float]) -> str:
+    # max keeps the first of equal scores, as tally_winner does
+    return max(ratings, key=lambda contestant: rule(ratings[contestant]))
+
+
+def replay(directory: str) -> List[dict]:
+    """Every finished playthrough in the journal at `directory`, in the order they finished."""
+    fresh = fresh_game()
+    states: Dict[str, dict] = {}
+    seen: Dict[str, dict] = {}
+    games = []
+
+    def close(session_id: str):
+        info = seen.pop(session_id, None)
+        state = states.get(session_id)
+        if info is not None and state is not None and finished(state):
+            games.append({"session_id": session_id, "ratings": state["contestant_ratings"], **info})
+
+    for event in iter_events(directory):
+        session_id = event["s"]
+        if event["e"] == RESET:
+            close(session_id)
+        info = seen.setdefault(session_id, {"events": 0, "started": event["t"]})
+        info["events"] += 1
+        info["ended"] = event["t"]
+        apply_event(states, event, fresh)
+    for session_id in list(seen):
+        close(session_id)
+    return games
+
+
+def rescore(games: List[dict], rules: List[str]) -> dict:
+    winners = {rule: [pick_winner(game["ratings"], SCORING_RULES[rule]) for game in games] for rule in rules}
+    baseline = [pick_winner(game["ratings"], SCORING_RULES["mean"]) for game in games]
+    ratings = [rating for game in games for values in game["ratings"].values() for rating in values]
+    durations = [game["ended"] - game["started"] for game in games]
+    return {
+        "games": len(games),
+        "rules": {
+            rule: {
+                "wins": dict(sorted(Counter(picked).items())),
+                "changed_vs_mean": sum(a != b for a, b in zip(picked, baseline)),
+            }
+            for rule, picked in winners.items()
+        },
+        "mean_rating": round(statistics.fmean(ratings), 3) if ratings else None,
+        "stdev_rating": round(statistics.pstdev(ratings), 3) if ratings else None,
+        "events_per_game": round(statistics.fmean(game["events"] for game in games), 1) if games else None,
+        "median_game_seconds": round(statistics.median(durations), 2) if durations else None,
+    }
+
+
+def print_report(report: dict):
+    print(f"{report['games']} finished games, {report['events_per_game']} events each, "
+          f"median {report['median_game_seconds']}s; ratings mean {report['mean_rating']} stdev {report['stdev_rating']}")
+    for rule, result in report["rules"].items():
+        wins = ", ".join(f"{contestant} {count / max(1, report['games']):.1%}" for contestant, count in result["wins"].items())
+        print(f"{rule:<8}{wins}  ({result['changed_vs_mean']} winners differ from mean)")
+
+
+def journal_path(path: str) -> str:
+    """Accept the JOURNAL_DIR itself as well as its games journal."""
+    games = os.path.join(path, "games")
+    return games if os.path.isdir(games) else path
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--journal", required=True, help="JOURNAL_DIR, or the games journal inside it")
+    parser.add_argument("--scoring", action="append", choices=sorted(SCORING_RULES),
+                        help="scoring rule to re-score with; repeat for several (default: all)")
+    parser.add_argument("--out", help="also write the report as JSON here")
+    args = parser.parse_args(argv)
+
+    report = rescore(replay(journal_path(args.journal)), args.scoring or list(SCORING_RULES))
+    print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
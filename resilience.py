@@ -0,0 +1,357 @@
+import asyncio
+import os
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+import metrics
+from scheduler import Overloaded
+
+T = TypeVar("T")
+
+# Longest a chain call may take, per chain as "rating=5,question_generator=8" with a default for the rest
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "20"))
+LLM_DEADLINES = os.getenv("LLM_DEADLINES", "")
+# Fire a duplicate request once a call is slower than this percentile of the chain's recent calls; 0 disables
+LLM_HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+# Hedges allowed per call, so a slow provider isn't sent twice the traffic
+LLM_HEDGE_MAX_RATIO = float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1"))
+# Consecutive failures that open a model's circuit, and how long it stays open before a probe call
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_OPEN_SECONDS = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+
+LATENCY_WINDOW = 200
+
+
+class ProviderUnavailable(Overloaded):
+    """The model can't serve this call in time; routes with a fallback serve it instead."""
+
+
+class CircuitOpen(ProviderUnavailable):
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(503, f"Model {model} is failing, retry later.", retry_after)
+
+
+class DeadlineExceeded(ProviderUnavailable):
+    def __init__(self, chain: str, deadline: float):
+        super().__init__(504, f"{chain} took longer than {deadline:g}s.", 1)
+
+
+class DeadlineBudget:
+    """One deadline shared by several guarded calls, such as the tiers of a routed call.
+
+    Each call only gets what the calls before it left over; time spent
+    waiting for the scheduler isn't taken from it.
+    """
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.remaining = seconds
+
+
+def parse_deadlines(spec: str) -> Dict[str, float]:
+    deadlines = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        chain, _, seconds = entry.partition("=")
+        deadlines[chain.strip()] = float(seconds)
+    return deadlines
+
+
+class CircuitBreaker:
+    """Closed until `failures` calls fail in a row, then open for `open_seconds`.
+
+    Once that has passed, one probe call at a time is let through
+    (half-open); its success closes the circuit and its failure opens it
+    again.
+    """
+
+    def __init__(self, model: str, failures: int, open_seconds: float, clock: Callable[[], float]):
+        self.model = model
+        self.failures = failures
+        self.open_seconds = open_seconds
+        self._clock = clock
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.probing = False
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if self._clock() - self.opened_at < self.open_seconds else "half_open"
+
+    def check(self):
+        """Raise CircuitOpen unless a call may go upstream now."""
+        state = self.state
+        if state == "closed":
+            return
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return
+        retry_after = self.opened_at + self.open_seconds - self._clock() if state == "open" else 1
+        raise CircuitOpen(self.model, retry_after)
+
+    def success(self):
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def failure(self):
+        self.consecutive_failures += 1
+        if self.probing or self.consecutive_failures >= self.failures:
+            if self.opened_at is None or self.probing:
+                self.trips += 1
+            self.opened_at = self._clock()
+        self.probing = False
+
+    def release(self):
+        """The call ended without telling us anything about the model, e.g. it was cancelled."""
+        self.probing = False
+
+
+class Guard:
+    """Deadlines, hedged requests and per-model circuit breakers for upstream LLM calls.
+
+    `call` runs one upstream call for a chain: it fails fast with
+    CircuitOpen while the model's breaker is open, gives up with
+    DeadlineExceeded after the chain's deadline (or what is left of a
+    DeadlineBudget shared with earlier calls), and once the call is
+    slower than the chain's LLM_HEDGE_PERCENTILE latency, races a
+    duplicate request against it (within LLM_HEDGE_MAX_RATIO hedges per
+    call). `admit` waits for the scheduler before the deadline starts,
+    so time spent queued doesn't count against it. Timeouts and upstream
+    errors count against the breaker; waiting for or being shed by the
+    scheduler doesn't.
+    """
+
+    def __init__(
+        self,
+        deadlines: Dict[str, float],
+        default_deadline: float = LLM_DEADLINE_SECONDS,
+        hedge_percentile: float = LLM_HEDGE_PERCENTILE,
+        hedge_min_samples: int = LLM_HEDGE_MIN_SAMPLES,
+        hedge_max_ratio: float = LLM_HEDGE_MAX_RATIO,
+        breaker_failures: int = LLM_BREAKER_FAILURES,
+        breaker_open_seconds: float = LLM_BREAKER_OPEN_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.deadlines = deadlines
+        self.default_deadline = default_deadline
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker_failures = breaker_failures
+        self.breaker_open_seconds = breaker_open_seconds
+        self._clock = clock
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self.calls: Counter = Counter()
+        self.hedges: Counter = Counter()
+
+    def deadline(self, chain: str) -> float:
+        return self.deadlines.get(chain, self.default_deadline)
+
+    def breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(
+                model, self.breaker_failures, self.breaker_open_seconds, self._clock
+            )
+        return breaker
+
+    def hedge_delay(self, chain: str, model: str) -> Optional[float]:
+        """How long to wait before hedging, or None if the chain can't be hedged (yet)."""
+        latencies = self._latencies.get((chain, model))
+        if not self.hedge_percentile or latencies is None or len(latencies) < self.hedge_min_samples:
+            return None
+        if self.hedges[chain] >= self.hedge_max_ratio * self.calls[chain]:
+            return None
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+
+    def _timeout(self, chain: str, model: str, budget: Optional[DeadlineBudget]) -> float:
+        """Seconds the next call may take, raising DeadlineExceeded if `budget` is already spent."""
+        deadline = self.deadline(chain)
+        if budget is None:
+            return deadline
+        if budget.remaining <= 0:
+            metrics.llm_deadline_exceeded.inc(chain=chain, model=model)
+            raise DeadlineExceeded(chain, budget.seconds)
+        return min(deadline, budget.remaining)
+
+    async def call(
+        self,
+        chain: str,
+        model: str,
+        fn: Callable[[], Awaitable[T]],
+        admit: Optional[Callable[[], Awaitable[None]]] = None,
+        budget: Optional[DeadlineBudget] = None,
+    ) -> T:
+        deadline = self._timeout(chain, model, budget)
+        breaker = self.breaker(model)
+        breaker.check()
+        await self._admit(breaker, admit)
+        self.calls[chain] += 1
+        start = self._clock()
+        try:
+            result = await asyncio.wait_for(self._hedged(chain, model, fn, admit), deadline)
+        except asyncio.TimeoutError:
+            breaker.failure()
+            metrics.llm_deadline_exceeded.inc(chain=chain, model=model)
+            raise DeadlineExceeded(chain, deadline if budget is None else budget.seconds) from None
+        except Overloaded:
+            breaker.release()
+            raise
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.failure()
+            raise
+        finally:
+            if budget is not None:
+                budget.remaining -= self._clock() - start
+        breaker.success()
+        self._latencies.setdefault((chain, model), deque(maxlen=LATENCY_WINDOW)).append(self._clock() - start)
+        return result
+
+    async def stream(
+        self,
+        chain: str,
+        model: str,
+        chunks: AsyncIterator[str],
+        admit: Optional[Callable[[], Awaitable[None]]] = None,
+        budget: Optional[DeadlineBudget] = None,
+    ) -> AsyncIterator[str]:
+        """Guard a streamed call; its deadline bounds the time to the first chunk and it is never hedged."""
+        deadline = self._timeout(chain, model, budget)
+        breaker = self.breaker(model)
+        breaker.check()
+        await self._admit(breaker, admit)
+        iterator = chunks.__aiter__()
+        start = self._clock()
+        try:
+            try:
+                first = await asyncio.wait_for(iterator.__anext__(), deadline)
+            except StopAsyncIteration:
+                breaker.success()
+                return
+            except asyncio.TimeoutError:
+                breaker.failure()
+                metrics.llm_deadline_exceeded.inc(chain=chain, model=model)
+                raise DeadlineExceeded(chain, deadline if budget is None else budget.seconds) from None
+            finally:
+                if budget is not None:
+                    budget.remaining -= self._clock() - start
+            yield first
+            async for chunk in iterator:
+                yield chunk
+        except Overloaded:
+            breaker.release()
+            raise
+        except Exception:
+            breaker.failure()
+            raise
+        except BaseException:
+            breaker.release()
+            raise
+        breaker.success()
+
+    @staticmethod
+    async def _admit(breaker: CircuitBreaker, admit: Optional[Callable[[], Awaitable[None]]]):
+        if admit is None:
+            return
+        try:
+            await admit()
+        except BaseException:
+            # Queueing or being shed says nothing about the model, so a probe call may go again
+            breaker.release()
+            raise
+
+    async def _hedged(
+        self, chain: str, model: str, fn: Callable[[], Awaitable[T]], admit: Optional[Callable[[], Awaitable[None]]]
+    ) -> T:
+        delay = self.hedge_delay(chain, model)
+        if delay is None:
+            return await fn()
+
+        async def hedge() -> T:
+            # The duplicate is admitted like any other call; if it's shed, the original carries on alone
+            if admit is not None:
+                await admit()
+            return await fn()
+
+        tasks: List[asyncio.Task] = [asyncio.ensure_future(fn())]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedges[chain] += 1
+                metrics.llm_hedges.inc(chain=chain, model=model, outcome="fired")
+                tasks.append(asyncio.ensure_future(hedge()))
+            pending = set(tasks)
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not tasks[0]:
+                            metrics.llm_hedges.inc(chain=chain, model=model, outcome="won")
+                        return task.result()
+                if not pending:
+                    # Both failed: report the original call's error
+                    return tasks[0].result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "breakers": {
+                model: {"state": breaker.state, "consecutive_failures": breaker.consecutive_failures, "trips": breaker.trips}
+                for model, breaker in self._breakers.items()
+            },
+            "hedges": dict(self.hedges),
+        }
+
+    def collect(self):
+        """Samples for the /metrics endpoint."""
+        states = ("closed", "half_open", "open")
+        return [
+            ("llm_circuit_state", "gauge", "1 for each model's current circuit breaker state", [
+                ({"model": model, "state": state}, int(breaker.state == state))
+                for model, breaker in self._breakers.items()
+                for state in states
+            ]),
+            ("llm_circuit_trips_total", "counter", "Times each model's circuit opened", [
+                ({"model": model}, breaker.trips) for model, breaker in self._breakers.items()
+            ]),
+        ]
+
+
+llm_guard = Guard(parse_deadlines(LLM_DEADLINES))
+
+# Fallback reasons recorded while handling the current request; see degraded_header
+_degraded: ContextVar[Optional[List[str]]] = ContextVar("degraded", default=None)
+
+
+def mark_degraded(fallback: str, error: Exception):
+    """Record that `fallback` answered part of this request instead of the model."""
+    metrics.degraded_responses.inc(fallback=fallback, reason=type(error).__name__)
+    reasons = _degraded.get()
+    if reasons is not None:
+        reasons.append(type(error).__name__)
+
+
+def degraded_header(app):
+    """Flag responses served (partly) from fallbacks with an X-Degraded header naming the reasons."""
+    @app.middleware("http")
+    async def add_degraded_header(request, call_next):
+        # The route runs in a copy of this context, so it appends to this very list
+        reasons: List[str] = []
+        _degraded.set(reasons)
+        response = await call_next(request)
+        if reasons:
+            response.headers["X-Degraded"] = ",".join(sorted(set(reasons)))
+        return response
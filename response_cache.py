@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, List, Optional
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+# Optional SQLite file for a cache tier that survives restarts; unset keeps the cache in memory only
+RESPONSE_CACHE_DISK_PATH = os.getenv("RESPONSE_CACHE_DISK_PATH", "")
+# How many distinct completions to keep per prompt for chains sampled at non-zero temperature
+RESPONSE_CACHE_VARIANTS = int(os.getenv("RESPONSE_CACHE_VARIANTS", "5"))
+
+
+def cache_key(model: str, prompt: str, params: dict) -> str:
+    payload = json.dumps([model, prompt, params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryTier:
+    """LRU map of key -> cached variants with a per-entry TTL."""
+
+    def __init__(self, max_entries: int, ttl: float, clock: Callable[[], float]):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.bytes_used = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[List[str]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        created, variants, size = entry
+        if created <= self._clock() - self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return variants
+
+    def put(self, key: str, variants: List[str], created: Optional[float] = None):
+        self._remove(key)
+        size = len(json.dumps(variants).encode())
+        self._entries[key] = (created if created is not None else self._clock(), variants, size)
+        self.bytes_used += size
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes_used -= entry[2]
+
+
+class SQLiteTier:
+    """On-disk cache tier. Every call is blocking; ResponseCache runs them in a worker thread."""
+
+    def __init__(self, path: str, ttl: float, clock: Callable[[], float]):
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, created REAL, variants TEXT)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[tuple]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created, variants FROM responses WHERE key = ? AND created > ?",
+                (key, self._clock() - self.ttl)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def put(self, key: str, variants: List[str], created: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, created, variants) VALUES (?, ?, ?)",
+                (key, created, json.dumps(variants))
+            )
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses WHERE created <= ?", (self._clock() - self.ttl,))
+            self._conn.commit()
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(variants)), 0) FROM responses"
+            ).fetchone()
+        return {"entries": entries, "bytes_used": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """Two-tier cache of chain completions.
+
+    Each key holds up to `variants` completions. Deterministic chains use
+    one variant. Chains sampled at non-zero temperature can keep several
+    and get a random one back once all slots are filled, so repeated
+    calls still vary without paying for a round-trip each time.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        disk_path: str = RESPONSE_CACHE_DISK_PATH,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._clock = clock
+        self.memory = MemoryTier(max_entries, ttl, clock)
+        self.disk = SQLiteTier(disk_path, ttl, clock) if disk_path else None
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+
+    async def get(self, chain_name: str, key: str, variants: int = 1) -> Optional[List[str]]:
+        """Return the cached completions once at least `variants` are stored, else None."""
+        cached = self.memory.get(key)
+        if cached is None and self.disk is not None:
+            row = await asyncio.to_thread(self.disk.get, key)
+            if row is not None:
+                created, cached = row
+                self.memory.put(key, cached, created)
+        if cached is not None and len(cached) >= variants:
+            self.hits[chain_name] += 1
+            return cached
+        self.misses[chain_name] += 1
+        return None
+
+    async def add(self, key: str, text: str, variants: int = 1):
+        cached = list(self.memory.get(key) or [])
+        if text not in cached:
+            cached.append(text)
+        cached = cached[-variants:]
+        created = self._clock()
+        self.memory.put(key, cached, created)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.put, key, cached, created)
+
+    async def stats(self) -> dict:
+        chains = sorted(set(self.hits) | set(self.misses))
+        total_hits, total_misses = sum(self.hits.values()), sum(self.misses.values())
+        stats = {
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_rate": total_hits / (total_hits + total_misses) if total_hits + total_misses else 0.0,
+            "memory": {"entries": len(self.memory), "bytes_used": self.memory.bytes_used},
+            "chains": {
+                name: {"hits": self.hits[name], "misses": self.misses[name]}
+                for name in chains
+            },
+        }
+        if self.disk is not None:
+            stats["disk"] = await asyncio.to_thread(self.disk.stats)
+        return stats
+
+    def collect(self):
+        """Samples for the /metrics endpoint. Disk tier size needs a query, so it stays on /cache/stats."""
+        return [
+            ("response_cache_requests_total", "counter", "Response cache lookups by chain and result", [
+                ({"chain": name, "result": "hit"}, self.hits[name]) for name in self.hits
+            ] + [
+                ({"chain": name, "result": "miss"}, self.misses[name]) for name in self.misses
+            ]),
+            ("response_cache_memory_bytes", "gauge", "Bytes held by the in-memory tier", [({}, self.memory.bytes_used)]),
+            ("response_cache_memory_entries", "gauge", "Entries in the in-memory tier", [({}, len(self.memory))]),
+        ]
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
@@ -0,0 +1,126 @@
+import math
+import os
+import random
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+# Largest room /rooms will create
+ROOM_MAX_CONTESTANTS = int(os.getenv("ROOM_MAX_CONTESTANTS", "50"))
+# Answers scored together in one batch_rating call; the rating prompt is paid once per group, not once per answer
+ROOM_RANKING_GROUP_SIZE = int(os.getenv("ROOM_RANKING_GROUP_SIZE", "10"))
+# LLM calls one room request may have in flight while answering or ranking a round
+ROOM_FANOUT_CONCURRENCY = int(os.getenv("ROOM_FANOUT_CONCURRENCY", "16"))
+
+
+class ScoreTable:
+    """Running rating totals per contestant, with the leader kept current as rounds come in.
+
+    Each round costs one update per contestant scored, so naming the
+    winner never rereads the rounds played.
+    """
+
+    def __init__(self, totals: Optional[Dict[str, List[float]]] = None, leader: Optional[str] = None):
+        # contestant -> [sum of ratings, rounds rated]
+        self.totals: Dict[str, List[float]] = totals or {}
+        self.leader = leader
+
+    def average(self, contestant_id: str) -> float:
+        total, rounds = self.totals[contestant_id]
+        return total / rounds
+
+    def add(self, scores: Dict[str, float]):
+        for contestant_id, score in scores.items():
+            entry = self.totals.setdefault(contestant_id, [0.0, 0])
+            entry[0] += score
+            entry[1] += 1
+        # Averages only move for contestants scored this round, but the leader's may have dropped
+        self.leader = max(self.totals, key=self.average) if self.totals else None
+
+    def standings(self, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        ranked = sorted(((c, self.average(c)) for c in self.totals), key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def to_dict(self) -> dict:
+        return {"totals": self.totals, "leader": self.leader}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ScoreTable":
+        return cls(data["totals"], data["leader"])
+
+
+class Room:
+    """A dating show with any number of human and AI contestants.
+
+    Stages run "setup" (created, no contestants yet), then "waiting" and
+    "answering" for each round, then "finished". Only the current round's
+    answers are kept; past rounds live on as totals in the score table.
+    """
+
+    def __init__(self):
+        self.contestants: Dict[str, dict] = {}
+        self.max_rounds = 3
+        self.current_round = 0
+        self.questions: List[str] = []
+        self.answers: Dict[str, str] = {}
+        self.stage = "setup"
+        self.scores = ScoreTable()
+
+    def humans(self) -> List[str]:
+        return [c for c, info in self.contestants.items() if info["kind"] == "human"]
+
+    def ai(self) -> List[str]:
+        return [c for c, info in self.contestants.items() if info["kind"] == "ai"]
+
+    def question(self) -> str:
+        return self.questions[self.current_round - 1]
+
+    def to_dict(self) -> dict:
+        return {
+            "contestants": self.contestants,
+            "max_rounds": self.max_rounds,
+            "current_round": self.current_round,
+            "questions": self.questions,
+            "answers": self.answers,
+            "stage": self.stage,
+            "scores": self.scores.to_dict()
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Room":
+        room = cls.__new__(cls)
+        room.contestants = data["contestants"]
+        room.max_rounds = data["max_rounds"]
+        room.current_round = data["current_round"]
+        room.questions = data["questions"]
+        room.answers = data["answers"]
+        room.stage = data["stage"]
+        room.scores = ScoreTable.from_dict(data["scores"])
+        return room
+
+
+def setup_room(room: Room, humans: int, ai: int, rounds: int, personalities: List[str]) -> dict:
+    if room.stage != "setup":
+        raise HTTPException(status_code=409, detail="Room is already set up.")
+    if humans < 0 or ai < 0 or not 2 <= humans + ai <= ROOM_MAX_CONTESTANTS:
+        raise HTTPException(status_code=400, detail=f"A room holds 2 to {ROOM_MAX_CONTESTANTS} contestants.")
+    if rounds < 1:
+        raise HTTPException(status_code=400, detail="A room plays at least one round.")
+    for n in range(1, humans + 1):
+        room.contestants[f"player{n}"] = {"kind": "human", "personality": None}
+    for n in range(1, ai + 1):
+        room.contestants[f"ai{n}"] = {"kind": "ai", "personality": personalities[(n - 1) % len(personalities)]}
+    room.max_rounds = rounds
+    room.stage = "waiting"
+    return {"contestants": room.contestants, "rounds": rounds}
+
+
+def ranking_groups(contestant_ids: List[str], group_size: Optional[int] = None) -> List[List[str]]:
+    """Split contestants into as few groups of at most `group_size` (ROOM_RANKING_GROUP_SIZE) as possible, evenly sized.
+
+    The order is shuffled first, so where an answer sits in the prompt
+    (and who it is compared with) changes every round.
+    """
+    shuffled = random.sample(contestant_ids, len(contestant_ids))
+    count = max(1, math.ceil(len(shuffled) / max(1, group_size or ROOM_RANKING_GROUP_SIZE)))
+    return [shuffled[n::count] for n in range(count)]
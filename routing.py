@@ -0,0 +1,147 @@
+import os
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+import metrics
+from llm_chains import Chain, SamplingProfile
+from resilience import DeadlineBudget, DeadlineExceeded
+
+if TYPE_CHECKING:
+    from langchain_core.language_models import BaseChatModel
+    from langchain_core.prompts import BasePromptTemplate
+
+# Model behind each tier name used in ROLE_TIERS
+MODEL_TIERS = {
+    "small": os.getenv("SMALL_MODEL", "ministral-8b-latest"),
+    "large": os.getenv("LARGE_MODEL", "mistral-large-latest"),
+}
+
+# Roles try their tiers in order and escalate when a reply fails validation
+DEFAULT_ROLE_TIERS = {
+    "rating": ("small", "large"),
+    "batch_rating": ("small", "large"),
+    "question_generator": ("small", "large"),
+}
+
+MAX_QUESTION_CHARS = 300
+
+Validator = Callable[[dict, str], None]
+
+
+def parse_role_tiers(spec: str) -> Dict[str, Tuple[str, ...]]:
+    """Parse "rating=small>large,host_intro=large" into {"rating": ("small", "large"), ...}."""
+    role_tiers = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        role, _, tiers = entry.partition("=")
+        names = tuple(tier.strip() for tier in tiers.split(">") if tier.strip())
+        unknown = [name for name in names if name not in MODEL_TIERS]
+        if not names or unknown:
+            raise ValueError(f"Invalid ROLE_TIERS entry {entry!r}; tiers must be among {sorted(MODEL_TIERS)}")
+        role_tiers[role.strip()] = names
+    return role_tiers
+
+
+ROLE_TIERS = {**DEFAULT_ROLE_TIERS, **parse_role_tiers(os.getenv("ROLE_TIERS", ""))}
+
+
+class LowConfidence(ValueError):
+    """A reply that parsed but doesn't look trustworthy enough to serve."""
+
+
+def validate_question(inputs: dict, text: str):
+    question = text.strip().strip('"')
+    if not question.endswith("?"):
+        raise LowConfidence(f"Not a question: {question[:80]!r}")
+    if len(question) > MAX_QUESTION_CHARS or "\n" in question:
+        raise LowConfidence("Question is not a single short sentence")
+
+
+class RoutedChain:
+    """A role served by a ladder of model tiers, cheapest first.
+
+    Each tier's reply is checked by `validate`; a parse failure, an
+    out-of-range value, a low-confidence reply or an upstream error moves
+    the call up to the next tier. The last tier's reply is served as is.
+
+    The tiers share the role's one deadline: each gets only what the
+    tiers before it left, and running out of it ends the call with
+    DeadlineExceeded instead of starting another tier.
+    """
+
+    def __init__(self, name: str, tiers: List[Chain], validate: Validator):
+        self.name = name
+        self.tiers = tiers
+        self.validate = validate
+
+    @property
+    def prompt(self) -> "BasePromptTemplate":
+        return self.tiers[0].prompt
+
+    @property
+    def profile(self) -> SamplingProfile:
+        return self.tiers[0].profile
+
+    @property
+    def model_name(self) -> str:
+        return self.tiers[0].model_name
+
+    def leaves(self) -> List[Chain]:
+        return list(self.tiers)
+
+    def _escalate(self, index: int, error: Exception):
+        reason = "low_confidence" if isinstance(error, LowConfidence) else "invalid" if isinstance(error, ValueError) else "error"
+        metrics.llm_escalations.inc(
+            chain=self.name,
+            from_model=self.tiers[index].model_name,
+            to_model=self.tiers[index + 1].model_name,
+            reason=reason
+        )
+
+    def budget(self) -> DeadlineBudget:
+        return DeadlineBudget(self.tiers[0].guard.deadline(self.name))
+
+    async def ainvoke(self, inputs: dict, **overrides) -> dict:
+        metrics.llm_routed_calls.inc(chain=self.name)
+        budget = self.budget()
+        for index, chain in enumerate(self.tiers[:-1]):
+            try:
+                response = await chain.ainvoke(inputs, budget=budget, **overrides)
+                self.validate(inputs, response["text"])
+                return response
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                self._escalate(index, e)
+        return await self.tiers[-1].ainvoke(inputs, budget=budget, **overrides)
+
+    async def astream(self, inputs: dict, **overrides) -> AsyncIterator[str]:
+        """Cheap tiers are buffered so a rejected reply never reaches the client; the last tier streams live."""
+        metrics.llm_routed_calls.inc(chain=self.name)
+        budget = self.budget()
+        for index, chain in enumerate(self.tiers[:-1]):
+            try:
+                text = (await chain.ainvoke(inputs, budget=budget, **overrides))["text"]
+                self.validate(inputs, text)
+            except DeadlineExceeded:
+                raise
+            except Exception as e:
+                self._escalate(index, e)
+                continue
+            yield text
+            return
+        async for chunk in self.tiers[-1].astream(inputs, budget=budget, **overrides):
+            yield chunk
+
+
+def route_chain(
+    name: str,
+    models: Dict[str, "BaseChatModel"],
+    prompt: Union[str, "BasePromptTemplate"],
+    profile: SamplingProfile,
+    validate: Optional[Validator] = None,
+    **chain_kwargs,
+):
+    """Build the chain for a role from its ROLE_TIERS ladder, or a plain large-tier Chain if it has none."""
+    tiers = ROLE_TIERS.get(name, ("large",))
+    if validate is None or len(tiers) == 1:
+        return Chain(name, models[tiers[-1]], prompt, profile, **chain_kwargs)
+    return RoutedChain(name, [Chain(name, models[tier], prompt, profile, **chain_kwargs) for tier in tiers], validate)
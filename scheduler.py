@@ -0,0 +1,291 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from metrics import llm_queue_wait, llm_shed
+
+# Per-model upstream budgets as "model=rps/tpm" pairs; "*" sets the default for unlisted models.
+# An empty or zero value leaves that budget unlimited, e.g. "*=5/500000,ministral-8b-latest=10/"
+LLM_RATE_LIMITS = os.getenv("LLM_RATE_LIMITS", "")
+# Callers queued per model before new ones are shed with a 503
+LLM_QUEUE_MAX_DEPTH = int(os.getenv("LLM_QUEUE_MAX_DEPTH", "100"))
+# Longest a caller may wait for budget; longer estimates are shed up front with a 429
+LLM_QUEUE_MAX_WAIT_SECONDS = float(os.getenv("LLM_QUEUE_MAX_WAIT_SECONDS", "10"))
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+
+# Calls made from this context are queued at this priority; background tasks set it once at their start
+current_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+class Overloaded(HTTPException):
+    """An LLM call shed by admission control, rendered as a 429 or 503 with Retry-After."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(status_code=status_code, detail=detail, headers={"Retry-After": str(self.retry_after)})
+
+
+def upstream_retry_after(error: BaseException) -> Optional[float]:
+    """Seconds to back off if `error` is the provider's own 429, else None."""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) != 429:
+        return None
+    try:
+        return float(response.headers.get("retry-after", 1))
+    except ValueError:
+        return 1.0
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parse LLM_RATE_LIMITS into {model: (rps, tpm)}, 0 meaning unlimited."""
+    limits = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        model, _, budget = entry.partition("=")
+        rps, _, tpm = budget.partition("/")
+        limits[model.strip()] = (float(rps or 0), float(tpm or 0))
+    return limits
+
+
+class TokenBucket:
+    """Refills at `rate` units per second up to `capacity`; takes may run it into debt."""
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = now
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        """Seconds until `amount` can be taken; more than the capacity only waits for a full bucket."""
+        return self.drain_time(min(amount, self.capacity), now)
+
+    def drain_time(self, amount: float, now: float) -> float:
+        """Seconds until the bucket has refilled by `amount` beyond its current level."""
+        self._refill(now)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "tokens", "future")
+
+    def __init__(self, priority: Priority, seq: int, tokens: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.tokens = tokens
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class _ModelQueue:
+    """Budgets and waiting callers for one model."""
+
+    def __init__(self, rps: float, tpm: float, now: float):
+        # Requests are spaced evenly, since providers count them over a sliding second; a
+        # minute's worth of tokens may go out in a burst
+        self.requests = TokenBucket(rps, 1.0, now) if rps > 0 else None
+        self.tokens = TokenBucket(tpm / 60, tpm, now) if tpm > 0 else None
+        self.paused_until = 0.0
+        self.waiters: List[_Waiter] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def delay(self, tokens: int, now: float) -> float:
+        """Seconds until one call of `tokens` tokens fits the budget."""
+        delay = max(0.0, self.paused_until - now)
+        if self.requests is not None:
+            delay = max(delay, self.requests.delay(1, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.delay(tokens, now))
+        return delay
+
+    def estimate(self, tokens: int, requests: int, now: float) -> float:
+        """Seconds until `requests` calls totalling `tokens` tokens have all been let through."""
+        delay = max(0.0, self.paused_until - now)
+        if self.requests is not None:
+            delay = max(delay, self.requests.drain_time(requests, now))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.drain_time(tokens, now))
+        return delay
+
+    def take(self, tokens: int, now: float):
+        if self.requests is not None:
+            self.requests.take(1, now)
+        if self.tokens is not None:
+            self.tokens.take(tokens, now)
+
+    def depth(self, priority: Optional[Priority] = None) -> int:
+        return sum(
+            1 for waiter in self.waiters
+            if not waiter.future.done() and (priority is None or waiter.priority == priority)
+        )
+
+
+class Scheduler:
+    """Admission control for upstream LLM calls.
+
+    Every chain call asks `admit` for a slot on its model before going
+    upstream. Calls go straight through while the model's requests-per-
+    second and tokens-per-minute buckets have room; otherwise they queue,
+    interactive calls ahead of background ones, and are released as the
+    buckets refill. Rather than queueing without bound, a call is shed
+    with a 429 when its estimated wait exceeds `max_wait`, or with a 503
+    when the model's queue is full (a full queue first evicts the newest
+    background caller to make room for an interactive one).
+    """
+
+    def __init__(
+        self,
+        limits: Dict[str, Tuple[float, float]],
+        max_depth: int = LLM_QUEUE_MAX_DEPTH,
+        max_wait: float = LLM_QUEUE_MAX_WAIT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limits = limits
+        self.max_depth = max_depth
+        self.max_wait = max_wait
+        self._clock = clock
+        self._queues: Dict[str, _ModelQueue] = {}
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.queued = 0
+
+    def configure(self, limits: Dict[str, Tuple[float, float]]):
+        """Replace the budgets; queues are rebuilt on their next call."""
+        self.limits = limits
+        self._queues.clear()
+
+    def _queue(self, model: str) -> _ModelQueue:
+        queue = self._queues.get(model)
+        if queue is None:
+            rps, tpm = self.limits.get(model, self.limits.get("*", (0, 0)))
+            queue = self._queues[model] = _ModelQueue(rps, tpm, self._clock())
+        return queue
+
+    def _shed(self, model: str, priority: Priority, status_code: int, reason: str, retry_after: float) -> Overloaded:
+        llm_shed.inc(model=model, priority=priority.name.lower(), reason=reason)
+        detail = "Too many requests for the model, retry later." if status_code == 429 else "Model queue is full, retry later."
+        return Overloaded(status_code, detail, retry_after)
+
+    async def admit(self, model: str, tokens: int, priority: Optional[Priority] = None):
+        """Wait until `model` has budget for one call of about `tokens` tokens, or raise Overloaded."""
+        priority = current_priority.get() if priority is None else priority
+        queue = self._queue(model)
+        now = self._clock()
+        labels = {"model": model, "priority": priority.name.lower()}
+
+        ahead = [waiter for waiter in queue.waiters if not waiter.future.done() and waiter.priority <= priority]
+        if not ahead and queue.delay(tokens, now) == 0:
+            queue.take(tokens, now)
+            self.admitted += 1
+            llm_queue_wait.observe(0.0, **labels)
+            return
+
+        # Everyone queued ahead goes first, so our wait is the time to refill for all of us
+        estimate = queue.estimate(tokens + sum(waiter.tokens for waiter in ahead), len(ahead) + 1, now)
+        if estimate > self.max_wait:
+            raise self._shed(model, priority, 429, "rate_limit", estimate)
+        if queue.depth() >= self.max_depth:
+            background = [waiter for waiter in queue.waiters if not waiter.future.done() and waiter.priority > priority]
+            if not background:
+                raise self._shed(model, priority, 503, "queue_full", estimate or 1)
+            evicted = max(background)
+            evicted.future.set_exception(self._shed(model, evicted.priority, 503, "evicted", self.max_wait))
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(queue.waiters, _Waiter(priority, next(self._seq), tokens, future))
+        self.queued += 1
+        self._dispatch(model)
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except asyncio.TimeoutError:
+            raise self._shed(model, priority, 503, "timeout", queue.delay(tokens, self._clock()))
+        finally:
+            # Let the next caller through if we were cancelled or timed out at the head of the queue
+            self._dispatch(model)
+        self.admitted += 1
+        llm_queue_wait.observe(self._clock() - now, **labels)
+
+    def _dispatch(self, model: str):
+        """Release queued callers in priority order while the budget allows, then sleep until it refills."""
+        queue = self._queues.get(model)
+        if queue is None:
+            return
+        if queue.timer is not None:
+            queue.timer.cancel()
+            queue.timer = None
+        now = self._clock()
+        while queue.waiters:
+            head = queue.waiters[0]
+            if head.future.done():
+                heapq.heappop(queue.waiters)
+                continue
+            delay = queue.delay(head.tokens, now)
+            if delay > 0:
+                queue.timer = asyncio.get_running_loop().call_later(delay, self._dispatch, model)
+                return
+            heapq.heappop(queue.waiters)
+            queue.take(head.tokens, now)
+            head.future.set_result(None)
+
+    def settle(self, model: str, estimated: int, actual: Optional[int]):
+        """Correct the token budget once a call reports its real usage."""
+        queue = self._queues.get(model)
+        if queue is None or queue.tokens is None or not actual:
+            return
+        if actual > estimated:
+            queue.tokens.take(actual - estimated, self._clock())
+        else:
+            queue.tokens.give(estimated - actual)
+
+    def pause(self, model: str, seconds: float):
+        """Hold every call to `model`, e.g. after the provider answered 429."""
+        queue = self._queue(model)
+        queue.paused_until = max(queue.paused_until, self._clock() + seconds)
+
+    def stats(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "models": {
+                model: {priority.name.lower(): queue.depth(priority) for priority in Priority}
+                for model, queue in self._queues.items()
+            },
+        }
+
+    def collect(self):
+        """Samples for the /metrics endpoint."""
+        return [
+            ("llm_scheduler_queue_depth", "gauge", "LLM calls waiting for upstream budget", [
+                ({"model": model, "priority": priority.name.lower()}, queue.depth(priority))
+                for model, queue in self._queues.items()
+                for priority in Priority
+            ]),
+        ]
+
+
+llm_scheduler = Scheduler(parse_rate_limits(LLM_RATE_LIMITS))
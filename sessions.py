@@ -0,0 +1,133 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+MAX_GAME_SESSIONS = int(os.getenv("MAX_GAME_SESSIONS", "10000"))
+GAME_SESSION_TTL_SECONDS = float(os.getenv("GAME_SESSION_TTL_SECONDS", "3600"))
+
+
+class SessionStore(Generic[T]):
+    """In-memory registry of live games keyed by session ID.
+
+    Sessions are kept in last-access order, so the least recently used
+    session is always at the front. That lets idle-TTL expiry and LRU
+    eviction both pop from the same end without scanning the whole map.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], T],
+        max_sessions: int = MAX_GAME_SESSIONS,
+        idle_ttl: float = GAME_SESSION_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._factory = factory
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._clock = clock
+        self._sessions: "OrderedDict[str, list]" = OrderedDict()
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        # Called with the id of every game created here, including one reusing an evicted game's id
+        self.on_create: Optional[Callable[[str], None]] = None
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def new_session_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def get(self, session_id: str) -> T:
+        """Return the game for `session_id`, creating it if needed."""
+        now = self._clock()
+        self._expire(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return self._insert(session_id, now)
+        entry[0] = now
+        self._sessions.move_to_end(session_id)
+        return entry[1]
+
+    def find(self, session_id: str) -> Optional[T]:
+        """Return the game for `session_id`, or None if there is none (or it expired); never creates one."""
+        now = self._clock()
+        self._expire(now)
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        entry[0] = now
+        self._sessions.move_to_end(session_id)
+        return entry[1]
+
+    def peek(self, session_id: str) -> Optional[T]:
+        """Return the game for `session_id` without touching or creating it."""
+        entry = self._sessions.get(session_id)
+        return entry[1] if entry is not None else None
+
+    def create(self) -> "tuple[str, T]":
+        session_id = self.new_session_id()
+        return session_id, self.get(session_id)
+
+    def reset(self, session_id: str) -> T:
+        self._sessions.pop(session_id, None)
+        return self.get(session_id)
+
+    def discard(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def put(self, session_id: str, state: T) -> None:
+        """Store an existing game under `session_id`, e.g. one recovered after a restart."""
+        now = self._clock()
+        self._sessions.pop(session_id, None)
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted_lru += 1
+        self._sessions[session_id] = [now, state]
+
+    def ids(self) -> "list[str]":
+        return list(self._sessions)
+
+    def _insert(self, session_id: str, now: float) -> T:
+        while len(self._sessions) >= self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted_lru += 1
+        state = self._factory()
+        self._sessions[session_id] = [now, state]
+        if self.on_create is not None:
+            self.on_create(session_id)
+        return state
+
+    def _expire(self, now: float) -> None:
+        cutoff = now - self.idle_ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if oldest[0] > cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted_idle += 1
+
+    def stats(self) -> dict:
+        return {
+            "live_sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_ttl_seconds": self.idle_ttl,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+        }
+
+    def collect(self):
+        """Samples for the /metrics endpoint."""
+        return [
+            ("game_sessions_live", "gauge", "Live game sessions", [({}, len(self._sessions))]),
+            ("game_sessions_evicted_total", "counter", "Sessions evicted from the registry", [
+                ({"reason": "idle"}, self.evicted_idle),
+                ({"reason": "lru"}, self.evicted_lru),
+            ]),
+        ]
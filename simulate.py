@@ -0,0 +1,222 @@
+"""Headless tournament simulator: play many full games of endpoints.py concurrently, without HTTP.
+
+Each game is driven through the same stage machine as the `/ws/game`
+socket, with the user's answer generated as `/submit-answer` does when
+none is given. One JSON line per finished game is appended to --out, so
+an interrupted run picks up where it stopped when started again with
+the same --out and configuration.
+
+Compare personalities or prompts by running once per variant:
+    LLM_BACKEND=fake python -m simulate --games 1000 --out runs/baseline.jsonl
+    python -m simulate --games 1000 --personalities variant.json --template rating=rating_v2.txt --out runs/v2.jsonl
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import statistics
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import endpoints
+from endpoints import ContestantType
+from logs import get_logger
+
+logger = get_logger("simulate")
+
+# Games played at once, and LLM calls allowed in flight across all of them
+SIMULATION_CONCURRENCY = int(os.getenv("SIMULATION_CONCURRENCY", "20"))
+SIMULATION_LLM_CONCURRENCY = int(os.getenv("SIMULATION_LLM_CONCURRENCY", "16"))
+# A game still unfinished after this long is recorded as failed
+SIMULATION_GAME_TIMEOUT_SECONDS = float(os.getenv("SIMULATION_GAME_TIMEOUT_SECONDS", "300"))
+
+
+class BoundedModel:
+    """Chat model proxy that lets at most `semaphore`'s worth of calls go upstream at once."""
+
+    def __init__(self, llm, semaphore: asyncio.Semaphore):
+        self._llm = llm
+        self._semaphore = semaphore
+
+    def __getattr__(self, name):
+        return getattr(self._llm, name)
+
+    async def ainvoke(self, *args, **kwargs):
+        async with self._semaphore:
+            return await self._llm.ainvoke(*args, **kwargs)
+
+    async def astream(self, *args, **kwargs):
+        async with self._semaphore:
+            async for chunk in self._llm.astream(*args, **kwargs):
+                yield chunk
+
+
+def configure(personalities: Dict[str, str], templates: Dict[str, str]) -> str:
+    """Apply personality and prompt overrides to endpoints.py and return a short ID for the resulting setup."""
+    for contestant, personality in personalities.items():
+        endpoints.AI_PERSONALITIES[ContestantType(contestant)] = personality
+    for name, template in templates.items():
+        attribute = f"{name}_template"
+        if not hasattr(endpoints, attribute):
+            raise ValueError(f"endpoints.py has no {attribute}")
+        setattr(endpoints, attribute, template)
+    endpoints.chains.reset()
+    setup = {
+        "personalities": {contestant.value: text for contestant, text in endpoints.AI_PERSONALITIES.items()},
+        "auto_answer": endpoints.AUTO_ANSWER_PERSONALITY,
+        "templates": {name: value for name, value in vars(endpoints).items() if name.endswith("_template")},
+    }
+    return hashlib.sha256(json.dumps(setup, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def read_results(path: str, config: str) -> List[dict]:
+    """Games already recorded in `path` for this configuration."""
+    if not os.path.exists(path):
+        return []
+    results = []
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # A line cut short by an interrupted run
+            if record.get("config") != config:
+                raise ValueError(f"{path} holds games from another configuration ({record.get('config')}); pick another --out")
+            results.append(record)
+    return results
+
+
+async def auto_answer(session_id: str) -> None:
+    return None
+
+
+async def play_game(game: int, config: str, timeout: float) -> dict:
+    """Play one game start to finish and return its record."""
+    start = time.perf_counter()
+    session_id, _ = await endpoints.games.create()
+    record = {"game": game, "config": config}
+    try:
+        await asyncio.wait_for(endpoints.drive_game(session_id, auto_answer), timeout)
+        game_state = await endpoints.games.load(session_id)
+        winner, _ = endpoints.tally_winner(game_state)
+        record.update(
+            status="ok",
+            winner=winner.value,
+            ratings={contestant.value: ratings for contestant, ratings in game_state.contestant_ratings.items()},
+        )
+    except Exception as e:
+        logger.warning("[SIMULATE] Game %d failed: %r", game, e)
+        record.update(status="error", error=repr(e))
+    record["seconds"] = round(time.perf_counter() - start, 3)
+    return record
+
+
+async def simulate(
+    games: int,
+    out: str,
+    config: str,
+    concurrency: int = SIMULATION_CONCURRENCY,
+    llm_concurrency: int = SIMULATION_LLM_CONCURRENCY,
+    timeout: float = SIMULATION_GAME_TIMEOUT_SECONDS,
+) -> dict:
+    """Play games 0..games-1 that `out` doesn't hold yet, appending each record as it finishes."""
+    done = {record["game"] for record in read_results(out, config) if record["status"] == "ok"}
+    todo: asyncio.Queue = asyncio.Queue()
+    for game in range(games):
+        if game not in done:
+            todo.put_nowait(game)
+    if done:
+        logger.info("[SIMULATE] Resuming: %d of %d games already played", len(done), games)
+
+    # Nothing to gain from answering ahead of a player who answers instantly
+    endpoints.speculator.enabled = False
+    semaphore = asyncio.Semaphore(llm_concurrency)
+    for leaf in (leaf for chain in endpoints.chains.load().values() for leaf in chain.leaves()):
+        leaf.llm = BoundedModel(leaf.llm, semaphore)
+
+    played = 0
+    start = time.perf_counter()
+    # The app's own startup and shutdown, so the question pool and clients are handled as in a server
+    async with endpoints.lifespan(endpoints.app):
+        with open(out, "a") as f:
+            async def worker():
+                nonlocal played
+                while not todo.empty():
+                    record = await play_game(todo.get_nowait(), config, timeout)
+                    f.write(json.dumps(record, separators=(",", ":")) + "\n")
+                    f.flush()
+                    played += 1
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {**summarize(read_results(out, config)), "played": played, "games_per_second": round(played / elapsed, 2) if elapsed else 0.0}
+
+
+def summarize(records: List[dict]) -> dict:
+    """Win rates and rating distributions per contestant over the finished games."""
+    finished = [record for record in records if record["status"] == "ok"]
+    wins = Counter(record["winner"] for record in finished)
+    contestants = {}
+    for contestant in ContestantType:
+        ratings = [rating for record in finished for rating in record["ratings"][contestant.value]]
+        contestants[contestant.value] = {
+            "personality": endpoints.AI_PERSONALITIES.get(contestant, endpoints.AUTO_ANSWER_PERSONALITY),
+            "win_rate": round(wins[contestant.value] / len(finished), 4) if finished else 0.0,
+            "mean_rating": round(statistics.fmean(ratings), 3) if ratings else None,
+            "stdev_rating": round(statistics.pstdev(ratings), 3) if ratings else None,
+            "histogram": dict(sorted(Counter(round(rating) for rating in ratings).items())),
+        }
+    # A game that failed and was played again on resume counts once
+    failed = {record["game"] for record in records} - {record["game"] for record in finished}
+    return {
+        "games": len(finished),
+        "failed": len(failed),
+        "contestants": contestants,
+    }
+
+
+def print_report(report: dict):
+    print(f"{report['games']} games ({report['failed']} failed), {report['played']} played this run "
+          f"at {report['games_per_second']} games/s")
+    print(f"{'contestant':<13}{'win rate':>9}{'mean':>7}{'stdev':>7}  ratings 0..10")
+    for contestant, stats in report["contestants"].items():
+        histogram = " ".join(str(stats["histogram"].get(score, 0)) for score in range(11))
+        mean = "-" if stats["mean_rating"] is None else f"{stats['mean_rating']:.2f}"
+        stdev = "-" if stats["stdev_rating"] is None else f"{stats['stdev_rating']:.2f}"
+        print(f"{contestant:<13}{stats['win_rate']:>9.1%}{mean:>7}{stdev:>7}  {histogram}")
+        print(f"    {stats['personality'][:90]}")
+
+
+def parse_templates(entries: Optional[List[str]]) -> Dict[str, str]:
+    templates = {}
+    for entry in entries or []:
+        name, _, path = entry.partition("=")
+        with open(path) as f:
+            templates[name] = f.read()
+    return templates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=100, help="games in the tournament, including ones already in --out")
+    parser.add_argument("--out", default="simulation.jsonl", help="JSONL file the games are appended to")
+    parser.add_argument("--concurrency", type=int, default=SIMULATION_CONCURRENCY, help="games played at once")
+    parser.add_argument("--llm-concurrency", type=int, default=SIMULATION_LLM_CONCURRENCY, help="LLM calls in flight at once")
+    parser.add_argument("--timeout", type=float, default=SIMULATION_GAME_TIMEOUT_SECONDS, help="seconds before a game counts as failed")
+    parser.add_argument("--personalities", help='JSON file overriding AI personalities, e.g. {"contestant1": "..."}')
+    parser.add_argument("--template", action="append", metavar="NAME=PATH",
+                        help="replace endpoints.py's NAME_template with the file's contents, e.g. rating=rating_v2.txt or winner_announcement=...")
+    args = parser.parse_args()
+
+    personalities = {}
+    if args.personalities:
+        with open(args.personalities) as f:
+            personalities = json.load(f)
+    config = configure(personalities, parse_templates(args.template))
+    print(f"configuration {config}")
+    try:
+        print_report(asyncio.run(simulate(args.games, args.out, config, args.concurrency, args.llm_concurrency, args.timeout)))
+    except KeyboardInterrupt:
+        print(f"Interrupted; run again with --out {args.out} to resume.")
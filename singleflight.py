@@ -0,0 +1,81 @@
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one in-flight call.
+
+    The first caller for a key starts `fn()` as its own task; callers that
+    arrive while it is running await the same task. A caller that is
+    cancelled (say its client disconnected) only stops waiting: the call
+    keeps running for the others, and is cancelled only once nobody is
+    left waiting for it.
+    """
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self.leaders: Counter = Counter()
+        self.followers: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, group: str, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Return `fn()`'s result and whether it was shared from another caller's call."""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda task: self._finish(key, flight))
+            self.leaders[group] += 1
+        else:
+            self.followers[group] += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _finish(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            flight.task.exception()
+
+    def stats(self) -> dict:
+        groups = sorted(set(self.leaders) | set(self.followers))
+        return {
+            "in_flight": len(self._flights),
+            "chains": {
+                group: {"upstream_calls": self.leaders[group], "coalesced": self.followers[group]}
+                for group in groups
+            },
+        }
+
+    def collect(self):
+        """Samples for the /metrics endpoint."""
+        groups = sorted(set(self.leaders) | set(self.followers))
+        return [
+            ("llm_singleflight_in_flight", "gauge", "Coalescable LLM calls currently in flight", [({}, len(self._flights))]),
+            ("llm_singleflight_calls_total", "counter", "Coalescable chain calls by whether they led an upstream call or joined one", [
+                ({"chain": group, "role": role}, counter[group])
+                for group in groups
+                for role, counter in (("leader", self.leaders), ("follower", self.followers))
+            ]),
+        ]
@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from scheduler import Priority, current_priority
+
+SPECULATIVE_ANSWERS = os.getenv("SPECULATIVE_ANSWERS", "1") == "1"
+# Speculative results (running or finished) held per process; beyond this new speculation is skipped
+SPECULATIVE_MAX_PENDING = int(os.getenv("SPECULATIVE_MAX_PENDING", "64"))
+# Results nobody claimed within this many seconds are dropped
+SPECULATIVE_TTL_SECONDS = float(os.getenv("SPECULATIVE_TTL_SECONDS", "600"))
+
+
+class Speculator:
+    """Background work started before the request that will want its result.
+
+    `start` runs `fn()` as a task under a (group, key) pair, e.g. a game
+    session and what the task will produce for it; the request that
+    needs the result later `take`s the task and awaits it instead of
+    starting the work itself. Speculative calls queue behind interactive
+    ones in the LLM scheduler. Work is bounded by `max_pending` tasks
+    held at once, and unclaimed results expire after `ttl` seconds.
+    `cancel` drops a whole group, e.g. when its game is reset.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = SPECULATIVE_ANSWERS,
+        max_pending: int = SPECULATIVE_MAX_PENDING,
+        ttl: float = SPECULATIVE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.enabled = enabled
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._clock = clock
+        self._groups: Dict[Hashable, Dict[Hashable, Tuple[float, asyncio.Task]]] = {}
+        self.outcomes: Counter = Counter()
+
+    def __len__(self) -> int:
+        return sum(len(tasks) for tasks in self._groups.values())
+
+    def start(self, group: Hashable, key: Hashable, fn: Callable[[], Awaitable]) -> bool:
+        """Start `fn()` unless it is already running for this key or the budget is spent."""
+        if not self.enabled:
+            return False
+        self._expire()
+        if key in self._groups.get(group, {}):
+            return False
+        if len(self) >= self.max_pending:
+            self.outcomes["skipped"] += 1
+            return False
+
+        async def run():
+            current_priority.set(Priority.BACKGROUND)
+            return await fn()
+
+        task = asyncio.get_running_loop().create_task(run())
+        # Mark failures retrieved, since nobody may ever claim the result
+        task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self._groups.setdefault(group, {})[key] = (self._clock(), task)
+        self.outcomes["started"] += 1
+        return True
+
+    def take(self, group: Hashable, key: Hashable) -> Optional[asyncio.Task]:
+        """Claim the task started for this key, if any. Each task can be taken once."""
+        self._expire()
+        tasks = self._groups.get(group)
+        if not tasks or key not in tasks:
+            return None
+        _, task = tasks.pop(key)
+        if not tasks:
+            del self._groups[group]
+        self.outcomes["used" if task.done() else "joined"] += 1
+        return task
+
+    def cancel(self, group: Hashable) -> int:
+        tasks = self._groups.pop(group, {})
+        for _, task in tasks.values():
+            task.cancel()
+        self.outcomes["cancelled"] += len(tasks)
+        return len(tasks)
+
+    async def close(self):
+        tasks = [task for group in self._groups.values() for _, task in group.values()]
+        for group in list(self._groups):
+            self.cancel(group)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _expire(self):
+        cutoff = self._clock() - self.ttl
+        for group in list(self._groups):
+            tasks = self._groups[group]
+            for key in [key for key, (started, _) in tasks.items() if started <= cutoff]:
+                tasks.pop(key)[1].cancel()
+                self.outcomes["expired"] += 1
+            if not tasks:
+                del self._groups[group]
+
+    def stats(self) -> dict:
+        return {"pending": len(self), "max_pending": self.max_pending, **self.outcomes}
+
+    def collect(self):
+        """Samples for the /metrics endpoint."""
+        return [
+            ("speculation_pending", "gauge", "Speculative tasks running or waiting to be claimed", [({}, len(self))]),
+            ("speculation_tasks_total", "counter", "Speculative tasks by outcome", [
+                ({"outcome": outcome}, self.outcomes[outcome])
+                for outcome in ("started", "used", "joined", "cancelled", "expired", "skipped")
+            ]),
+        ]
@@ -0,0 +1,116 @@
+import asyncio
+import inspect
+import json
+from typing import Any, AsyncIterator, Callable, List, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def error_data(error: Exception) -> dict:
+    # HTTPExceptions (including calls shed by admission control) keep their status code
+    if isinstance(error, HTTPException):
+        return {"status_code": error.status_code, "detail": error.detail}
+    return {"status_code": 500, "detail": str(error)}
+
+
+def error_event(error: Exception) -> str:
+    return sse_event("error", error_data(error))
+
+
+def stream_chains(
+    streams: List[Tuple[str, AsyncIterator[str]]],
+    finalize: Callable[[List[Any]], Any],
+    partial_ok: bool = False,
+) -> StreamingResponse:
+    """Forward tokens from one or more chain streams as Server-Sent Events.
+
+    Each token is sent as a `token` event tagged with its stream's label.
+    Once every stream has finished, `finalize` receives the full text of
+    each stream (or the exception it raised) in input order and its return
+    value (awaited if it is a coroutine) is sent as the terminal `done` event. Game state should only be
+    committed inside `finalize`, so a failed or abandoned stream leaves it
+    untouched. Unless `partial_ok` is set, any failed stream skips
+    `finalize` and ends the response with an `error` event instead.
+    """
+    async def events():
+        queue: asyncio.Queue = asyncio.Queue()
+        results: List[Any] = [None] * len(streams)
+
+        async def pump(index: int, label: str, stream: AsyncIterator[str]):
+            parts = []
+            try:
+                async for chunk in stream:
+                    parts.append(chunk)
+                    await queue.put((label, chunk))
+                results[index] = "".join(parts)
+            except Exception as e:
+                results[index] = e
+            finally:
+                await queue.put(None)
+
+        tasks = [
+            asyncio.create_task(pump(index, label, stream))
+            for index, (label, stream) in enumerate(streams)
+        ]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                item = await queue.get()
+                if item is None:
+                    remaining -= 1
+                    continue
+                label, chunk = item
+                yield sse_event("token", {"source": label, "text": chunk})
+
+            failures = [result for result in results if isinstance(result, Exception)]
+            if failures and not partial_ok:
+                yield error_event(failures[0])
+                return
+            try:
+                result = finalize(results)
+                if inspect.isawaitable(result):
+                    result = await result
+            except Exception as e:
+                yield error_event(e)
+                return
+            yield sse_event("done", result)
+        finally:
+            # Client went away or we are done: stop any stream still producing
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+def stream_events(events: AsyncIterator[Tuple[str, Any]], finalize: Callable[[], Any]) -> StreamingResponse:
+    """Send each `(event, data)` pair as a Server-Sent Event, then `finalize()`'s result as `done`.
+
+    As with `stream_chains`, game state should only be committed inside
+    `finalize`; a failure while iterating ends the response with an
+    `error` event and skips it.
+    """
+    async def body():
+        try:
+            async for event, data in events:
+                yield sse_event(event, data)
+            result = finalize()
+            if inspect.isawaitable(result):
+                result = await result
+        except Exception as e:
+            yield error_event(e)
+            return
+        yield sse_event("done", result)
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+async def iter_once(text: str) -> AsyncIterator[str]:
+    """Stream already-available text as a single chunk."""
+    yield text